@@ -2,8 +2,11 @@
 from __future__ import annotations
 
 import os
-from datetime import datetime, timezone
-from pathlib import Path
+import re
+import time
+from datetime import datetime
+from functools import lru_cache
+from typing import Iterable
 
 
 # ─── Built-in Rules ──────────────────────────────────────────────────────
@@ -11,159 +14,248 @@ from pathlib import Path
 # Extension-based categories
 EXTENSION_CATEGORIES = {
     # Video
-    ".mp4": ["media", "video"],
-    ".mkv": ["media", "video"],
-    ".avi": ["media", "video"],
-    ".mov": ["media", "video"],
-    ".wmv": ["media", "video"],
-    ".flv": ["media", "video"],
-    ".webm": ["media", "video"],
-    ".m4v": ["media", "video"],
-    ".ts": ["media", "video"],
-    ".mpg": ["media", "video"],
-    ".mpeg": ["media", "video"],
+    ".mp4": ("media", "video"),
+    ".mkv": ("media", "video"),
+    ".avi": ("media", "video"),
+    ".mov": ("media", "video"),
+    ".wmv": ("media", "video"),
+    ".flv": ("media", "video"),
+    ".webm": ("media", "video"),
+    ".m4v": ("media", "video"),
+    ".ts": ("media", "video"),
+    ".mpg": ("media", "video"),
+    ".mpeg": ("media", "video"),
 
     # Audio
-    ".mp3": ["media", "audio", "music"],
-    ".flac": ["media", "audio", "music"],
-    ".wav": ["media", "audio"],
-    ".aac": ["media", "audio", "music"],
-    ".ogg": ["media", "audio"],
-    ".wma": ["media", "audio"],
-    ".m4a": ["media", "audio", "music"],
-    ".opus": ["media", "audio"],
-    ".aiff": ["media", "audio"],
+    ".mp3": ("media", "audio", "music"),
+    ".flac": ("media", "audio", "music"),
+    ".wav": ("media", "audio"),
+    ".aac": ("media", "audio", "music"),
+    ".ogg": ("media", "audio"),
+    ".wma": ("media", "audio"),
+    ".m4a": ("media", "audio", "music"),
+    ".opus": ("media", "audio"),
+    ".aiff": ("media", "audio"),
 
     # Images
-    ".jpg": ["media", "image", "photo"],
-    ".jpeg": ["media", "image", "photo"],
-    ".png": ["media", "image"],
-    ".gif": ["media", "image"],
-    ".bmp": ["media", "image"],
-    ".tiff": ["media", "image"],
-    ".tif": ["media", "image"],
-    ".webp": ["media", "image"],
-    ".svg": ["media", "image", "vector"],
-    ".raw": ["media", "image", "photo"],
-    ".cr2": ["media", "image", "photo"],
-    ".nef": ["media", "image", "photo"],
-    ".arw": ["media", "image", "photo"],
-    ".heic": ["media", "image", "photo"],
-    ".heif": ["media", "image", "photo"],
+    ".jpg": ("media", "image", "photo"),
+    ".jpeg": ("media", "image", "photo"),
+    ".png": ("media", "image"),
+    ".gif": ("media", "image"),
+    ".bmp": ("media", "image"),
+    ".tiff": ("media", "image"),
+    ".tif": ("media", "image"),
+    ".webp": ("media", "image"),
+    ".svg": ("media", "image", "vector"),
+    ".raw": ("media", "image", "photo"),
+    ".cr2": ("media", "image", "photo"),
+    ".nef": ("media", "image", "photo"),
+    ".arw": ("media", "image", "photo"),
+    ".heic": ("media", "image", "photo"),
+    ".heif": ("media", "image", "photo"),
 
     # Documents
-    ".pdf": ["document"],
-    ".doc": ["document"],
-    ".docx": ["document"],
-    ".odt": ["document"],
-    ".rtf": ["document"],
-    ".txt": ["document", "text"],
-    ".md": ["document", "text"],
-    ".tex": ["document"],
-    ".epub": ["document", "ebook"],
+    ".pdf": ("document",),
+    ".doc": ("document",),
+    ".docx": ("document",),
+    ".odt": ("document",),
+    ".rtf": ("document",),
+    ".txt": ("document", "text"),
+    ".md": ("document", "text"),
+    ".tex": ("document",),
+    ".epub": ("document", "ebook"),
 
     # Spreadsheets
-    ".xlsx": ["document", "spreadsheet"],
-    ".xls": ["document", "spreadsheet"],
-    ".csv": ["document", "data"],
-    ".tsv": ["document", "data"],
-    ".ods": ["document", "spreadsheet"],
+    ".xlsx": ("document", "spreadsheet"),
+    ".xls": ("document", "spreadsheet"),
+    ".csv": ("document", "data"),
+    ".tsv": ("document", "data"),
+    ".ods": ("document", "spreadsheet"),
 
     # Presentations
-    ".pptx": ["document", "presentation"],
-    ".ppt": ["document", "presentation"],
-    ".odp": ["document", "presentation"],
-    ".key": ["document", "presentation"],
+    ".pptx": ("document", "presentation"),
+    ".ppt": ("document", "presentation"),
+    ".odp": ("document", "presentation"),
+    ".key": ("document", "presentation"),
 
     # Code
-    ".py": ["code", "python"],
-    ".js": ["code", "javascript"],
-    ".ts": ["code", "typescript"],
-    ".jsx": ["code", "javascript"],
-    ".tsx": ["code", "typescript"],
-    ".html": ["code", "web"],
-    ".css": ["code", "web"],
-    ".java": ["code", "java"],
-    ".cpp": ["code", "cpp"],
-    ".c": ["code", "c"],
-    ".h": ["code", "c"],
-    ".go": ["code", "go"],
-    ".rs": ["code", "rust"],
-    ".rb": ["code", "ruby"],
-    ".php": ["code", "php"],
-    ".swift": ["code", "swift"],
-    ".kt": ["code", "kotlin"],
-    ".sh": ["code", "shell"],
-    ".bash": ["code", "shell"],
-    ".sql": ["code", "database"],
-    ".r": ["code", "r"],
-    ".m": ["code", "matlab"],
+    ".py": ("code", "python"),
+    ".js": ("code", "javascript"),
+    ".ts": ("code", "typescript"),
+    ".jsx": ("code", "javascript"),
+    ".tsx": ("code", "typescript"),
+    ".html": ("code", "web"),
+    ".css": ("code", "web"),
+    ".java": ("code", "java"),
+    ".cpp": ("code", "cpp"),
+    ".c": ("code", "c"),
+    ".h": ("code", "c"),
+    ".go": ("code", "go"),
+    ".rs": ("code", "rust"),
+    ".rb": ("code", "ruby"),
+    ".php": ("code", "php"),
+    ".swift": ("code", "swift"),
+    ".kt": ("code", "kotlin"),
+    ".sh": ("code", "shell"),
+    ".bash": ("code", "shell"),
+    ".sql": ("code", "database"),
+    ".r": ("code", "r"),
+    ".m": ("code", "matlab"),
 
     # Archives
-    ".zip": ["archive"],
-    ".tar": ["archive"],
-    ".gz": ["archive"],
-    ".bz2": ["archive"],
-    ".xz": ["archive"],
-    ".7z": ["archive"],
-    ".rar": ["archive"],
-    ".iso": ["archive", "disk-image"],
-    ".dmg": ["archive", "disk-image"],
+    ".zip": ("archive",),
+    ".tar": ("archive",),
+    ".gz": ("archive",),
+    ".bz2": ("archive",),
+    ".xz": ("archive",),
+    ".7z": ("archive",),
+    ".rar": ("archive",),
+    ".iso": ("archive", "disk-image"),
+    ".dmg": ("archive", "disk-image"),
 
     # Data
-    ".json": ["data"],
-    ".xml": ["data"],
-    ".yaml": ["data"],
-    ".yml": ["data"],
-    ".toml": ["data"],
-    ".ini": ["data", "config"],
-    ".cfg": ["data", "config"],
-    ".conf": ["data", "config"],
-    ".db": ["data", "database"],
-    ".sqlite": ["data", "database"],
-    ".sqlite3": ["data", "database"],
+    ".json": ("data",),
+    ".xml": ("data",),
+    ".yaml": ("data",),
+    ".yml": ("data",),
+    ".toml": ("data",),
+    ".ini": ("data", "config"),
+    ".cfg": ("data", "config"),
+    ".conf": ("data", "config"),
+    ".db": ("data", "database"),
+    ".sqlite": ("data", "database"),
+    ".sqlite3": ("data", "database"),
 
     # Fonts
-    ".ttf": ["font"],
-    ".otf": ["font"],
-    ".woff": ["font"],
-    ".woff2": ["font"],
+    ".ttf": ("font",),
+    ".otf": ("font",),
+    ".woff": ("font",),
+    ".woff2": ("font",),
 
     # Subtitles
-    ".srt": ["subtitle"],
-    ".vtt": ["subtitle"],
-    ".ass": ["subtitle"],
-    ".ssa": ["subtitle"],
-    ".sub": ["subtitle"],
+    ".srt": ("subtitle",),
+    ".vtt": ("subtitle",),
+    ".ass": ("subtitle",),
+    ".ssa": ("subtitle",),
+    ".sub": ("subtitle",),
 
     # 3D / Design
-    ".psd": ["design", "photoshop"],
-    ".ai": ["design", "illustrator"],
-    ".sketch": ["design"],
-    ".fig": ["design"],
-    ".blend": ["3d"],
-    ".obj": ["3d"],
-    ".fbx": ["3d"],
-    ".stl": ["3d"],
+    ".psd": ("design", "photoshop"),
+    ".ai": ("design", "illustrator"),
+    ".sketch": ("design",),
+    ".fig": ("design",),
+    ".blend": ("3d",),
+    ".obj": ("3d",),
+    ".fbx": ("3d",),
+    ".stl": ("3d",),
 
     # Executables / System
-    ".exe": ["executable"],
-    ".msi": ["executable", "installer"],
-    ".deb": ["executable", "installer"],
-    ".rpm": ["executable", "installer"],
-    ".apk": ["executable", "mobile"],
-    ".app": ["executable"],
-    ".dll": ["system"],
-    ".so": ["system"],
-    ".dylib": ["system"],
+    ".exe": ("executable",),
+    ".msi": ("executable", "installer"),
+    ".deb": ("executable", "installer"),
+    ".rpm": ("executable", "installer"),
+    ".apk": ("executable", "mobile"),
+    ".app": ("executable",),
+    ".dll": ("system",),
+    ".so": ("system",),
+    ".dylib": ("system",),
 }
 
+# Frozen copies so categorize_file can merge them with a C-level set union
+_EXT_TAGS = {ext: frozenset(tags) for ext, tags in EXTENSION_CATEGORIES.items()}
+_EXT_GET = _EXT_TAGS.get
+
+# MIME top-level type -> tags (fallback when the extension is unknown)
+_MIME_PREFIX_TAGS = {
+    "video": frozenset(("media", "video")),
+    "audio": frozenset(("media", "audio")),
+    "image": frozenset(("media", "image")),
+    "text": frozenset(("text",)),
+}
+_HUGE_TAGS = frozenset(("huge", "large"))
+
 # Size thresholds
 SIZE_LARGE_GB = 1
 SIZE_HUGE_GB = 10
+_LARGE_BYTES = SIZE_LARGE_GB * 1024 ** 3
+_HUGE_BYTES = SIZE_HUGE_GB * 1024 ** 3
 
 # Age threshold for "old" tag (days)
 OLD_THRESHOLD_DAYS = 365 * 3  # 3 years
+# Whole days are counted, so "older than N days" means at least N+1 days of seconds
+_OLD_THRESHOLD_SECS = (OLD_THRESHOLD_DAYS + 1) * 86400
+
+# Name-based heuristics: tag -> substrings that trigger it
+NAME_KEYWORDS = {
+    "backup": ("backup", "bak", "old", "copy"),
+    "temporary": ("temp", "tmp", "cache"),
+    "documentation": ("readme", "changelog", "license", "contributing"),
+    "screenshot": ("screenshot", "screen shot", "capture"),
+}
+
+# All keyword buckets compiled into one pattern. The alternation sits inside a
+# zero-width lookahead so every start position is tried and overlapping
+# keywords from different buckets are still reported, in a single C-level pass.
+_NAME_KEYWORD_RE = re.compile(
+    "(?="
+    + "|".join(
+        f"(?P<{tag}>{'|'.join(re.escape(kw) for kw in keywords)})"
+        for tag, keywords in NAME_KEYWORDS.items()
+    )
+    + ")"
+)
+
+# First characters of every keyword. A name containing none of them cannot
+# match, which lets the common no-match case skip the regex entirely.
+_NAME_KEYWORD_FIRST_CHARS = frozenset(
+    kw[0] for keywords in NAME_KEYWORDS.values() for kw in keywords
+)
+
+
+def file_ext(filename: str) -> str:
+    """Lowercased extension including the dot, matching ``PurePath.suffix``.
+
+    A leading dot (``.bashrc``) or trailing dot (``name.``) yields no
+    extension, and only the last path component is considered.
+    """
+    i = filename.rfind(".")
+    if i <= 0 or i == len(filename) - 1:
+        return ""
+    sep = filename.rfind("/")
+    if i <= sep + 1:
+        return ""
+    return filename[i:].lower()
+
+
+@lru_cache(maxsize=4096)
+def _type_tags(ext: str, mime_type: str | None) -> frozenset[str]:
+    """Extension-based tags plus the MIME-based fallback for one (ext, mime) pair.
+
+    A share holds only a few hundred distinct pairs, so after warm-up this
+    is a single cache hit per file.
+    """
+    tags = _EXT_GET(ext) or frozenset()
+    if mime_type:
+        mime_tags = _MIME_PREFIX_TAGS.get(mime_type.partition("/")[0])
+        if mime_tags:
+            tags = tags | mime_tags
+        elif mime_type == "application/pdf":
+            tags = tags | {"document"}
+    return tags
+
+
+def _parse_mtime(modified_at: str | None) -> float | None:
+    """ISO-8601 timestamp to epoch seconds; None if missing, naive or invalid."""
+    if not modified_at:
+        return None
+    try:
+        # fromisoformat accepts a trailing "Z" natively since Python 3.11
+        mtime = datetime.fromisoformat(modified_at)
+    except (ValueError, TypeError):
+        return None
+    if mtime.tzinfo is None:
+        return None
+    return mtime.timestamp()
 
 
 def categorize_file(
@@ -171,66 +263,83 @@ def categorize_file(
     mime_type: str | None,
     size: int,
     modified_at: str | None,
+    now_ts: float | None = None,
 ) -> list[str]:
     """
     Apply all categorization rules to a file.
     Returns list of tags.
+
+    Batch callers should pass ``now_ts`` (a ``time.time()`` taken once per
+    batch) so the age check is plain float arithmetic.
     """
-    tags = set()
+    return categorize_file_fast(
+        file_ext(filename),
+        mime_type,
+        size,
+        _parse_mtime(modified_at),
+        filename.lower(),
+        now_ts,
+    )
 
-    # 1. Extension-based categorization
-    ext = Path(filename).suffix.lower()
-    if ext in EXTENSION_CATEGORIES:
-        tags.update(EXTENSION_CATEGORIES[ext])
 
-    # 2. MIME-based categorization (fallback)
-    if mime_type:
-        if mime_type.startswith("video/"):
-            tags.update(["media", "video"])
-        elif mime_type.startswith("audio/"):
-            tags.update(["media", "audio"])
-        elif mime_type.startswith("image/"):
-            tags.update(["media", "image"])
-        elif mime_type.startswith("text/"):
-            tags.add("text")
-        elif mime_type == "application/pdf":
-            tags.add("document")
+def categorize_file_fast(
+    ext: str,
+    mime_type: str | None,
+    size: int,
+    mtime_ts: float | None,
+    name_lower: str,
+    now_ts: float | None = None,
+) -> list[str]:
+    """
+    Same rules as ``categorize_file`` on pre-parsed inputs: lowercased
+    extension (with dot), epoch mtime and lowercased name. Lets the scanner
+    feed values straight from ``stat`` without formatting and re-parsing.
+    """
+    # 1-2. Extension and MIME tags (memoized per distinct pair)
+    tags = set(_type_tags(ext, mime_type))
 
     # 3. Size-based tags
-    size_gb = size / (1024 ** 3)
-    if size_gb >= SIZE_HUGE_GB:
-        tags.update(["huge", "large"])
-    elif size_gb >= SIZE_LARGE_GB:
+    if size >= _HUGE_BYTES:
+        tags |= _HUGE_TAGS
+    elif size >= _LARGE_BYTES:
         tags.add("large")
     elif size == 0:
         tags.add("empty")
 
     # 4. Age-based tags
-    if modified_at:
-        try:
-            mtime = datetime.fromisoformat(modified_at.replace("Z", "+00:00"))
-            age_days = (datetime.now(timezone.utc) - mtime).days
-            if age_days > OLD_THRESHOLD_DAYS:
-                tags.add("old")
-        except (ValueError, TypeError):
-            pass
+    if mtime_ts is not None:
+        if now_ts is None:
+            now_ts = time.time()
+        if now_ts - mtime_ts >= _OLD_THRESHOLD_SECS:
+            tags.add("old")
 
     # 5. Name-based heuristics
-    name_lower = filename.lower()
-
     if name_lower.startswith("."):
         tags.add("hidden")
 
-    if any(kw in name_lower for kw in ("backup", "bak", "old", "copy")):
-        tags.add("backup")
+    if not _NAME_KEYWORD_FIRST_CHARS.isdisjoint(name_lower):
+        for match in _NAME_KEYWORD_RE.finditer(name_lower):
+            tags.add(match.lastgroup)
 
-    if any(kw in name_lower for kw in ("temp", "tmp", "cache")):
-        tags.add("temporary")
-
-    if any(kw in name_lower for kw in ("readme", "changelog", "license", "contributing")):
-        tags.add("documentation")
+    return sorted(tags)
 
-    if any(kw in name_lower for kw in ("screenshot", "screen shot", "capture")):
-        tags.add("screenshot")
 
-    return sorted(tags)
+def categorize_batch(
+    rows: Iterable[tuple[str, str | None, int, str | None]],
+    now_ts: float | None = None,
+) -> list[list[str]]:
+    """
+    Categorize many files at once.
+    ``rows`` yields (filename, mime_type, size, modified_at) tuples; returns
+    one tag list per row, empty for rows that fail to categorize.
+    """
+    if now_ts is None:
+        now_ts = time.time()
+    results = []
+    append = results.append
+    for filename, mime_type, size, modified_at in rows:
+        try:
+            append(categorize_file(filename, mime_type, size, modified_at, now_ts))
+        except Exception:
+            append([])
+    return results
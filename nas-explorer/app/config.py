@@ -19,6 +19,7 @@ class Settings(BaseSettings):
 
     # Cache
     cache_path: str = "./cache/previews"
+    insights_cache_ttl: int = 60  # Seconds to reuse dashboard/insight responses (0 = off)
 
     # Server
     host: str = "0.0.0.0"
@@ -29,7 +30,10 @@ class Settings(BaseSettings):
     max_text_extract_mb: int = 100
     max_text_store_kb: int = 50
     hash_sample_size_kb: int = 64
+    hash_algorithm: str = "sha256"  # Sample hash for duplicate detection: sha256 or blake3 (needs the blake3 package)
     enrichment_workers: int = 4  # Parallel threads for hash/text/metadata extraction
+    extract_cache_enabled: bool = True  # Reuse hash/text/metadata of unchanged files on rescan
+    bulk_synchronous_off: bool = False  # Skip fsync during bulk index writes (faster, less durable)
 
     # SSL (optional)
     ssl_cert_path: Optional[str] = None
@@ -10,6 +10,7 @@ from __future__ import annotations
 
 import os
 import logging
+from functools import lru_cache
 from pathlib import Path
 
 from cryptography.fernet import Fernet, InvalidToken
@@ -52,13 +53,25 @@ def _get_fernet() -> Fernet:
     return _fernet
 
 
+def encrypt_bytes(data: bytes) -> bytes:
+    """Encrypt raw bytes. Returns the bare Fernet token (no prefix)."""
+    return _get_fernet().encrypt(data)
+
+
+def decrypt_bytes(token: bytes) -> bytes:
+    """Decrypt a bare Fernet token produced by encrypt_bytes."""
+    try:
+        return _get_fernet().decrypt(token)
+    except InvalidToken:
+        logger.error("Failed to decrypt credential — key may have changed")
+        raise ValueError("Decryption failed. The encryption key may have been deleted or changed.")
+
+
 def encrypt(plaintext: str) -> str:
     """Encrypt a string. Returns prefixed ciphertext."""
     if not plaintext:
         return plaintext
-    f = _get_fernet()
-    token = f.encrypt(plaintext.encode("utf-8"))
-    return _ENCRYPTED_PREFIX + token.decode("ascii")
+    return _ENCRYPTED_PREFIX + encrypt_bytes(plaintext.encode("utf-8")).decode("ascii")
 
 
 def decrypt(value: str) -> str:
@@ -68,15 +81,29 @@ def decrypt(value: str) -> str:
     if not value.startswith(_ENCRYPTED_PREFIX):
         # Plaintext — not yet migrated
         return value
-    f = _get_fernet()
     try:
-        token = value[len(_ENCRYPTED_PREFIX):].encode("ascii")
-        return f.decrypt(token).decode("utf-8")
+        return _decrypt_token(_get_fernet(), value[len(_ENCRYPTED_PREFIX):])
     except InvalidToken:
         logger.error("Failed to decrypt credential — key may have changed")
         raise ValueError("Decryption failed. The encryption key may have been deleted or changed.")
 
 
+@lru_cache(maxsize=512)
+def _decrypt_token(f: Fernet, token: str) -> str:
+    """Decrypt a token with the given cipher, memoized.
+
+    The same stored credentials are decrypted on every config load. Keying
+    the cache on the Fernet instance means a reloaded key never serves a
+    stale plaintext. Failures raise and are therefore never cached.
+    """
+    return f.decrypt(token.encode("ascii")).decode("utf-8")
+
+
+def clear_decrypt_cache():
+    """Forget memoized plaintexts, e.g. after credentials are rewritten."""
+    _decrypt_token.cache_clear()
+
+
 def is_encrypted(value: str) -> bool:
     """Check if a value is already encrypted."""
     return bool(value) and value.startswith(_ENCRYPTED_PREFIX)
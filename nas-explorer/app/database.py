@@ -1,6 +1,9 @@
 """SQLite database with FTS5 for full-text search."""
 from __future__ import annotations
 
+import os
+import asyncio
+import queue
 import sqlite3
 import threading
 from contextlib import contextmanager
@@ -10,6 +13,11 @@ from .config import settings
 
 _local = threading.local()
 
+# Prepared statements kept per connection (sqlite3 default is 128). The
+# dashboard alone issues ~15 long queries; keep them all warm alongside
+# search, listing and scanner statements.
+STATEMENT_CACHE_SIZE = 256
+
 SCHEMA = """
 -- Core file index
 CREATE TABLE IF NOT EXISTS files (
@@ -28,12 +36,23 @@ CREATE TABLE IF NOT EXISTS files (
 );
 
 CREATE INDEX IF NOT EXISTS idx_files_parent ON files(parent_path);
+-- Directory listings (dirs first, then the sort column) in index order, one
+-- per common sort; the opposite direction only sorts within dirs/files
+CREATE INDEX IF NOT EXISTS idx_files_parent_dir_name ON files(parent_path, is_directory DESC, name);
+CREATE INDEX IF NOT EXISTS idx_files_parent_dir_size ON files(parent_path, is_directory DESC, size DESC);
+CREATE INDEX IF NOT EXISTS idx_files_parent_dir_mtime ON files(parent_path, is_directory DESC, modified_at DESC);
 CREATE INDEX IF NOT EXISTS idx_files_mime ON files(mime_type);
 CREATE INDEX IF NOT EXISTS idx_files_size ON files(size DESC);
 CREATE INDEX IF NOT EXISTS idx_files_modified ON files(modified_at DESC);
 CREATE INDEX IF NOT EXISTS idx_files_hash ON files(file_hash);
 CREATE INDEX IF NOT EXISTS idx_files_is_dir ON files(is_directory);
 CREATE INDEX IF NOT EXISTS idx_files_name ON files(name);
+-- Case-insensitive name-prefix range for search suggestions (LIKE 'q%')
+CREATE INDEX IF NOT EXISTS idx_files_name_nocase ON files(name COLLATE NOCASE) WHERE is_directory = 0;
+-- is_directory rides along so the median walk is covering
+CREATE INDEX IF NOT EXISTS idx_files_nondir_size ON files(size, is_directory) WHERE is_directory = 0;
+-- Walked forwards or backwards for the recent/oldest top-N lists
+CREATE INDEX IF NOT EXISTS idx_files_nondir_modified ON files(modified_at) WHERE is_directory = 0;
 
 -- Full-text search
 CREATE VIRTUAL TABLE IF NOT EXISTS files_fts USING fts5(
@@ -56,7 +75,14 @@ CREATE TRIGGER IF NOT EXISTS files_ad AFTER DELETE ON files BEGIN
     VALUES ('delete', old.id, old.name, old.full_text, old.path);
 END;
 
-CREATE TRIGGER IF NOT EXISTS files_au AFTER UPDATE ON files BEGIN
+-- Only re-index when an FTS column actually changes; hash/size/mtime updates
+-- skip the tokenizer. Replaces the older unconditional files_au trigger.
+DROP TRIGGER IF EXISTS files_au;
+CREATE TRIGGER IF NOT EXISTS files_au_fts AFTER UPDATE OF name, full_text, path ON files
+WHEN old.name IS NOT new.name
+  OR old.full_text IS NOT new.full_text
+  OR old.path IS NOT new.path
+BEGIN
     INSERT INTO files_fts(files_fts, rowid, name, full_text, path)
     VALUES ('delete', old.id, old.name, old.full_text, old.path);
     INSERT INTO files_fts(rowid, name, full_text, path)
@@ -84,6 +110,17 @@ CREATE TABLE IF NOT EXISTS file_tags (
 CREATE INDEX IF NOT EXISTS idx_tags_file ON file_tags(file_id);
 CREATE INDEX IF NOT EXISTS idx_tags_tag ON file_tags(tag);
 
+-- Enrichment results keyed by file identity, reused when a rescan
+-- re-indexes a file whose size and mtime are unchanged
+CREATE TABLE IF NOT EXISTS extract_cache (
+    path TEXT PRIMARY KEY,
+    size INTEGER,
+    mtime TEXT,
+    file_hash TEXT,
+    full_text TEXT,
+    metadata TEXT  -- JSON string
+);
+
 -- Scan log
 CREATE TABLE IF NOT EXISTS scan_log (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -97,9 +134,308 @@ CREATE TABLE IF NOT EXISTS scan_log (
     errors INTEGER DEFAULT 0,
     error_log TEXT
 );
+
+-- Settings the indexed data was produced with (e.g. hash_algorithm), so a
+-- changed setting can invalidate what no longer matches
+CREATE TABLE IF NOT EXISTS index_meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+# Columns derived from path/name/mime_type at write time, so aggregates can
+# group/sort on indexed values instead of re-parsing every row. ALTER TABLE can
+# only add VIRTUAL generated columns; indexes on them store the computed values.
+GENERATED_COLUMNS = {
+    # Top-level folder, i.e. the source label ("/Movies/a/b.mkv" -> "Movies")
+    "source_root": """TEXT GENERATED ALWAYS AS (
+        CASE
+            WHEN SUBSTR(path, 1, 1) <> '/' THEN NULL
+            WHEN INSTR(SUBSTR(path, 2), '/') > 0
+            THEN SUBSTR(path, 2, INSTR(SUBSTR(path, 2), '/') - 1)
+            ELSE SUBSTR(path, 2)
+        END) VIRTUAL""",
+    # Number of '/' separators in the path
+    "path_depth": """INTEGER GENERATED ALWAYS AS (
+        LENGTH(path) - LENGTH(REPLACE(path, '/', ''))) VIRTUAL""",
+    # Lower-cased extension from the first dot ("a.tar.gz" -> ".tar.gz")
+    "ext": """TEXT GENERATED ALWAYS AS (
+        CASE WHEN INSTR(name, '.') > 0 THEN LOWER(SUBSTR(name, INSTR(name, '.'))) END) VIRTUAL""",
+    # Dashboard "by type" bucket
+    "mime_category": """TEXT GENERATED ALWAYS AS (
+        CASE
+            WHEN mime_type LIKE 'video/%' THEN 'Video'
+            WHEN mime_type LIKE 'audio/%' THEN 'Audio'
+            WHEN mime_type LIKE 'image/%' THEN 'Image'
+            WHEN mime_type LIKE 'text/%' THEN 'Text'
+            WHEN mime_type IN ('application/pdf') THEN 'PDF'
+            WHEN mime_type LIKE '%document%' OR mime_type LIKE '%word%' THEN 'Document'
+            WHEN mime_type LIKE '%spreadsheet%' OR mime_type LIKE '%excel%' THEN 'Spreadsheet'
+            WHEN mime_type LIKE '%presentation%' OR mime_type LIKE '%powerpoint%' THEN 'Presentation'
+            WHEN mime_type LIKE '%zip%' OR mime_type LIKE '%compressed%' OR mime_type LIKE '%archive%' THEN 'Archive'
+            WHEN mime_type = 'inode/directory' THEN 'Directory'
+            ELSE 'Other'
+        END) VIRTUAL""",
+    # 'video' / 'audio' / 'image' for media files, else NULL
+    "media_kind": """TEXT GENERATED ALWAYS AS (
+        CASE
+            WHEN mime_type LIKE 'video/%' THEN 'video'
+            WHEN mime_type LIKE 'audio/%' THEN 'audio'
+            WHEN mime_type LIKE 'image/%' THEN 'image'
+        END) VIRTUAL""",
+    # YYYY-MM of modified_at, for month grouping
+    "modified_month": """TEXT GENERATED ALWAYS AS (SUBSTR(modified_at, 1, 7)) VIRTUAL""",
+}
+
+# Same idea for file_metadata: the media duration is read out of the JSON once
+# at write time (into the index) rather than json_extract'ed per dashboard load.
+# The extractor writes duration_secs; a bare duration is accepted as well.
+METADATA_GENERATED_COLUMNS = {
+    "duration_sec": """REAL GENERATED ALWAYS AS (
+        CASE WHEN json_valid(metadata)
+        THEN CAST(COALESCE(json_extract(metadata, '$.duration_secs'),
+                           json_extract(metadata, '$.duration')) AS REAL) END) VIRTUAL""",
+}
+
+GENERATED_INDEXES = """
+CREATE INDEX IF NOT EXISTS idx_files_source ON files(source_root, size) WHERE is_directory = 0;
+CREATE INDEX IF NOT EXISTS idx_files_depth ON files(path_depth DESC) WHERE is_directory = 0;
+CREATE INDEX IF NOT EXISTS idx_files_ext ON files(ext, size) WHERE is_directory = 0 AND ext IS NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_files_mime_cat ON files(mime_category, size) WHERE is_directory = 0;
+CREATE INDEX IF NOT EXISTS idx_files_media ON files(media_kind, size) WHERE is_directory = 0 AND media_kind IS NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_files_month ON files(modified_month, modified_at, size) WHERE is_directory = 0 AND modified_at IS NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_metadata_duration ON file_metadata(file_id, duration_sec) WHERE duration_sec IS NOT NULL;
+"""
+
+
+# ─── Materialized dashboard aggregates ──────────────────────────────────
+# Kept current by triggers on files so the dashboard reads a handful of small
+# rows instead of re-aggregating the whole table. REPLACE deletes only fire
+# the delete trigger with recursive_triggers on (see get_connection).
+
+AGGREGATE_TABLES = """
+CREATE TABLE IF NOT EXISTS stats_cache (
+    key TEXT PRIMARY KEY,  -- total_size, total_files, total_directories, empty_files
+    value INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS agg_by_category (
+    category TEXT PRIMARY KEY,
+    n INTEGER NOT NULL,
+    total_size INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS agg_by_ext (
+    ext TEXT PRIMARY KEY,
+    n INTEGER NOT NULL,
+    total_size INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS agg_by_month (
+    month TEXT PRIMARY KEY,  -- YYYY-MM of modified_at
+    n INTEGER NOT NULL,
+    total_size INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS agg_dup (
+    file_hash TEXT PRIMARY KEY,
+    n INTEGER NOT NULL,
+    size INTEGER
+);
+-- Per-folder totals for the treemap / forgotten-folders insights. dated_*
+-- only count files with a modified_at, which is what "forgotten" looks at.
+CREATE TABLE IF NOT EXISTS folder_rollup (
+    parent_path TEXT PRIMARY KEY,
+    file_count INTEGER NOT NULL,
+    total_size INTEGER NOT NULL,
+    dated_count INTEGER NOT NULL,
+    dated_size INTEGER NOT NULL,
+    last_modified TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_rollup_size ON folder_rollup(total_size DESC);
+"""
+
+# Space lost to each duplicate group; indexed over the duplicate groups only,
+# so the top-N and the totals never visit the (far more numerous) unique hashes.
+DUP_GENERATED_COLUMNS = {
+    "wasted_bytes": "INTEGER GENERATED ALWAYS AS ((n - 1) * size) VIRTUAL",
+}
+
+AGGREGATE_INDEXES = """
+CREATE INDEX IF NOT EXISTS idx_dup_wasted ON agg_dup(wasted_bytes DESC) WHERE n > 1;
+"""
+
+
+def _aggregate_delta(row: str, sign: str) -> str:
+    """Trigger body adding (sign '+') or removing (sign '-') one files row."""
+    buckets = [
+        ("agg_by_category", "category", f"{row}.mime_category", "1"),
+        ("agg_by_ext", "ext", f"{row}.ext", f"{row}.ext IS NOT NULL"),
+        ("agg_by_month", "month", f"{row}.modified_month", f"{row}.modified_at IS NOT NULL"),
+    ]
+    sql = f"""
+    UPDATE stats_cache SET value = value {sign} CASE key
+        WHEN 'total_size' THEN CASE WHEN {row}.is_directory = 0 THEN COALESCE({row}.size, 0) ELSE 0 END
+        WHEN 'total_files' THEN {row}.is_directory = 0
+        WHEN 'total_directories' THEN {row}.is_directory = 1
+        WHEN 'empty_files' THEN IFNULL({row}.is_directory = 0 AND {row}.size = 0, 0)
+    END;"""
+    for table, col, expr, cond in buckets:
+        sql += f"""
+    INSERT INTO {table} ({col}, n, total_size)
+    SELECT {expr}, {sign}1, {sign}COALESCE({row}.size, 0)
+    WHERE {row}.is_directory = 0 AND {cond}
+    ON CONFLICT({col}) DO UPDATE SET n = n + excluded.n, total_size = total_size + excluded.total_size;"""
+    sql += f"""
+    INSERT INTO agg_dup (file_hash, n, size)
+    SELECT {row}.file_hash, {sign}1, {row}.size
+    WHERE {row}.is_directory = 0 AND {row}.file_hash IS NOT NULL
+    ON CONFLICT(file_hash) DO UPDATE SET
+        n = n + excluded.n,
+        size = CASE WHEN excluded.n > 0 THEN excluded.size ELSE size END;"""
+    if sign == "-":
+        for table, col, expr, _ in buckets:
+            sql += f"""
+    DELETE FROM {table} WHERE {col} = {expr} AND n <= 0;"""
+        sql += f"""
+    DELETE FROM agg_dup WHERE file_hash = {row}.file_hash AND n <= 0;"""
+    return sql
+
+
+def _rollup_delta(row: str, sign: str) -> str:
+    """Trigger body adding or removing one files row from folder_rollup.
+
+    last_modified is a running max, so it can't be decremented; on removal it
+    is recomputed for that one folder when the removed row held the max.
+    """
+    sql = f"""
+    INSERT INTO folder_rollup (parent_path, file_count, total_size, dated_count, dated_size, last_modified)
+    SELECT {row}.parent_path, {sign}1, {sign}COALESCE({row}.size, 0),
+           {sign}({row}.modified_at IS NOT NULL),
+           {sign}CASE WHEN {row}.modified_at IS NOT NULL THEN COALESCE({row}.size, 0) ELSE 0 END,
+           {row}.modified_at
+    WHERE {row}.is_directory = 0 AND {row}.parent_path IS NOT NULL
+    ON CONFLICT(parent_path) DO UPDATE SET
+        file_count = file_count + excluded.file_count,
+        total_size = total_size + excluded.total_size,
+        dated_count = dated_count + excluded.dated_count,
+        dated_size = dated_size + excluded.dated_size"""
+    if sign == "+":
+        return sql + """,
+        last_modified = CASE WHEN last_modified IS NULL OR excluded.last_modified > last_modified
+                             THEN excluded.last_modified ELSE last_modified END;"""
+    return sql + f""";
+    UPDATE folder_rollup SET last_modified = (
+        SELECT MAX(modified_at) FROM files
+        WHERE parent_path = {row}.parent_path AND is_directory = 0)
+    WHERE parent_path = {row}.parent_path AND last_modified = {row}.modified_at;
+    DELETE FROM folder_rollup WHERE parent_path = {row}.parent_path AND file_count <= 0;"""
+
+
+_AGG_COLUMNS = ("is_directory", "size", "mime_type", "name", "modified_at", "file_hash")
+_ROLLUP_COLUMNS = ("is_directory", "size", "modified_at", "parent_path")
+
+AGGREGATE_TRIGGERS = f"""
+CREATE TRIGGER IF NOT EXISTS files_agg_ai AFTER INSERT ON files BEGIN{_aggregate_delta("new", "+")}
+END;
+
+CREATE TRIGGER IF NOT EXISTS files_agg_ad AFTER DELETE ON files BEGIN{_aggregate_delta("old", "-")}
+END;
+
+CREATE TRIGGER IF NOT EXISTS files_agg_au AFTER UPDATE OF {", ".join(_AGG_COLUMNS)} ON files
+WHEN {" OR ".join(f"old.{c} IS NOT new.{c}" for c in _AGG_COLUMNS)}
+BEGIN{_aggregate_delta("old", "-")}{_aggregate_delta("new", "+")}
+END;
+
+CREATE TRIGGER IF NOT EXISTS files_rollup_ai AFTER INSERT ON files BEGIN{_rollup_delta("new", "+")}
+END;
+
+CREATE TRIGGER IF NOT EXISTS files_rollup_ad AFTER DELETE ON files BEGIN{_rollup_delta("old", "-")}
+END;
+
+CREATE TRIGGER IF NOT EXISTS files_rollup_au AFTER UPDATE OF {", ".join(_ROLLUP_COLUMNS)} ON files
+WHEN {" OR ".join(f"old.{c} IS NOT new.{c}" for c in _ROLLUP_COLUMNS)}
+BEGIN{_rollup_delta("old", "-")}{_rollup_delta("new", "+")}
+END;
 """
 
 
+def rebuild_aggregates(conn: sqlite3.Connection):
+    """Recompute the materialized aggregates from the files table."""
+    conn.executescript("""
+        DELETE FROM stats_cache;
+        INSERT INTO stats_cache (key, value)
+        SELECT 'total_size', COALESCE(SUM(CASE WHEN is_directory = 0 THEN size ELSE 0 END), 0) FROM files
+        UNION ALL
+        SELECT 'total_files', COALESCE(SUM(is_directory = 0), 0) FROM files
+        UNION ALL
+        SELECT 'total_directories', COALESCE(SUM(is_directory = 1), 0) FROM files
+        UNION ALL
+        SELECT 'empty_files', COALESCE(SUM(is_directory = 0 AND size = 0), 0) FROM files;
+
+        DELETE FROM agg_by_category;
+        INSERT INTO agg_by_category (category, n, total_size)
+        SELECT mime_category, COUNT(*), COALESCE(SUM(size), 0)
+        FROM files WHERE is_directory = 0 GROUP BY mime_category;
+
+        DELETE FROM agg_by_ext;
+        INSERT INTO agg_by_ext (ext, n, total_size)
+        SELECT ext, COUNT(*), COALESCE(SUM(size), 0)
+        FROM files WHERE is_directory = 0 AND ext IS NOT NULL GROUP BY ext;
+
+        DELETE FROM agg_by_month;
+        INSERT INTO agg_by_month (month, n, total_size)
+        SELECT modified_month, COUNT(*), COALESCE(SUM(size), 0)
+        FROM files WHERE is_directory = 0 AND modified_at IS NOT NULL GROUP BY modified_month;
+
+        DELETE FROM agg_dup;
+        INSERT INTO agg_dup (file_hash, n, size)
+        SELECT file_hash, COUNT(*), MAX(size)
+        FROM files WHERE is_directory = 0 AND file_hash IS NOT NULL GROUP BY file_hash;
+
+        DELETE FROM folder_rollup;
+        INSERT INTO folder_rollup
+            (parent_path, file_count, total_size, dated_count, dated_size, last_modified)
+        SELECT parent_path, COUNT(*), COALESCE(SUM(size), 0),
+               COUNT(modified_at), COALESCE(SUM(CASE WHEN modified_at IS NOT NULL THEN size END), 0),
+               MAX(modified_at)
+        FROM files WHERE is_directory = 0 AND parent_path IS NOT NULL GROUP BY parent_path;
+    """)
+
+
+def _add_generated_columns(conn: sqlite3.Connection, table: str, columns: dict):
+    existing = {r[1] for r in conn.execute(f"PRAGMA table_xinfo({table})")}
+    for name, decl in columns.items():
+        if name not in existing:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {name} {decl}")
+
+
+def _drop_stale_duration_column(conn: sqlite3.Connection):
+    """Drop a duration_sec column that reads only '$.duration', which the
+    extractor never writes, so _add_generated_columns re-adds it."""
+    table_sql = conn.execute(
+        "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'file_metadata'"
+    ).fetchone()[0]
+    if "duration_sec" in table_sql and "$.duration_secs" not in table_sql:
+        conn.execute("DROP INDEX IF EXISTS idx_metadata_duration")
+        conn.execute("ALTER TABLE file_metadata DROP COLUMN duration_sec")
+
+
+def _apply_schema(conn: sqlite3.Connection):
+    """Create tables, then add any generated columns and aggregates an older DB lacks."""
+    conn.executescript(SCHEMA)
+    _add_generated_columns(conn, "files", GENERATED_COLUMNS)
+    _drop_stale_duration_column(conn)
+    _add_generated_columns(conn, "file_metadata", METADATA_GENERATED_COLUMNS)
+    conn.executescript(GENERATED_INDEXES)
+
+    had_aggregates = conn.execute(
+        "SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' "
+        "AND name IN ('stats_cache', 'folder_rollup')"
+    ).fetchone()[0] == 2
+    conn.executescript(AGGREGATE_TABLES + AGGREGATE_TRIGGERS)
+    _add_generated_columns(conn, "agg_dup", DUP_GENERATED_COLUMNS)
+    conn.executescript(AGGREGATE_INDEXES)
+    if not had_aggregates:
+        rebuild_aggregates(conn)
+
+
 _init_done = set()  # Track which DB files have been initialized
 
 
@@ -108,20 +444,91 @@ def get_connection() -> sqlite3.Connection:
     if not hasattr(_local, "conn") or _local.conn is None:
         db_path = Path(settings.database_path)
         db_path.parent.mkdir(parents=True, exist_ok=True)
-        _local.conn = sqlite3.connect(str(db_path), check_same_thread=False)
+        _local.conn = sqlite3.connect(
+            str(db_path), check_same_thread=False, cached_statements=STATEMENT_CACHE_SIZE
+        )
         _local.conn.row_factory = sqlite3.Row
         _local.conn.execute("PRAGMA journal_mode=WAL")
         _local.conn.execute("PRAGMA synchronous=NORMAL")
         _local.conn.execute("PRAGMA cache_size=-64000")  # 64MB cache
+        _local.conn.execute("PRAGMA temp_store=MEMORY")  # temp tables/sorts (e.g. remove_source)
+        _local.conn.execute("PRAGMA mmap_size=268435456")  # 256MB memory-mapped reads
         _local.conn.execute("PRAGMA foreign_keys=ON")
+        # INSERT OR REPLACE must fire delete triggers (FTS + aggregates)
+        _local.conn.execute("PRAGMA recursive_triggers=ON")
         # Auto-init schema on first connection to this DB
         db_str = str(db_path)
         if db_str not in _init_done:
-            _local.conn.executescript(SCHEMA)
+            _apply_schema(_local.conn)
             _init_done.add(db_str)
     return _local.conn
 
 
+# ─── Read-only connection pool ───────────────────────────────────────────
+# WAL lets readers run alongside the writer, so read queries use their own
+# read-only connections instead of the per-thread writer connection.
+
+READ_POOL_SIZE = min(32, (os.cpu_count() or 1) * 4)
+_read_pools: dict[str, queue.LifoQueue] = {}
+_read_pools_lock = threading.Lock()
+
+
+def _open_read_connection(db_str: str) -> sqlite3.Connection:
+    uri = Path(db_str).resolve().as_uri() + "?mode=ro"
+    conn = sqlite3.connect(
+        uri, uri=True, check_same_thread=False, cached_statements=STATEMENT_CACHE_SIZE
+    )
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA query_only=ON")
+    conn.execute("PRAGMA cache_size=-16000")  # 16MB per reader
+    conn.execute("PRAGMA temp_store=MEMORY")  # GROUP BY / ORDER BY sorts
+    conn.execute("PRAGMA mmap_size=268435456")  # reads straight from the page cache
+    return conn
+
+
+@contextmanager
+def read_connection():
+    """Borrow a read-only connection from the pool for the current database."""
+    db_str = str(Path(settings.database_path))
+    if db_str not in _init_done:
+        get_connection()  # creates the file and schema
+    with _read_pools_lock:
+        pool = _read_pools.get(db_str)
+        if pool is None:
+            pool = _read_pools[db_str] = queue.LifoQueue(maxsize=READ_POOL_SIZE)
+    try:
+        conn = pool.get_nowait()
+    except queue.Empty:
+        conn = _open_read_connection(db_str)
+    try:
+        yield conn
+    finally:
+        if conn.in_transaction:
+            conn.rollback()
+        try:
+            pool.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+
+def optimize_db():
+    """Refresh planner statistics that SQLite considers stale (shutdown)."""
+    get_connection().execute("PRAGMA optimize")
+
+
+def close_read_pools():
+    """Close all pooled read connections (shutdown / tests)."""
+    with _read_pools_lock:
+        pools = list(_read_pools.values())
+        _read_pools.clear()
+    for pool in pools:
+        while True:
+            try:
+                pool.get_nowait().close()
+            except queue.Empty:
+                break
+
+
 @contextmanager
 def get_db():
     """Context manager for database operations."""
@@ -137,27 +544,115 @@ def get_db():
 def init_db():
     """Initialize database schema."""
     with get_db() as conn:
-        conn.executescript(SCHEMA)
+        _apply_schema(conn)
+
+
+# The files columns FileItem reads, for routes that build FileItems. Leaves
+# out full_text (can be large) and the generated columns, which f.* would
+# decode or compute for every row.
+FILE_COLUMNS = (
+    "f.id, f.path, f.name, f.parent_path, f.is_directory, f.size, f.mime_type, "
+    "f.file_hash, f.created_at, f.modified_at, f.indexed_at"
+)
+
+# Select-list column with a files row's tags (aliased f), read back by
+# FileItem.from_row, so a page of files plus tags is one query.
+TAGS_CSV = "(SELECT GROUP_CONCAT(tag, ',') FROM file_tags WHERE file_id = f.id) AS tags_csv"
+
+
+def _fetch_dicts(cursor: sqlite3.Cursor, sql: str, params: tuple) -> list[dict]:
+    # Plain tuples: the rows are zipped into dicts anyway, so skip building
+    # an intermediate sqlite3.Row per row.
+    cursor.row_factory = None
+    cursor.execute(sql, params)
+    if not cursor.description:
+        return []
+    columns = [d[0] for d in cursor.description]
+    return [dict(zip(columns, row)) for row in cursor.fetchall()]
 
 
 def query(sql: str, params: tuple = ()) -> list[dict]:
     """Execute a query and return results as list of dicts."""
-    conn = get_connection()
-    cursor = conn.execute(sql, params)
-    columns = [d[0] for d in cursor.description] if cursor.description else []
-    return [dict(zip(columns, row)) for row in cursor.fetchall()]
+    with read_connection() as conn:
+        return _fetch_dicts(conn.cursor(), sql, params)
+
+
+def query_many(statements: list[tuple[str, tuple]]) -> list[list[dict]]:
+    """Run several queries on one connection in one read transaction.
+
+    Returns one list of dicts per (sql, params), all from the same snapshot,
+    for multi-panel views that should agree with each other.
+    """
+    with read_connection() as conn:
+        cursor = conn.cursor()
+        conn.execute("BEGIN")
+        try:
+            return [_fetch_dicts(cursor, sql, params) for sql, params in statements]
+        finally:
+            conn.rollback()  # read-only: nothing to commit
+
+
+def files_fingerprint() -> tuple:
+    """Cheap change marker for the files table: max rowid plus the
+    trigger-maintained totals. Index probes only, no scan."""
+    with read_connection() as conn:
+        return tuple(conn.execute(
+            "SELECT (SELECT MAX(rowid) FROM files), "
+            "(SELECT GROUP_CONCAT(value) FROM stats_cache)"
+        ).fetchone())
+
+
+async def aquery(sql: str, params: tuple = ()) -> list[dict]:
+    """query() on a worker thread, so independent queries can be gathered."""
+    return await asyncio.to_thread(query, sql, params)
+
+
+async def aquery_many(statements: list[tuple[str, tuple]]) -> list[list[dict]]:
+    """query_many() on a worker thread."""
+    return await asyncio.to_thread(query_many, statements)
+
 
+def query_rows(sql: str, params: tuple = ()) -> list[sqlite3.Row]:
+    """Execute a query and return the sqlite3.Row objects as-is (no dict copy)."""
+    with read_connection() as conn:
+        return conn.execute(sql, params).fetchall()
 
-def execute(sql: str, params: tuple = ()) -> int:
-    """Execute a statement and return lastrowid."""
+
+def execute(sql: str, params: tuple = (), commit: bool = True) -> int:
+    """Execute a statement and return lastrowid. Pass commit=False to batch."""
     conn = get_connection()
     cursor = conn.execute(sql, params)
-    conn.commit()
+    if commit:
+        conn.commit()
     return cursor.lastrowid
 
 
-def executemany(sql: str, params_list: list[tuple]):
+def executemany(sql: str, params_list: list[tuple], commit: bool = True):
     """Execute a statement with many parameter sets."""
     conn = get_connection()
     conn.executemany(sql, params_list)
-    conn.commit()
+    if commit:
+        conn.commit()
+
+
+@contextmanager
+def bulk(synchronous_off: bool | None = None):
+    """
+    Group many writes into one transaction with a single commit at exit.
+    With synchronous_off (default: settings.bulk_synchronous_off) the WAL is
+    not fsynced for the duration — faster, but a power loss may drop the batch.
+    """
+    if synchronous_off is None:
+        synchronous_off = settings.bulk_synchronous_off
+    conn = get_connection()
+    if synchronous_off:
+        conn.execute("PRAGMA synchronous=OFF")
+    try:
+        yield conn
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        if synchronous_off:
+            conn.execute("PRAGMA synchronous=NORMAL")
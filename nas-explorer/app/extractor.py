@@ -5,6 +5,7 @@ import os
 import json
 import subprocess
 import logging
+from itertools import chain, islice
 from pathlib import Path
 
 logger = logging.getLogger("nas_explorer.extractor")
@@ -12,29 +13,32 @@ logger = logging.getLogger("nas_explorer.extractor")
 
 # ─── Text Extraction ─────────────────────────────────────────────────────
 
+# Give up on a PDF whose first pages have no text layer (image-only scans)
+_PDF_TEXT_PROBE_PAGES = 3
+
+# MIME string -> (text extractor, metadata extractor), resolved once per
+# distinct MIME. A scan sees at most a few hundred of them.
+_MIME_DISPATCH: dict[str, tuple] = {}
+
+
+def _dispatch(mime_type: str) -> tuple:
+    entry = _MIME_DISPATCH.get(mime_type)
+    if entry is None:
+        text_fn = _MIME_TO_EXTRACTOR.get(mime_type)
+        if text_fn is None and mime_type.startswith("text/"):
+            text_fn = _extract_plaintext
+        meta_fn = _MIME_PREFIX_TO_META.get(mime_type.partition("/")[0])
+        entry = _MIME_DISPATCH[mime_type] = (text_fn, meta_fn)
+    return entry
+
+
 def extract_text(filepath: str, mime_type: str) -> str | None:
     """Extract searchable text from a file based on its MIME type."""
 
-    if mime_type == "application/pdf":
-        return _extract_pdf(filepath)
-
-    if mime_type in (
-        "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
-        "application/msword",
-    ):
-        return _extract_docx(filepath)
-
-    if mime_type in (
-        "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        "application/vnd.ms-excel",
-    ):
-        return _extract_xlsx(filepath)
-
-    if mime_type and (mime_type.startswith("text/") or mime_type in (
-        "application/json", "application/xml", "application/javascript",
-        "application/x-yaml", "application/x-python",
-    )):
-        return _extract_plaintext(filepath)
+    if mime_type:
+        extractor = _dispatch(mime_type)[0]
+        if extractor is not None:
+            return extractor(filepath)
 
     # Subtitle files
     ext = Path(filepath).suffix.lower()
@@ -50,10 +54,13 @@ def _extract_pdf(filepath: str) -> str | None:
         import pdfplumber
         text_parts = []
         with pdfplumber.open(filepath) as pdf:
-            for page in pdf.pages[:50]:  # Limit to 50 pages
+            for i, page in enumerate(pdf.pages[:50]):  # Limit to 50 pages
                 page_text = page.extract_text()
                 if page_text:
                     text_parts.append(page_text)
+                elif not text_parts and i + 1 >= _PDF_TEXT_PROBE_PAGES:
+                    # No text layer in the leading pages: most likely a scan
+                    break
         return "\n".join(text_parts) if text_parts else None
     except Exception as e:
         logger.debug(f"PDF extraction failed: {filepath}: {e}")
@@ -79,7 +86,33 @@ def _extract_docx(filepath: str) -> str | None:
 
 
 def _extract_xlsx(filepath: str) -> str | None:
-    """Extract text from Excel spreadsheets."""
+    """Extract text from Excel spreadsheets (calamine if installed, else openpyxl)."""
+    try:
+        from python_calamine import CalamineWorkbook
+    except ImportError:
+        return _extract_xlsx_openpyxl(filepath)
+
+    try:
+        wb = CalamineWorkbook.from_path(filepath)
+        text_parts = []
+        for sheet_name in wb.sheet_names[:10]:  # Limit sheets
+            rows = wb.get_sheet_by_name(sheet_name).to_python(skip_empty_area=True)
+            for row in islice(rows, 501):  # Same row limit as the openpyxl path
+                # calamine reports numeric cells as float; print 3.0 as "3" like openpyxl
+                cells = [
+                    str(int(c)) if isinstance(c, float) and c.is_integer() else str(c)
+                    for c in row if c is not None and c != ""
+                ]
+                if cells:
+                    text_parts.append(" ".join(cells))
+        return "\n".join(text_parts) if text_parts else None
+    except Exception as e:
+        logger.debug(f"Calamine extraction failed, trying openpyxl: {filepath}: {e}")
+        return _extract_xlsx_openpyxl(filepath)
+
+
+def _extract_xlsx_openpyxl(filepath: str) -> str | None:
+    """Extract text from Excel spreadsheets using openpyxl."""
     try:
         from openpyxl import load_workbook
         wb = load_workbook(filepath, read_only=True, data_only=True)
@@ -104,30 +137,57 @@ def _extract_xlsx(filepath: str) -> str | None:
 def _extract_plaintext(filepath: str, max_bytes: int = 512 * 1024) -> str | None:
     """Extract text from plain text files (with size limit)."""
     try:
-        size = os.path.getsize(filepath)
-        read_size = min(size, max_bytes)
-        with open(filepath, "r", encoding="utf-8", errors="replace") as f:
-            return f.read(read_size)
+        fd = os.open(filepath, os.O_RDONLY)
+        try:
+            size = min(os.fstat(fd).st_size, max_bytes)
+            if hasattr(os, "posix_fadvise"):
+                os.posix_fadvise(fd, 0, size, os.POSIX_FADV_SEQUENTIAL)
+            # Raw reads into one buffer, then a single decode — no TextIOWrapper
+            buf = bytearray(size)
+            view = memoryview(buf)
+            n = 0
+            while n < size:
+                k = os.readv(fd, [view[n:]])
+                if k == 0:
+                    break
+                n += k
+            return buf[:n].decode("utf-8", errors="replace")
+        finally:
+            os.close(fd)
     except Exception as e:
         logger.debug(f"Text extraction failed: {filepath}: {e}")
         return None
 
 
+# Exact MIME -> text extractor; any other text/* falls back to plaintext
+_MIME_TO_EXTRACTOR = {
+    "application/pdf": _extract_pdf,
+    "application/vnd.openxmlformats-officedocument.wordprocessingml.document": _extract_docx,
+    "application/msword": _extract_docx,
+    "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet": _extract_xlsx,
+    "application/vnd.ms-excel": _extract_xlsx,
+    "application/json": _extract_plaintext,
+    "application/xml": _extract_plaintext,
+    "application/javascript": _extract_plaintext,
+    "application/x-yaml": _extract_plaintext,
+    "application/x-python": _extract_plaintext,
+}
+
+
 # ─── Metadata Extraction ─────────────────────────────────────────────────
 
 def extract_metadata(filepath: str, mime_type: str) -> dict | None:
     """Extract rich metadata from media files."""
 
-    if mime_type and mime_type.startswith("image/"):
-        return _extract_image_meta(filepath)
+    if mime_type:
+        extractor = _dispatch(mime_type)[1]
+        if extractor is not None:
+            return extractor(filepath)
 
-    if mime_type and mime_type.startswith("video/"):
-        return _extract_video_meta(filepath)
+    return None
 
-    if mime_type and mime_type.startswith("audio/"):
-        return _extract_audio_meta(filepath)
 
-    return None
+_EXIF_FORMATS = frozenset({"JPEG", "MPO", "TIFF", "HEIF", "HEIC"})
 
 
 def _extract_image_meta(filepath: str) -> dict | None:
@@ -144,12 +204,17 @@ def _extract_image_meta(filepath: str) -> dict | None:
             "mode": img.mode,
         }
 
-        # Try EXIF
+        # Try EXIF (only formats that carry it in practice)
         try:
-            exif_data = img._getexif()
-            if exif_data:
+            if img.format in _EXIF_FORMATS:
+                exif_data = img.getexif()
+                # IFD0 plus the Exif sub-IFD — the same tags _getexif() merged
+                items = chain(exif_data.items(), exif_data.get_ifd(0x8769).items())
+            else:
+                items = ()
+            if items:
                 exif = {}
-                for tag_id, value in list(exif_data.items())[:20]:
+                for tag_id, value in islice(items, 20):
                     tag_name = TAGS.get(tag_id, str(tag_id))
                     # Only keep serializable values
                     if isinstance(value, (str, int, float)):
@@ -169,7 +234,42 @@ def _extract_image_meta(filepath: str) -> dict | None:
 
 
 def _extract_video_meta(filepath: str) -> dict | None:
-    """Extract video metadata using ffprobe."""
+    """Extract video metadata in-process with PyAV, falling back to ffprobe."""
+    try:
+        import av
+    except ImportError:
+        return _extract_video_meta_ffprobe(filepath)
+
+    try:
+        with av.open(filepath, metadata_errors="ignore") as container:
+            meta = {
+                "duration_secs": float(container.duration or 0) / av.time_base,
+                "bitrate": int(container.bit_rate or 0),
+                "format_name": container.format.long_name,
+            }
+
+            for stream in container.streams:
+                cc = stream.codec_context
+                if stream.type == "video":
+                    meta["video_codec"] = cc.name
+                    meta["width"] = cc.width
+                    meta["height"] = cc.height
+                    rate = stream.base_rate or stream.average_rate
+                    if rate:
+                        meta["fps"] = round(float(rate), 2)
+                elif stream.type == "audio":
+                    meta["audio_codec"] = cc.name
+                    meta["audio_channels"] = len(cc.layout.channels)
+                    meta["sample_rate"] = str(cc.sample_rate)  # ffprobe reports a string
+
+        return meta
+    except Exception as e:
+        logger.debug(f"PyAV video meta failed, trying ffprobe: {filepath}: {e}")
+        return _extract_video_meta_ffprobe(filepath)
+
+
+def _extract_video_meta_ffprobe(filepath: str) -> dict | None:
+    """Extract video metadata using an ffprobe subprocess."""
     try:
         result = subprocess.run(
             [
@@ -258,3 +358,11 @@ def _extract_audio_meta(filepath: str) -> dict | None:
     except Exception as e:
         logger.debug(f"Audio meta failed: {filepath}: {e}")
         return None
+
+
+# MIME top-level type -> metadata extractor
+_MIME_PREFIX_TO_META = {
+    "image": _extract_image_meta,
+    "video": _extract_video_meta,
+    "audio": _extract_audio_meta,
+}
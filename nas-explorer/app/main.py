@@ -47,6 +47,9 @@ async def lifespan(app: FastAPI):
     # Shutdown
     from .smb_fs import cleanup_all_temps
     cleanup_all_temps()
+    from .database import close_read_pools, optimize_db
+    close_read_pools()
+    optimize_db()
     logger.info("NAS Explorer shutting down.")
 
 
@@ -4,6 +4,15 @@ from __future__ import annotations
 from pydantic import BaseModel
 from typing import Optional, List
 
+# MIME types that get a preview_url. The exact set covers PDF plus the
+# most common image/video types so they match with one hash lookup.
+_PREVIEWABLE_PREFIXES = ("image/", "video/")
+_PREVIEWABLE_EXACT = frozenset({
+    "application/pdf",
+    "image/jpeg", "image/png", "image/webp", "image/gif",
+    "video/mp4", "video/webm", "video/quicktime", "video/x-matroska",
+})
+
 
 class FileItem(BaseModel):
     id: int
@@ -21,33 +30,70 @@ class FileItem(BaseModel):
     metadata: Optional[dict] = None
     preview_url: Optional[str] = None
 
-    @classmethod
-    def from_row(cls, row: dict, tags: Optional[List[str]] = None) -> "FileItem":
+    @staticmethod
+    def _row_fields(row: dict, tags: Optional[List[str]]) -> dict:
+        if tags is None:
+            # Routes select tags inline as GROUP_CONCAT(tag, ',') AS tags_csv
+            tags_csv = row.get("tags_csv")
+            tags = tags_csv.split(",") if tags_csv else []
         preview_url = None
         mime = row.get("mime_type") or ""
-        if mime.startswith(("image/", "video/")) or mime == "application/pdf":
-            preview_url = f"/api/preview/{row['id']}?size=medium"
-        return cls(
+        if mime in _PREVIEWABLE_EXACT or mime.startswith(_PREVIEWABLE_PREFIXES):
+            preview_url = "/api/preview/" + str(row["id"]) + "?size=medium"
+        return dict(
             id=row["id"],
             path=row["path"],
             name=row["name"],
             parent_path=row.get("parent_path"),
             is_directory=bool(row.get("is_directory", 0)),
-            size=row.get("size", 0),
+            size=row.get("size") or 0,
             mime_type=row.get("mime_type"),
             file_hash=row.get("file_hash"),
             created_at=row.get("created_at"),
             modified_at=row.get("modified_at"),
             indexed_at=row.get("indexed_at"),
-            tags=tags or [],
+            tags=tags,
             preview_url=preview_url,
         )
 
+    @classmethod
+    def from_row(cls, row: dict, tags: Optional[List[str]] = None) -> "FileItem":
+        """Build from a row of the ``files`` table, skipping validation.
+
+        Only for rows read from our own schema, whose column types already
+        match the fields. Use ``from_row_validated`` for anything else.
+        """
+        return cls.model_construct(**cls._row_fields(row, tags))
+
+    @classmethod
+    def from_rows(
+        cls, rows: List[dict], tags_by_id: Optional[dict] = None,
+    ) -> List["FileItem"]:
+        """``from_row`` over a result set; ``tags_by_id`` maps file id -> tags.
+
+        Without ``tags_by_id`` (or for ids missing from it) tags come from the
+        row's ``tags_csv`` column, if the query selected one.
+        """
+        construct = cls.model_construct
+        row_fields = cls._row_fields
+        if tags_by_id is None:
+            tags_by_id = {}
+        out = [None] * len(rows)
+        for i, row in enumerate(rows):
+            out[i] = construct(**row_fields(row, tags_by_id.get(row["id"])))
+        return out
+
+    @classmethod
+    def from_row_validated(cls, row: dict, tags: Optional[List[str]] = None) -> "FileItem":
+        """Like ``from_row`` but runs full pydantic validation."""
+        return cls(**cls._row_fields(row, tags))
+
 
 class FileListResponse(BaseModel):
     items: List[FileItem]
     total: int
     has_more: bool
+    next_cursor: Optional[str] = None  # pass as ?after= for the next page
 
 
 class SearchRequest(BaseModel):
@@ -6,20 +6,37 @@ Supports multiple shares/folders from one or more NAS devices.
 from __future__ import annotations
 
 import os
+import copy
+import time
+import asyncio
 import json
 import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 from typing import Optional
 
+try:
+    import orjson
+except ImportError:  # optional; fall back to the stdlib codec
+    orjson = None
+
 from .config import settings
 from .smb_fs import SMBSource, register_source, test_connection, discover_shares
 from .database import get_connection
-from .crypto import encrypt, decrypt, is_encrypted
+from .crypto import encrypt, decrypt, is_encrypted, clear_decrypt_cache
+from .ttl_cache import invalidate as invalidate_cached_responses
 
 logger = logging.getLogger("nas_explorer.nas_manager")
 
 CONFIG_FILE = None  # Set during init
 
+# (key, data, sources): the decrypted config, reused while the file's key
+# (path, mtime_ns, size) is unchanged, and the SMBSource list built from that
+# same data (None until get_sources builds it). Replaced as a whole, never
+# updated in place, so request handlers and scan workers can't pair one
+# version's key with another version's sources.
+_config_cache: Optional[tuple] = None
+
 
 def _config_path() -> str:
     """Get path to saved NAS config."""
@@ -47,19 +64,46 @@ def save_config(config: dict):
             entry["username"] = encrypt(entry["username"])
         safe_config["sources"].append(entry)
 
-    with open(path, "w") as f:
-        json.dump(safe_config, f, indent=2)
+    if orjson is not None:
+        with open(path, "wb") as f:
+            f.write(orjson.dumps(safe_config, option=orjson.OPT_INDENT_2 | orjson.OPT_APPEND_NEWLINE))
+    else:
+        with open(path, "w") as f:
+            json.dump(safe_config, f, indent=2)
+    _invalidate_config_cache()
+    # Rotated credentials must not linger in memory as cached plaintext
+    clear_decrypt_cache()
     logger.info(f"NAS config saved with {len(safe_config['sources'])} sources (credentials encrypted)")
 
 
+def _invalidate_config_cache():
+    global _config_cache
+    _config_cache = None
+
+
 def load_config() -> Optional[dict]:
     """Load saved NAS configuration from disk, decrypting credentials."""
+    entry = _load_config_entry()
+    return copy.deepcopy(entry[1]) if entry else None
+
+
+def _load_config_entry() -> Optional[tuple]:
+    """The current _config_cache entry, reading the file if it changed."""
+    global _config_cache
     path = _config_path()
-    if not os.path.exists(path):
+    try:
+        st = os.stat(path)
+    except OSError:
         return None
+    key = (path, st.st_mtime_ns, st.st_size)
+    entry = _config_cache
+    if entry is not None and entry[0] == key:
+        return entry
+
     try:
-        with open(path, "r") as f:
-            config = json.load(f)
+        with open(path, "rb") as f:
+            data = f.read()
+        config = orjson.loads(data) if orjson is not None else json.loads(data)
     except Exception as e:
         logger.warning(f"Failed to load NAS config: {e}")
         return None
@@ -80,15 +124,28 @@ def load_config() -> Optional[dict]:
     if needs_resave:
         logger.info("Migrating plaintext credentials to encrypted storage")
         save_config(config)
+        st = os.stat(path)
+        key = (path, st.st_mtime_ns, st.st_size)
 
-    return config
+    entry = (key, config, None)
+    _config_cache = entry
+    return entry
 
 
 def get_sources() -> list[SMBSource]:
-    """Load all configured SMB sources."""
-    config = load_config()
-    if not config:
+    """Load all configured SMB sources.
+
+    Every preview and stream request resolves its path through this, so the
+    list is built once per config file version; callers get a fresh list of
+    the shared SMBSource objects and must not modify them.
+    """
+    global _config_cache
+    entry = _load_config_entry()
+    if not entry or not entry[1]:
         return []
+    key, config, sources = entry
+    if sources is not None:
+        return list(sources)
 
     sources = []
     for src in config.get("sources", []):
@@ -100,7 +157,11 @@ def get_sources() -> list[SMBSource]:
             subfolder=src.get("subfolder", "/"),
             label=src.get("label", src["share"]),
         ))
-    return sources
+    # Only fill in the entry it was built from; if the config was reloaded
+    # meanwhile, the newer entry stays and builds its own list
+    if _config_cache is entry:
+        _config_cache = (key, config, sources)
+    return list(sources)
 
 
 def add_source(host: str, share: str, username: str, password: str,
@@ -164,28 +225,40 @@ def remove_source(source_id: str) -> dict:
     if removed_label:
         try:
             conn = get_connection()
-            prefix = f"/{removed_label}/%"
             root_path = f"/{removed_label}"
-
-            # Delete tags and metadata for files under this source
-            conn.execute(
-                "DELETE FROM file_tags WHERE file_id IN "
-                "(SELECT id FROM files WHERE path LIKE ? OR path = ?)",
-                (prefix, root_path)
-            )
-            conn.execute(
-                "DELETE FROM file_metadata WHERE file_id IN "
-                "(SELECT id FROM files WHERE path LIKE ? OR path = ?)",
-                (prefix, root_path)
-            )
-
-            # Delete the files themselves
-            cursor = conn.execute(
-                "DELETE FROM files WHERE path LIKE ? OR path = ?",
-                (prefix, root_path)
-            )
-            purged = cursor.rowcount
-            conn.commit()
+            # Range over the path index: "/label/" <= path < "/label0" ('0' follows '/')
+            in_source = (root_path, root_path + "/", root_path + "0")
+
+            if conn.in_transaction:
+                conn.commit()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Resolve the source's file ids once, then delete by id
+                conn.execute("CREATE TEMP TABLE IF NOT EXISTS _doomed (id INTEGER PRIMARY KEY)")
+                conn.execute("DELETE FROM _doomed")
+                conn.execute(
+                    "INSERT INTO _doomed SELECT id FROM files "
+                    "WHERE path = ? OR (path >= ? AND path < ?)",
+                    in_source
+                )
+
+                # Delete tags and metadata for files under this source
+                conn.execute("DELETE FROM file_tags WHERE file_id IN (SELECT id FROM _doomed)")
+                conn.execute("DELETE FROM file_metadata WHERE file_id IN (SELECT id FROM _doomed)")
+                conn.execute(
+                    "DELETE FROM extract_cache WHERE path = ? OR (path >= ? AND path < ?)",
+                    in_source
+                )
+
+                # Delete the files themselves
+                cursor = conn.execute("DELETE FROM files WHERE id IN (SELECT id FROM _doomed)")
+                purged = cursor.rowcount
+                conn.execute("DROP TABLE _doomed")
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            invalidate_cached_responses()
             logger.info(f"Purged {purged} indexed entries for source '{removed_label}'")
         except Exception as e:
             logger.warning(f"Failed to purge DB entries for {removed_label}: {e}")
@@ -198,23 +271,49 @@ def remove_source(source_id: str) -> dict:
 
 
 def register_all_sources():
-    """Register SMB sessions for all configured sources. Called on startup."""
+    """Register SMB sessions for all configured sources. Called on startup.
+
+    Handshakes run concurrently, so startup waits for the slowest host
+    rather than the sum of them.
+    """
     sources = get_sources()
+    if not sources:
+        logger.info("Registered 0/0 SMB sources")
+        return 0
     registered = 0
-    for source in sources:
-        try:
-            register_source(source)
-            registered += 1
-        except Exception as e:
-            logger.warning(f"Failed to register source {source.source_id}: {e}")
+    with ThreadPoolExecutor(max_workers=min(8, len(sources))) as pool:
+        futures = {pool.submit(register_source, source): source for source in sources}
+        for future in as_completed(futures):
+            try:
+                future.result()
+                registered += 1
+            except Exception as e:
+                logger.warning(f"Failed to register source {futures[future].source_id}: {e}")
     logger.info(f"Registered {registered}/{len(sources)} SMB sources")
     return registered
 
 
 # ─── Status ───────────────────────────────────────────────────────────────
 
-def get_connection_status() -> dict:
-    """Get current NAS connection status for the frontend."""
+# source_id -> monotonic time of its last successful probe
+_probe_ok_at: dict[str, float] = {}
+PROBE_TTL_SECS = 30.0
+
+
+def _probe(host: str, share: str, username: str, password: str) -> bool:
+    try:
+        return bool(test_connection(host, share, username, password)["success"])
+    except Exception:
+        return False
+
+
+async def get_connection_status() -> dict:
+    """Get current NAS connection status for the frontend.
+
+    Sources are probed concurrently in the default executor; a source that
+    answered within the last PROBE_TTL_SECS is reported connected without a
+    new round-trip.
+    """
     config = load_config()
     if not config or not config.get("sources"):
         return {
@@ -223,40 +322,43 @@ def get_connection_status() -> dict:
             "sources": [],
         }
 
+    loop = asyncio.get_running_loop()
+    now = time.monotonic()
     sources = []
-    any_connected = False
+    probes = {}
 
     for src in config["sources"]:
-        source = SMBSource(
-            host=src["host"],
-            share=src["share"],
-            username=src["username"],
-            password=src["password"],
-            subfolder=src.get("subfolder", "/"),
-            label=src.get("label", src["share"]),
-        )
-
-        # Test if source is reachable
-        connected = False
-        try:
-            result = test_connection(source.host, source.share, source.username, source.password)
-            connected = result["success"]
-            if connected:
-                any_connected = True
-        except Exception:
-            pass
-
+        subfolder = src.get("subfolder", "/")
+        source_id = f"{src['host']}/{src['share']}{subfolder}".rstrip("/")
         sources.append({
             "host": src["host"],
             "share": src["share"],
             "label": src.get("label", src["share"]),
-            "subfolder": src.get("subfolder", "/"),
-            "connected": connected,
-            "source_id": source.source_id,
+            "subfolder": subfolder,
+            "connected": False,
+            "source_id": source_id,
         })
+        checked_at = _probe_ok_at.get(source_id)
+        if checked_at is not None and now - checked_at < PROBE_TTL_SECS:
+            sources[-1]["connected"] = True
+        elif source_id not in probes:
+            probes[source_id] = loop.run_in_executor(
+                None, _probe, src["host"], src["share"], src["username"], src["password"]
+            )
+
+    if probes:
+        results = dict(zip(probes, await asyncio.gather(*probes.values())))
+        done_at = time.monotonic()
+        for entry in sources:
+            ok = results.get(entry["source_id"])
+            if ok:
+                entry["connected"] = True
+                _probe_ok_at[entry["source_id"]] = done_at
+            elif ok is not None:
+                _probe_ok_at.pop(entry["source_id"], None)
 
     return {
         "configured": True,
-        "connected": any_connected,
+        "connected": any(entry["connected"] for entry in sources),
         "sources": sources,
     }
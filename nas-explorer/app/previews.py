@@ -1,6 +1,7 @@
 """On-demand preview/thumbnail generation with disk caching.
 
-Supports both local files and SMB files (via temp download).
+Supports both local files and SMB files. SMB images and audio are read
+into memory; video and PDF go through a temp download for ffmpeg/pdf2image.
 """
 from __future__ import annotations
 
@@ -8,8 +9,11 @@ import os
 import subprocess
 import logging
 import hashlib
+import threading
+from collections import OrderedDict
 from pathlib import Path
 from io import BytesIO
+from typing import BinaryIO, Callable
 
 from .config import settings
 
@@ -21,18 +25,118 @@ SIZES = {
     "large": (800, 800),
 }
 
+# Thumbnails are small, so the fastest libwebp method costs little in size
+WEBP_SAVE_OPTIONS = {"quality": 80, "method": 0}
+
+# SMB files of these types are decoded straight from memory when they fit
+IN_MEMORY_PREFIXES = ("image/", "audio/")
+IN_MEMORY_MAX_BYTES = 32 * 1024 * 1024
+
+# Cache paths known to exist. Only hits are remembered, since a missing
+# preview may be generated later.
+_EXISTS_CACHE_MAX = 65536
+_known_previews: set[str] = set()
+
+
+# (settings.cache_path, resolved dir string) — mkdir'd once per configured path
+_cache_dir_state: tuple[str, str] | None = None
+
+
+def _cache_dir() -> str:
+    global _cache_dir_state
+    configured = settings.cache_path
+    if _cache_dir_state is None or _cache_dir_state[0] != configured:
+        cache_dir = Path(configured)
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        _cache_dir_state = (configured, str(cache_dir))
+    return _cache_dir_state[1]
+
 
 def get_cache_path(file_hash: str, size: str) -> str:
     """Get the disk cache path for a preview."""
-    cache_dir = Path(settings.cache_path)
-    cache_dir.mkdir(parents=True, exist_ok=True)
-    return str(cache_dir / f"{file_hash}_{size}.webp")
+    return f"{_cache_dir()}/{file_hash}_{size}.webp"
+
+
+def _cached_exists(cache_path: str) -> bool:
+    """os.path.exists for preview files, skipping the stat once seen."""
+    if cache_path in _known_previews:
+        return True
+    if os.path.exists(cache_path):
+        _remember(cache_path)
+        return True
+    return False
+
+
+def _remember(cache_path: str):
+    if len(_known_previews) >= _EXISTS_CACHE_MAX:
+        _known_previews.clear()
+    _known_previews.add(cache_path)
+
+
+def clear_exists_cache():
+    """Forget known preview paths, e.g. after the cache directory is wiped."""
+    _known_previews.clear()
+
+
+# Hot preview bytes, keyed by cache path (which encodes file hash and size)
+PREVIEW_MEM_MAX_BYTES = 64 * 1024 * 1024
+_preview_mem: OrderedDict[str, bytes] = OrderedDict()
+_preview_mem_bytes = 0
+_preview_mem_lock = threading.Lock()
+
+
+def _mem_get(cache_path: str) -> bytes | None:
+    with _preview_mem_lock:
+        data = _preview_mem.get(cache_path)
+        if data is not None:
+            _preview_mem.move_to_end(cache_path)
+        return data
+
+
+def _mem_put(cache_path: str, data: bytes):
+    global _preview_mem_bytes
+    if len(data) > PREVIEW_MEM_MAX_BYTES:
+        return
+    with _preview_mem_lock:
+        old = _preview_mem.pop(cache_path, None)
+        if old is not None:
+            _preview_mem_bytes -= len(old)
+        _preview_mem[cache_path] = data
+        _preview_mem_bytes += len(data)
+        while _preview_mem_bytes > PREVIEW_MEM_MAX_BYTES:
+            _, evicted = _preview_mem.popitem(last=False)
+            _preview_mem_bytes -= len(evicted)
+
+
+def read_preview_bytes(cache_path: str) -> bytes | None:
+    """Return the bytes of a cached preview, from memory when hot."""
+    data = _mem_get(cache_path)
+    if data is not None:
+        return data
+    try:
+        with open(cache_path, "rb") as f:
+            data = f.read()
+    except OSError:
+        _known_previews.discard(cache_path)
+        return None
+    _mem_put(cache_path, data)
+    return data
 
 
-def get_preview_smb(smb_path: str, mime_type: str, file_hash: str | None, size: str = "medium") -> str | None:
+def clear_memory_cache():
+    """Drop all in-memory preview bytes."""
+    global _preview_mem_bytes
+    with _preview_mem_lock:
+        _preview_mem.clear()
+        _preview_mem_bytes = 0
+
+
+def get_preview_smb(smb_path: str, mime_type: str, file_hash: str | None, size: str = "medium",
+                    file_size: int | None = None) -> str | None:
     """
     Get or generate a preview for a file on SMB.
-    Downloads to temp if needed for processing.
+    Downloads to temp if needed for processing. file_size (the indexed
+    size) picks memory vs temp up front; without it the file is stat()ed.
     Returns path to cached preview image, or None.
     """
     if size not in SIZES:
@@ -44,14 +148,25 @@ def get_preview_smb(smb_path: str, mime_type: str, file_hash: str | None, size:
     cache_path = get_cache_path(file_hash, size)
 
     # Check cache first
-    if os.path.exists(cache_path):
+    if _cached_exists(cache_path):
         return cache_path
 
     # Need to download and process
-    from .smb_fs import download_to_temp, cleanup_temp
+    from .smb_fs import download_to_memory, download_to_temp, cleanup_temp, stat
 
     temp_path = None
     try:
+        if mime_type and mime_type.startswith(IN_MEMORY_PREFIXES):
+            # Decide from the size, so a file too big for memory is not
+            # partly read before being downloaded again to temp
+            if file_size is None:
+                info = stat(smb_path)
+                file_size = info.size if info else None
+            if file_size is None or file_size <= IN_MEMORY_MAX_BYTES:
+                data = download_to_memory(smb_path, max_size=IN_MEMORY_MAX_BYTES)
+                if data is not None:
+                    return _generate(BytesIO(data), mime_type, cache_path, size)
+
         temp_path = download_to_temp(smb_path)
         return get_preview(temp_path, mime_type, file_hash, size)
     except Exception as e:
@@ -76,40 +191,58 @@ def get_preview(filepath: str, mime_type: str, file_hash: str | None, size: str
     cache_path = get_cache_path(file_hash, size)
 
     # Check cache
-    if os.path.exists(cache_path):
+    if _cached_exists(cache_path):
         return cache_path
 
-    # Generate based on MIME type
     try:
-        if mime_type and mime_type.startswith("image/"):
-            return _generate_image_preview(filepath, cache_path, size)
-        elif mime_type and mime_type.startswith("video/"):
-            return _generate_video_preview(filepath, cache_path, size)
-        elif mime_type == "application/pdf":
-            return _generate_pdf_preview(filepath, cache_path, size)
-        elif mime_type and mime_type.startswith("audio/"):
-            return _generate_audio_preview(filepath, cache_path, size)
+        return _generate(filepath, mime_type, cache_path, size)
     except Exception as e:
         logger.warning(f"Preview generation failed for {filepath}: {e}")
 
     return None
 
 
-def _generate_image_preview(filepath: str, cache_path: str, size: str) -> str | None:
-    """Generate image thumbnail using PIL."""
+def _generate(source: str | BinaryIO, mime_type: str, cache_path: str, size: str) -> str | None:
+    """Generate a preview based on MIME type. Video and PDF need a real path."""
+    if not mime_type:
+        return None
+    generator = _generator_for(mime_type)
+    if generator is None:
+        return None
+    return generator(source, cache_path, SIZES[size])
+
+
+_MISSING = object()
+_GENERATOR_DISPATCH: dict[str, Callable | None] = {}
+
+
+def _generator_for(mime_type: str) -> Callable | None:
+    generator = _GENERATOR_DISPATCH.get(mime_type, _MISSING)
+    if generator is _MISSING:
+        generator = _GENERATORS_EXACT.get(mime_type) or _GENERATORS_BY_TYPE.get(mime_type.partition("/")[0])
+        _GENERATOR_DISPATCH[mime_type] = generator
+    return generator
+
+
+def _generate_image_preview(filepath: str | BinaryIO, cache_path: str, dimensions: tuple[int, int]) -> str | None:
+    """Generate image thumbnail using PIL from a path or file-like object."""
     try:
         from PIL import Image
 
-        dimensions = SIZES[size]
         img = Image.open(filepath)
 
+        if img.format == "JPEG":
+            # Let libjpeg decode at a reduced scale close to the target size
+            img.draft("RGB", dimensions)
+            img.load()
+
         if img.mode in ("RGBA", "P"):
             img = img.convert("RGBA")
-        else:
+        elif img.mode != "RGB":
             img = img.convert("RGB")
 
-        img.thumbnail(dimensions, Image.LANCZOS)
-        img.save(cache_path, "WebP", quality=80)
+        img.thumbnail(dimensions, Image.Resampling.LANCZOS)
+        img.save(cache_path, "WebP", **WEBP_SAVE_OPTIONS)
         img.close()
         return cache_path
     except Exception as e:
@@ -117,30 +250,37 @@ def _generate_image_preview(filepath: str, cache_path: str, size: str) -> str |
         return None
 
 
-def _generate_video_preview(filepath: str, cache_path: str, size: str) -> str | None:
-    """Extract a video frame using ffmpeg."""
+# Seek target for video frames; clips shorter than this retry from the start
+VIDEO_SEEK_SECS = 5
+
+
+def _generate_video_preview(filepath: str, cache_path: str, dimensions: tuple[int, int]) -> str | None:
+    """Extract a video frame using a single ffmpeg call per attempt."""
     try:
-        dimensions = SIZES[size]
         width, height = dimensions
 
-        duration = _get_video_duration(filepath)
-        seek_time = max(1, int(duration * 0.1)) if duration > 0 else 5
-
-        result = subprocess.run(
-            [
-                "ffmpeg", "-y",
-                "-ss", str(seek_time),
-                "-i", filepath,
-                "-vframes", "1",
-                "-vf", f"scale={width}:{height}:force_original_aspect_ratio=decrease",
-                "-f", "webp",
-                cache_path,
-            ],
-            capture_output=True, timeout=30
-        )
-
-        if result.returncode == 0 and os.path.exists(cache_path):
-            return cache_path
+        for seek_time in (VIDEO_SEEK_SECS, 0):
+            result = subprocess.run(
+                [
+                    "ffmpeg", "-y",
+                    "-ss", str(seek_time),
+                    "-i", filepath,
+                    "-vframes", "1",
+                    "-vf", f"scale={width}:{height}:force_original_aspect_ratio=decrease",
+                    "-compression_level", "0",
+                    "-f", "webp",
+                    cache_path,
+                ],
+                capture_output=True, timeout=30
+            )
+            # Seeking past the end still exits 0, leaving the 0-byte file the
+            # webp muxer opened; that is a failure, not a preview to cache
+            if result.returncode == 0 and os.path.exists(cache_path) and os.path.getsize(cache_path) > 0:
+                return cache_path
+            try:
+                os.remove(cache_path)
+            except OSError:
+                pass
 
         return None
     except Exception as e:
@@ -148,12 +288,11 @@ def _generate_video_preview(filepath: str, cache_path: str, size: str) -> str |
         return None
 
 
-def _generate_pdf_preview(filepath: str, cache_path: str, size: str) -> str | None:
+def _generate_pdf_preview(filepath: str, cache_path: str, dimensions: tuple[int, int]) -> str | None:
     """Render first page of PDF as an image."""
     try:
         from pdf2image import convert_from_path
 
-        dimensions = SIZES[size]
         images = convert_from_path(
             filepath,
             first_page=1,
@@ -163,7 +302,7 @@ def _generate_pdf_preview(filepath: str, cache_path: str, size: str) -> str | No
         )
 
         if images:
-            images[0].save(cache_path, "WebP", quality=80)
+            images[0].save(cache_path, "WebP", **WEBP_SAVE_OPTIONS)
             return cache_path
 
         return None
@@ -172,8 +311,8 @@ def _generate_pdf_preview(filepath: str, cache_path: str, size: str) -> str | No
         return None
 
 
-def _generate_audio_preview(filepath: str, cache_path: str, size: str) -> str | None:
-    """Extract album art from audio files."""
+def _generate_audio_preview(filepath: str | BinaryIO, cache_path: str, dimensions: tuple[int, int]) -> str | None:
+    """Extract album art from an audio file path or file-like object."""
     try:
         from mutagen import File as MutagenFile
         from PIL import Image
@@ -203,11 +342,10 @@ def _generate_audio_preview(filepath: str, cache_path: str, size: str) -> str |
                 art_data = audio.pictures[0].data
 
         if art_data:
-            dimensions = SIZES[size]
             img = Image.open(BytesIO(art_data))
             img = img.convert("RGB")
-            img.thumbnail(dimensions, Image.LANCZOS)
-            img.save(cache_path, "WebP", quality=80)
+            img.thumbnail(dimensions, Image.Resampling.LANCZOS)
+            img.save(cache_path, "WebP", **WEBP_SAVE_OPTIONS)
             img.close()
             return cache_path
 
@@ -217,20 +355,12 @@ def _generate_audio_preview(filepath: str, cache_path: str, size: str) -> str |
         return None
 
 
-def _get_video_duration(filepath: str) -> float:
-    """Get video duration in seconds using ffprobe."""
-    try:
-        result = subprocess.run(
-            [
-                "ffprobe", "-v", "error",
-                "-show_entries", "format=duration",
-                "-of", "default=noprint_wrappers=1:nokey=1",
-                filepath,
-            ],
-            capture_output=True, text=True, timeout=10
-        )
-        if result.returncode == 0:
-            return float(result.stdout.strip())
-    except Exception:
-        pass
-    return 0.0
+# Exact MIME types first, then the top-level type ("image" in "image/png")
+_GENERATORS_EXACT: dict[str, Callable] = {
+    "application/pdf": _generate_pdf_preview,
+}
+_GENERATORS_BY_TYPE: dict[str, Callable] = {
+    "image": _generate_image_preview,
+    "video": _generate_video_preview,
+    "audio": _generate_audio_preview,
+}
@@ -0,0 +1,23 @@
+"""Response classes shared by the API routes."""
+from __future__ import annotations
+
+import sqlite3
+from typing import Any
+
+import orjson
+from fastapi.responses import ORJSONResponse
+
+
+def _row_default(obj: Any) -> Any:
+    """orjson fallback: encode sqlite3.Row objects as JSON objects."""
+    if isinstance(obj, sqlite3.Row):
+        return dict(zip(obj.keys(), obj))
+    raise TypeError
+
+
+class RowJSONResponse(ORJSONResponse):
+    """ORJSONResponse that also accepts sqlite3.Row values, so query_rows()
+    results can be returned without first copying them into dicts."""
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, default=_row_default)
@@ -3,10 +3,12 @@ from __future__ import annotations
 
 from fastapi import APIRouter, Depends
 
-from ..database import query
+from ..database import aquery, query_rows
+from ..responses import RowJSONResponse
 from ..scanner import start_scan, get_scan_state, stop_scan
 from ..security import require_auth
 from ..models import ScanStatus
+from ..ttl_cache import invalidate as invalidate_cached_responses
 
 router = APIRouter(prefix="/api/admin", tags=["admin"])
 
@@ -35,9 +37,10 @@ async def scan_status(_auth=Depends(require_auth)):
     if total_est > 0:
         progress = min(100.0, (scanned / total_est) * 100)
     elif state["running"]:
-        progress = -1  # Indeterminate
+        progress = -1.0  # Indeterminate
 
-    return ScanStatus(
+    # State comes from get_scan_state(), so skip re-validating it on every poll
+    return ScanStatus.model_construct(
         scan_id=state.get("scan_id"),
         status="scanning" if state["running"] else "idle",
         files_scanned=scanned,
@@ -57,27 +60,34 @@ async def trigger_scan_stop(_auth=Depends(require_auth)):
     return stop_scan()
 
 
+@router.post("/cache/invalidate")
+async def invalidate_cache(_auth=Depends(require_auth)):
+    """Drop cached dashboard/insight responses."""
+    invalidate_cached_responses()
+    return {"success": True}
+
+
 @router.get("/scan-history")
-async def scan_history(
+def scan_history(
     limit: int = 10,
     _auth=Depends(require_auth),
 ):
     """Get past scan results."""
-    rows = query(
+    rows = query_rows(
         "SELECT * FROM scan_log ORDER BY started_at DESC LIMIT ?",
         (limit,)
     )
-    return [dict(r) for r in rows]
+    return RowJSONResponse(rows)
 
 
 @router.get("/health")
 async def health():
     """Health check — no auth required."""
     from ..nas_manager import get_connection_status
-    conn_status = get_connection_status()
+    conn_status = await get_connection_status()
     db_ok = False
     try:
-        result = query("SELECT COUNT(*) as cnt FROM files")
+        result = await aquery("SELECT COUNT(*) as cnt FROM files")
         db_ok = True
         file_count = result[0]["cnt"] if result else 0
     except Exception:
@@ -94,12 +104,12 @@ async def health():
 
 
 @router.get("/tags")
-async def list_all_tags(_auth=Depends(require_auth)):
+def list_all_tags(_auth=Depends(require_auth)):
     """List all unique tags with counts."""
-    rows = query("""
+    rows = query_rows("""
         SELECT tag, COUNT(*) as count
         FROM file_tags
         GROUP BY tag
         ORDER BY count DESC
     """)
-    return [dict(r) for r in rows]
+    return RowJSONResponse(rows)
@@ -1,420 +1,462 @@
 """Dashboard and insights endpoints."""
 from __future__ import annotations
 
+import asyncio
+
+import orjson
 from fastapi import APIRouter, Depends
+from fastapi.responses import Response, StreamingResponse
 
-from ..database import query
+from .. import ttl_cache
+from ..config import settings
+from ..database import aquery, aquery_many, files_fingerprint
 from ..models import DashboardData
 from ..security import require_auth
+from ..ttl_cache import cached
 
 router = APIRouter(prefix="/api", tags=["dashboard"])
 
 
-@router.get("/dashboard", response_model=DashboardData)
-async def get_dashboard(_auth=Depends(require_auth)):
-    """Get all dashboard data in a single request."""
-
-    # Total stats
-    stats = query("""
-        SELECT
-            COALESCE(SUM(CASE WHEN is_directory = 0 THEN size ELSE 0 END), 0) as total_size,
-            COALESCE(SUM(CASE WHEN is_directory = 0 THEN 1 ELSE 0 END), 0) as total_files,
-            COALESCE(SUM(CASE WHEN is_directory = 1 THEN 1 ELSE 0 END), 0) as total_directories
-        FROM files
-    """)
-    s = stats[0] if stats else {"total_size": 0, "total_files": 0, "total_directories": 0}
-
-    # Unique hashes and duplicate info
-    dup_stats = query("""
-        SELECT
-            COUNT(DISTINCT file_hash) as unique_hashes,
-            (SELECT COUNT(*) FROM (
-                SELECT file_hash FROM files
-                WHERE file_hash IS NOT NULL AND is_directory = 0
-                GROUP BY file_hash HAVING COUNT(*) > 1
-            )) as duplicate_groups,
-            COALESCE((SELECT SUM(wasted) FROM (
-                SELECT (COUNT(*) - 1) * size as wasted
-                FROM files
-                WHERE file_hash IS NOT NULL AND is_directory = 0
-                GROUP BY file_hash HAVING COUNT(*) > 1
-            )), 0) as duplicate_wasted_bytes
-        FROM files WHERE file_hash IS NOT NULL AND is_directory = 0
-    """)
-    d = dup_stats[0] if dup_stats else {}
-
-    # By MIME type (top 20)
-    by_type = query("""
-        SELECT
-            CASE
-                WHEN mime_type LIKE 'video/%' THEN 'Video'
-                WHEN mime_type LIKE 'audio/%' THEN 'Audio'
-                WHEN mime_type LIKE 'image/%' THEN 'Image'
-                WHEN mime_type LIKE 'text/%' THEN 'Text'
-                WHEN mime_type IN ('application/pdf') THEN 'PDF'
-                WHEN mime_type LIKE '%document%' OR mime_type LIKE '%word%' THEN 'Document'
-                WHEN mime_type LIKE '%spreadsheet%' OR mime_type LIKE '%excel%' THEN 'Spreadsheet'
-                WHEN mime_type LIKE '%presentation%' OR mime_type LIKE '%powerpoint%' THEN 'Presentation'
-                WHEN mime_type LIKE '%zip%' OR mime_type LIKE '%compressed%' OR mime_type LIKE '%archive%' THEN 'Archive'
-                WHEN mime_type = 'inode/directory' THEN 'Directory'
-                ELSE 'Other'
-            END as category,
-            COUNT(*) as count,
-            SUM(size) as total_size
-        FROM files
-        WHERE is_directory = 0
-        GROUP BY category
-        ORDER BY total_size DESC
-        LIMIT 20
-    """)
-
-    # Largest files (top 20)
-    largest = query("""
-        SELECT id, name, path, size, mime_type, modified_at
-        FROM files WHERE is_directory = 0
-        ORDER BY size DESC LIMIT 20
-    """)
-
-    # Recent files (top 20)
-    recent = query("""
-        SELECT id, name, path, size, mime_type, modified_at
-        FROM files WHERE is_directory = 0
-        ORDER BY modified_at DESC LIMIT 20
-    """)
-
-    # Duplicate groups (top 20 by wasted space)
-    duplicates = query("""
-        SELECT
-            file_hash,
-            COUNT(*) as count,
-            size,
-            (COUNT(*) - 1) * size as wasted_bytes,
-            GROUP_CONCAT(name, ' | ') as names,
-            GROUP_CONCAT(path, ' | ') as paths
-        FROM files
-        WHERE file_hash IS NOT NULL AND is_directory = 0
-        GROUP BY file_hash
-        HAVING COUNT(*) > 1
+# ─── Dashboard ────────────────────────────────────────
+# The dashboard splits its queries into four groups (DASHBOARD_PANELS), each
+# run in one read transaction on its own pooled connection; the groups run in
+# parallel under WAL (more readers than that just contend). Totals,
+# per-category/extension/month sums and duplicate counts come from the
+# trigger-maintained aggregate tables (see database.AGGREGATE_TABLES) instead
+# of scanning files.
+
+# Totals: total_size, total_files, total_directories, empty_files
+Q_STATS = "SELECT key, value FROM stats_cache"
+
+# Unique hashes and duplicate info
+Q_DUP_STATS = """
+    SELECT
+        (SELECT COUNT(*) FROM agg_dup) as unique_hashes,
+        COUNT(*) as duplicate_groups,
+        COALESCE(SUM(wasted_bytes), 0) as duplicate_wasted_bytes
+    FROM agg_dup INDEXED BY idx_dup_wasted
+    WHERE n > 1
+"""
+
+# By MIME type (top 20)
+Q_BY_TYPE = """
+    SELECT category, n as count, total_size
+    FROM agg_by_category
+    ORDER BY total_size DESC
+    LIMIT 20
+"""
+
+# Largest files (top 20)
+Q_LARGEST = """
+    SELECT id, name, path, size, mime_type, modified_at
+    FROM files INDEXED BY idx_files_nondir_size WHERE is_directory = 0
+    ORDER BY size DESC LIMIT 20
+"""
+
+# Recent files (top 20)
+Q_RECENT = """
+    SELECT id, name, path, size, mime_type, modified_at
+    FROM files INDEXED BY idx_files_nondir_modified WHERE is_directory = 0
+    ORDER BY modified_at DESC LIMIT 20
+"""
+
+# Duplicate groups (top 20 by wasted space). The top groups are picked from
+# agg_dup first, then names and paths are collected in one idx_files_hash pass,
+# capped at DUPLICATE_SAMPLE members per group so a hash shared by thousands
+# of files does not build a huge string.
+DUPLICATE_SAMPLE = 10
+
+Q_DUPLICATES = """
+    WITH top AS (
+        SELECT file_hash, n, size, wasted_bytes
+        FROM agg_dup INDEXED BY idx_dup_wasted
+        WHERE n > 1
         ORDER BY wasted_bytes DESC
         LIMIT 20
-    """)
-
-    # Tag distribution
-    tag_counts = query("""
-        SELECT tag, COUNT(*) as count
-        FROM file_tags
-        GROUP BY tag
-        ORDER BY count DESC
-        LIMIT 30
-    """)
-
-    # Size by extension (top 20)
-    size_by_ext = query("""
-        SELECT
-            LOWER(SUBSTR(name, INSTR(name, '.'))) as extension,
-            COUNT(*) as count,
-            SUM(size) as total_size
-        FROM files
-        WHERE is_directory = 0 AND INSTR(name, '.') > 0
-        GROUP BY extension
-        ORDER BY total_size DESC
-        LIMIT 20
-    """)
+    ),
+    members AS (
+        SELECT f.file_hash, f.name, f.path,
+               ROW_NUMBER() OVER (PARTITION BY f.file_hash) as rn
+        FROM top t
+        JOIN files f ON f.file_hash = t.file_hash AND f.is_directory = 0
+    )
+    SELECT
+        t.file_hash,
+        t.n as count,
+        t.size,
+        t.wasted_bytes,
+        GROUP_CONCAT(m.name, ' | ') as names,
+        GROUP_CONCAT(m.path, ' | ') as paths
+    FROM top t
+    JOIN members m ON m.file_hash = t.file_hash AND m.rn <= ?
+    GROUP BY t.file_hash
+    ORDER BY t.wasted_bytes DESC
+"""
+
+# Tag distribution
+Q_TAG_COUNTS = """
+    SELECT tag, COUNT(*) as count
+    FROM file_tags
+    GROUP BY tag
+    ORDER BY count DESC
+    LIMIT 30
+"""
+
+# Extensions ranked two ways: top 20 by size ('size') and top 15 by count ('count')
+Q_EXTENSIONS = """
+    SELECT * FROM (
+        SELECT 'size' as ranked_by, ext as extension, n as count, total_size
+        FROM agg_by_ext ORDER BY total_size DESC LIMIT 20
+    )
+    UNION ALL
+    SELECT * FROM (
+        SELECT 'count' as ranked_by, ext as extension, n as count, total_size
+        FROM agg_by_ext ORDER BY n DESC LIMIT 15
+    )
+"""
+
+# Files by month (last 24 months)
+Q_BY_MONTH = """
+    SELECT month, n as count, total_size
+    FROM agg_by_month
+    ORDER BY month DESC
+    LIMIT 24
+"""
+
+# ─── Extended Insights ─────────────────────────────────
+
+# Oldest files (top 15)
+Q_OLDEST = """
+    SELECT id, name, path, size, mime_type, modified_at
+    FROM files INDEXED BY idx_files_nondir_modified
+    WHERE is_directory = 0 AND modified_at IS NOT NULL
+    ORDER BY modified_at ASC LIMIT 15
+"""
+
+# Median file size: offset is total_files // 2 from stats_cache. Pinned to the
+# partial size index so the walk is index-only, not a sort of is_dir matches.
+Q_MEDIAN_SIZE = """
+    SELECT size FROM files INDEXED BY idx_files_nondir_size
+    WHERE is_directory = 0
+    ORDER BY size LIMIT 1
+    OFFSET (SELECT value / 2 FROM stats_cache WHERE key = 'total_files')
+"""
+
+# Size by source (top-level folder = source label), from the source_root index
+Q_SIZE_BY_SOURCE = """
+    SELECT
+        source_root as source,
+        COUNT(*) as count,
+        SUM(size) as total_size
+    FROM files INDEXED BY idx_files_source
+    WHERE is_directory = 0 AND source_root IS NOT NULL
+    GROUP BY source_root
+    ORDER BY total_size DESC
+"""
+
+# File age buckets
+Q_FILE_AGE = """
+    SELECT
+        CASE
+            WHEN modified_at >= date('now', '-30 days') THEN 'Last 30 days'
+            WHEN modified_at >= date('now', '-90 days') THEN '1-3 months'
+            WHEN modified_at >= date('now', '-1 year') THEN '3-12 months'
+            WHEN modified_at >= date('now', '-3 years') THEN '1-3 years'
+            WHEN modified_at >= date('now', '-5 years') THEN '3-5 years'
+            ELSE '5+ years'
+        END as age_bucket,
+        COUNT(*) as count,
+        SUM(size) as total_size
+    FROM files
+    WHERE is_directory = 0 AND modified_at IS NOT NULL
+    GROUP BY age_bucket
+    ORDER BY MIN(modified_at) DESC
+"""
+
+# Deepest nested paths: first 10 entries of the path_depth index
+Q_DEEP_PATHS = """
+    SELECT path, path_depth as depth, name, size
+    FROM files INDEXED BY idx_files_depth
+    WHERE is_directory = 0
+    ORDER BY path_depth DESC
+    LIMIT 10
+"""
+
+
+def _summary_fields(stats, dup_stats, by_type, extensions, by_month, median_row) -> dict:
+    s = {r["key"]: r["value"] for r in stats}
+    d = dup_stats[0] if dup_stats else {}
 
-    # Files by month (last 24 months)
-    by_month = query("""
-        SELECT
-            SUBSTR(modified_at, 1, 7) as month,
-            COUNT(*) as count,
-            SUM(size) as total_size
-        FROM files
-        WHERE is_directory = 0 AND modified_at IS NOT NULL
-        GROUP BY month
-        ORDER BY month DESC
-        LIMIT 24
-    """)
-
-    # ─── Extended Insights ─────────────────────────────────
-
-    # Oldest files (top 15)
-    oldest = query("""
-        SELECT id, name, path, size, mime_type, modified_at
-        FROM files WHERE is_directory = 0 AND modified_at IS NOT NULL
-        ORDER BY modified_at ASC LIMIT 15
-    """)
-
-    # Average file size
-    avg_row = query("""
-        SELECT COALESCE(AVG(size), 0) as avg_size FROM files WHERE is_directory = 0
-    """)
-    avg_size = int(avg_row[0]["avg_size"]) if avg_row else 0
-
-    # Median file size
-    median_row = query("""
-        SELECT size FROM files WHERE is_directory = 0
-        ORDER BY size LIMIT 1
-        OFFSET (SELECT COUNT(*) / 2 FROM files WHERE is_directory = 0)
-    """)
-    median_size = median_row[0]["size"] if median_row else 0
-
-    # Size by source (top-level folder = source label)
-    size_by_source = query("""
-        SELECT
-            CASE
-                WHEN INSTR(SUBSTR(path, 2), '/') > 0
-                THEN SUBSTR(path, 2, INSTR(SUBSTR(path, 2), '/') - 1)
-                ELSE SUBSTR(path, 2)
-            END as source,
-            COUNT(*) as count,
-            SUM(size) as total_size
-        FROM files
-        WHERE is_directory = 0 AND path LIKE '/%'
-        GROUP BY source
-        ORDER BY total_size DESC
-    """)
-
-    # File age buckets
-    file_age = query("""
-        SELECT
-            CASE
-                WHEN modified_at >= date('now', '-30 days') THEN 'Last 30 days'
-                WHEN modified_at >= date('now', '-90 days') THEN '1-3 months'
-                WHEN modified_at >= date('now', '-1 year') THEN '3-12 months'
-                WHEN modified_at >= date('now', '-3 years') THEN '1-3 years'
-                WHEN modified_at >= date('now', '-5 years') THEN '3-5 years'
-                ELSE '5+ years'
-            END as age_bucket,
-            COUNT(*) as count,
-            SUM(size) as total_size
-        FROM files
-        WHERE is_directory = 0 AND modified_at IS NOT NULL
-        GROUP BY age_bucket
-        ORDER BY MIN(modified_at) DESC
-    """)
+    size_by_ext = []
+    ext_counts = []
+    for r in extensions:
+        if r.pop("ranked_by") == "size":
+            size_by_ext.append(r)
+        else:
+            ext_counts.append({"extension": r["extension"], "count": r["count"]})
 
-    # Top extensions by count
-    ext_counts = query("""
-        SELECT
-            LOWER(SUBSTR(name, INSTR(name, '.'))) as extension,
-            COUNT(*) as count
-        FROM files
-        WHERE is_directory = 0 AND INSTR(name, '.') > 0
-        GROUP BY extension
-        ORDER BY count DESC
-        LIMIT 15
-    """)
-
-    # Empty files
-    empty = query("SELECT COUNT(*) as cnt FROM files WHERE is_directory = 0 AND size = 0")
-    empty_count = empty[0]["cnt"] if empty else 0
-
-    # Deepest nested paths
-    deep_paths = query("""
-        SELECT path, LENGTH(path) - LENGTH(REPLACE(path, '/', '')) as depth, name, size
-        FROM files WHERE is_directory = 0
-        ORDER BY depth DESC
-        LIMIT 10
-    """)
-
-    return DashboardData(
+    return dict(
         total_size=s["total_size"],
         total_files=s["total_files"],
         total_directories=s["total_directories"],
+        empty_files=s["empty_files"],
+        avg_file_size=s["total_size"] // s["total_files"] if s["total_files"] else 0,
+        median_file_size=median_row[0]["size"] if median_row else 0,
         unique_hashes=d.get("unique_hashes", 0),
         duplicate_groups=d.get("duplicate_groups", 0),
         duplicate_wasted_bytes=d.get("duplicate_wasted_bytes", 0),
-        by_type=[dict(r) for r in by_type],
-        largest_files=[dict(r) for r in largest],
-        recent_files=[dict(r) for r in recent],
-        duplicates=[dict(r) for r in duplicates],
-        tag_counts=[dict(r) for r in tag_counts],
-        size_by_extension=[dict(r) for r in size_by_ext],
-        files_by_month=[dict(r) for r in by_month],
-        oldest_files=[dict(r) for r in oldest],
-        avg_file_size=avg_size,
-        median_file_size=median_size,
-        size_by_source=[dict(r) for r in size_by_source],
-        file_age_buckets=[dict(r) for r in file_age],
-        extension_counts=[dict(r) for r in ext_counts],
-        empty_files=empty_count,
-        deep_paths=[dict(r) for r in deep_paths],
+        by_type=by_type,
+        size_by_extension=size_by_ext,
+        extension_counts=ext_counts,
+        files_by_month=by_month,
     )
 
 
+# (panel name, statements run as one aquery_many batch, DashboardData fields
+# built from that batch's results). Rows are already plain dicts from query().
+DASHBOARD_PANELS = [
+    # Aggregate-table reads plus the median, whose offset comes from
+    # stats_cache, so the totals and median agree.
+    ("summary", [
+        (Q_STATS, ()),
+        (Q_DUP_STATS, ()),
+        (Q_BY_TYPE, ()),
+        (Q_EXTENSIONS, ()),
+        (Q_BY_MONTH, ()),
+        (Q_MEDIAN_SIZE, ()),
+    ], _summary_fields),
+    # Short index walks
+    ("files", [
+        (Q_LARGEST, ()),
+        (Q_RECENT, ()),
+        (Q_OLDEST, ()),
+        (Q_DEEP_PATHS, ()),
+    ], lambda largest, recent, oldest, deep_paths: dict(
+        largest_files=largest, recent_files=recent, oldest_files=oldest, deep_paths=deep_paths,
+    )),
+    ("duplicates", [
+        (Q_DUPLICATES, (DUPLICATE_SAMPLE,)),
+        (Q_TAG_COUNTS, ()),
+    ], lambda duplicates, tag_counts: dict(duplicates=duplicates, tag_counts=tag_counts)),
+    # Full passes over files
+    ("sources", [
+        (Q_SIZE_BY_SOURCE, ()),
+        (Q_FILE_AGE, ()),
+    ], lambda size_by_source, file_age: dict(size_by_source=size_by_source, file_age_buckets=file_age)),
+]
+
+
+async def _panel(name: str, statements: list, build) -> tuple[str, dict]:
+    return name, build(*await aquery_many(statements))
+
+
+@router.get("/dashboard", response_model=DashboardData)
+@cached(fingerprint=files_fingerprint)
+async def get_dashboard(_auth=Depends(require_auth)):
+    """Get all dashboard data in a single request."""
+    fields = {}
+    for _, panel in await asyncio.gather(*(_panel(*p) for p in DASHBOARD_PANELS)):
+        fields.update(panel)
+    return DashboardData.model_construct(**fields)
+
+
+@router.get("/dashboard/stream")
+async def stream_dashboard(_auth=Depends(require_auth)):
+    """The dashboard as NDJSON, one {"panel", "data"} line per query group.
+
+    The first line carries every field at its empty default so a client can
+    render right away; the rest arrive as each group finishes and hold a
+    subset of the /dashboard fields to merge in.
+    """
+    # Shares /api/dashboard's cache entry: a fresh one is sent as a single
+    # "dashboard" line, and a full stream fills it for both endpoints
+    key = get_dashboard.cache_key
+    caching = settings.insights_cache_ttl > 0
+    fp = await asyncio.to_thread(files_fingerprint) if caching else None
+    body = ttl_cache.lookup(key, fp) if caching else None
+    if body is not None:
+        return Response(b'{"panel":"dashboard","data":' + body + b"}\n", media_type="application/x-ndjson")
+
+    async def lines():
+        yield orjson.dumps({"panel": "skeleton", "data": DashboardData().model_dump()}) + b"\n"
+        started = ttl_cache.generation()
+        fields = {}
+        tasks = [asyncio.ensure_future(_panel(*p)) for p in DASHBOARD_PANELS]
+        try:
+            for done in asyncio.as_completed(tasks):
+                name, data = await done
+                fields.update(data)
+                yield orjson.dumps({"panel": name, "data": data}) + b"\n"
+        finally:
+            for task in tasks:  # client went away
+                task.cancel()
+        if caching:
+            ttl_cache.store(key, fp, DashboardData.model_construct(**fields), started)
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+# Size per parent folder (top 50), from the trigger-maintained folder_rollup
+Q_TREEMAP = """
+    SELECT parent_path as path, total_size, file_count
+    FROM folder_rollup
+    ORDER BY total_size DESC
+    LIMIT 50
+"""
+
+
 @router.get("/insights/storage-treemap")
+@cached(fingerprint=files_fingerprint)
 async def storage_treemap(_auth=Depends(require_auth)):
     """Get storage usage as a treemap structure (top-level directories)."""
-    rows = query("""
-        SELECT
-            f.parent_path as path,
-            SUM(f.size) as total_size,
-            COUNT(*) as file_count
-        FROM files f
-        WHERE f.is_directory = 0
-        GROUP BY f.parent_path
-        ORDER BY total_size DESC
-        LIMIT 50
-    """)
-    return [dict(r) for r in rows]
+    return await aquery(Q_TREEMAP)
+
+
+# Folders with nothing modified in 2+ years
+Q_FORGOTTEN_FOLDERS = """
+    SELECT
+        parent_path as folder,
+        dated_count as file_count,
+        dated_size as total_size,
+        last_modified
+    FROM folder_rollup
+    WHERE dated_count > 0 AND last_modified < date('now', '-2 years')
+    ORDER BY dated_size DESC
+    LIMIT 30
+"""
 
 
 @router.get("/insights/forgotten-folders")
+@cached(fingerprint=files_fingerprint)
 async def forgotten_folders(_auth=Depends(require_auth)):
     """Folders where no file has been modified in 2+ years, sorted by size."""
-    rows = query("""
-        SELECT
-            parent_path as folder,
-            COUNT(*) as file_count,
-            SUM(size) as total_size,
-            MAX(modified_at) as last_modified
-        FROM files
-        WHERE is_directory = 0 AND modified_at IS NOT NULL
-        GROUP BY parent_path
-        HAVING MAX(modified_at) < date('now', '-2 years')
-        ORDER BY total_size DESC
-        LIMIT 30
-    """)
-    return [dict(r) for r in rows]
+    return await aquery(Q_FORGOTTEN_FOLDERS)
+
+
+# Same file name in several folders, grouped in a single pass
+Q_NAMING_CONFLICTS = """
+    SELECT
+        name,
+        COUNT(*) as copies,
+        COUNT(DISTINCT parent_path) as locations,
+        GROUP_CONCAT(parent_path, ' | ') as folders,
+        SUM(size) as total_size,
+        COUNT(DISTINCT file_hash) as unique_versions  -- NULL hashes not counted
+    FROM files
+    WHERE is_directory = 0
+    GROUP BY name
+    HAVING COUNT(*) > 1 AND COUNT(DISTINCT parent_path) > 1
+    ORDER BY copies DESC
+    LIMIT 30
+"""
 
 
 @router.get("/insights/naming-conflicts")
+@cached(fingerprint=files_fingerprint)
 async def naming_conflicts(_auth=Depends(require_auth)):
     """Files with the same name in different folders (potential scattered copies)."""
-    rows = query("""
+    return await aquery(Q_NAMING_CONFLICTS)
+
+
+# Count, size and total duration per media kind (video/audio/image) in one
+# pass. file_id is unique in file_metadata, so the join never fans out, and
+# durations come from idx_metadata_duration rather than parsing the JSON.
+Q_MEDIA_TOTALS = """
+    SELECT
+        f.media_kind,
+        COUNT(*) as count,
+        COALESCE(SUM(f.size), 0) as total_size,
+        COALESCE(SUM(fm.duration_sec), 0) as total_seconds
+    FROM files f INDEXED BY idx_files_media
+    LEFT JOIN file_metadata fm INDEXED BY idx_metadata_duration
+        ON fm.file_id = f.id AND fm.duration_sec IS NOT NULL
+    WHERE f.is_directory = 0 AND f.media_kind IS NOT NULL
+    GROUP BY f.media_kind
+"""
+
+# Top 10 formats per media kind
+Q_MEDIA_FORMATS = """
+    SELECT media_kind, extension, count, total_size FROM (
         SELECT
-            name,
-            COUNT(*) as copies,
-            COUNT(DISTINCT parent_path) as locations,
-            GROUP_CONCAT(parent_path, ' | ') as folders,
+            media_kind,
+            ext as extension,
+            COUNT(*) as count,
             SUM(size) as total_size,
-            (SELECT COUNT(*) FROM (
-                SELECT DISTINCT file_hash FROM files f2
-                WHERE f2.name = files.name AND f2.is_directory = 0 AND f2.file_hash IS NOT NULL
-            )) as unique_versions
-        FROM files
-        WHERE is_directory = 0
-        GROUP BY name
-        HAVING COUNT(*) > 1 AND COUNT(DISTINCT parent_path) > 1
-        ORDER BY copies DESC
-        LIMIT 30
-    """)
-    return [dict(r) for r in rows]
+            ROW_NUMBER() OVER (PARTITION BY media_kind ORDER BY COUNT(*) DESC) as rn
+        FROM files INDEXED BY idx_files_media
+        WHERE is_directory = 0 AND media_kind IS NOT NULL AND ext IS NOT NULL
+        GROUP BY media_kind, ext
+    )
+    WHERE rn <= 10
+    ORDER BY media_kind, rn
+"""
 
 
 @router.get("/insights/media-summary")
+@cached(fingerprint=files_fingerprint)
 async def media_summary(_auth=Depends(require_auth)):
     """Summary of media files — counts, sizes, top formats."""
-    # Video stats
-    video = query("""
-        SELECT COUNT(*) as count, COALESCE(SUM(size), 0) as total_size
-        FROM files WHERE is_directory = 0 AND mime_type LIKE 'video/%'
-    """)
-    # Audio stats
-    audio = query("""
-        SELECT COUNT(*) as count, COALESCE(SUM(size), 0) as total_size
-        FROM files WHERE is_directory = 0 AND mime_type LIKE 'audio/%'
-    """)
-    # Image stats
-    images = query("""
-        SELECT COUNT(*) as count, COALESCE(SUM(size), 0) as total_size
-        FROM files WHERE is_directory = 0 AND mime_type LIKE 'image/%'
-    """)
-    # Top video formats
-    video_formats = query("""
-        SELECT
-            LOWER(SUBSTR(name, INSTR(name, '.'))) as extension,
-            COUNT(*) as count,
-            SUM(size) as total_size
-        FROM files
-        WHERE is_directory = 0 AND mime_type LIKE 'video/%' AND INSTR(name, '.') > 0
-        GROUP BY extension ORDER BY count DESC LIMIT 10
-    """)
-    # Top audio formats
-    audio_formats = query("""
-        SELECT
-            LOWER(SUBSTR(name, INSTR(name, '.'))) as extension,
-            COUNT(*) as count,
-            SUM(size) as total_size
-        FROM files
-        WHERE is_directory = 0 AND mime_type LIKE 'audio/%' AND INSTR(name, '.') > 0
-        GROUP BY extension ORDER BY count DESC LIMIT 10
-    """)
-    # Top image formats
-    image_formats = query("""
-        SELECT
-            LOWER(SUBSTR(name, INSTR(name, '.'))) as extension,
-            COUNT(*) as count,
-            SUM(size) as total_size
-        FROM files
-        WHERE is_directory = 0 AND mime_type LIKE 'image/%' AND INSTR(name, '.') > 0
-        GROUP BY extension ORDER BY count DESC LIMIT 10
-    """)
-    # Video duration from metadata (if extracted)
-    duration_row = query("""
-        SELECT COALESCE(SUM(CAST(json_extract(fm.metadata, '$.duration') AS REAL)), 0) as total_seconds
-        FROM file_metadata fm
-        JOIN files f ON f.id = fm.file_id
-        WHERE f.mime_type LIKE 'video/%'
-        AND json_extract(fm.metadata, '$.duration') IS NOT NULL
-    """)
-    video_duration_sec = duration_row[0]["total_seconds"] if duration_row else 0
-
-    audio_dur_row = query("""
-        SELECT COALESCE(SUM(CAST(json_extract(fm.metadata, '$.duration') AS REAL)), 0) as total_seconds
-        FROM file_metadata fm
-        JOIN files f ON f.id = fm.file_id
-        WHERE f.mime_type LIKE 'audio/%'
-        AND json_extract(fm.metadata, '$.duration') IS NOT NULL
-    """)
-    audio_duration_sec = audio_dur_row[0]["total_seconds"] if audio_dur_row else 0
-
-    v = video[0] if video else {"count": 0, "total_size": 0}
-    a = audio[0] if audio else {"count": 0, "total_size": 0}
-    i = images[0] if images else {"count": 0, "total_size": 0}
+    totals, format_rows = await aquery_many([(Q_MEDIA_TOTALS, ()), (Q_MEDIA_FORMATS, ())])
+
+    by_kind = {r["media_kind"]: r for r in totals}
+    formats = {"video": [], "audio": [], "image": []}
+    for r in format_rows:
+        formats[r.pop("media_kind")].append(r)
+
+    empty = {"count": 0, "total_size": 0, "total_seconds": 0}
+    v = by_kind.get("video", empty)
+    a = by_kind.get("audio", empty)
+    i = by_kind.get("image", empty)
 
     return {
         "video": {"count": v["count"], "total_size": v["total_size"],
-                  "duration_hours": round(video_duration_sec / 3600, 1),
-                  "formats": [dict(r) for r in video_formats]},
+                  "duration_hours": round(v["total_seconds"] / 3600, 1),
+                  "formats": formats["video"]},
         "audio": {"count": a["count"], "total_size": a["total_size"],
-                  "duration_hours": round(audio_duration_sec / 3600, 1),
-                  "formats": [dict(r) for r in audio_formats]},
+                  "duration_hours": round(a["total_seconds"] / 3600, 1),
+                  "formats": formats["audio"]},
         "images": {"count": i["count"], "total_size": i["total_size"],
-                   "formats": [dict(r) for r in image_formats]},
+                   "formats": formats["image"]},
     }
 
 
-@router.get("/insights/growth-estimate")
-async def growth_estimate(_auth=Depends(require_auth)):
-    """Monthly storage growth rate + projection."""
-    # Monthly growth over last 12 months
-    monthly = query("""
+# Monthly growth over last 12 months, followed by one 'AVG' row holding the
+# per-month averages (0 unless there are at least two months to average)
+Q_GROWTH_MONTHLY = """
+    WITH m AS (
         SELECT
-            SUBSTR(modified_at, 1, 7) as month,
+            modified_month as month,
             COUNT(*) as files_added,
             SUM(size) as bytes_added
-        FROM files
+        FROM files INDEXED BY idx_files_month
         WHERE is_directory = 0 AND modified_at IS NOT NULL
+            AND modified_month >= strftime('%Y-%m', 'now', '-12 months')
             AND modified_at >= date('now', '-12 months')
-        GROUP BY month
-        ORDER BY month ASC
-    """)
+        GROUP BY modified_month
+    )
+    SELECT month, files_added, bytes_added FROM m
+    UNION ALL
+    SELECT
+        'AVG',
+        CASE WHEN COUNT(*) >= 2 THEN AVG(files_added) ELSE 0 END,
+        CASE WHEN COUNT(*) >= 2 THEN AVG(bytes_added) ELSE 0 END
+    FROM m
+    ORDER BY month  -- 'AVG' sorts after every 'YYYY-MM'
+"""
 
-    total_row = query("""
-        SELECT COALESCE(SUM(size), 0) as total FROM files WHERE is_directory = 0
-    """)
-    total_bytes = total_row[0]["total"] if total_row else 0
+# Current total size (maintained in stats_cache)
+Q_TOTAL_SIZE = "SELECT value as total FROM stats_cache WHERE key = 'total_size'"
 
-    months_data = [dict(r) for r in monthly]
 
-    # Calculate average monthly growth
-    if len(months_data) >= 2:
-        total_growth = sum(m["bytes_added"] for m in months_data)
-        avg_monthly_bytes = total_growth / len(months_data)
-        avg_monthly_files = sum(m["files_added"] for m in months_data) / len(months_data)
-    else:
-        avg_monthly_bytes = 0
-        avg_monthly_files = 0
+@router.get("/insights/growth-estimate")
+@cached(fingerprint=files_fingerprint)
+async def growth_estimate(_auth=Depends(require_auth)):
+    """Monthly storage growth rate + projection."""
+    months_data, total_row = await aquery_many([(Q_GROWTH_MONTHLY, ()), (Q_TOTAL_SIZE, ())])
+    total_bytes = total_row[0]["total"] if total_row else 0
+    avg = months_data.pop()
+    avg_monthly_bytes = avg["bytes_added"]
+    avg_monthly_files = avg["files_added"]
 
     return {
         "monthly": months_data,
@@ -1,19 +1,87 @@
 """File browsing and listing endpoints."""
 from __future__ import annotations
 
+import base64
 import json
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, HTTPException, Query
 from typing import Optional
 
-from ..database import query
+from ..database import query, FILE_COLUMNS, TAGS_CSV
 from ..models import FileItem, FileListResponse, FolderNode
 from ..security import require_auth
 
 router = APIRouter(prefix="/api", tags=["files"])
 
+# Listing sorts whose idx_files_parent_dir_* index stores the column
+# descending. Index entries end in the rowid ascending, so there the id
+# tiebreaker runs opposite to the sort to keep the order a plain index walk.
+_DESC_INDEXED = {"size", "modified_at"}
+
+
+def _encode_cursor(sort_by: str, order_sql: str, row: dict) -> str:
+    key = [sort_by, order_sql, row["is_directory"], row[sort_by], row["id"]]
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode()
+
+
+def _decode_cursor(cursor: str, sort_by: str, order_sql: str) -> tuple:
+    try:
+        key_sort, key_order, is_dir, value, last_id = json.loads(base64.urlsafe_b64decode(cursor))
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if (key_sort, key_order) != (sort_by, order_sql):
+        raise HTTPException(status_code=400, detail="Cursor belongs to a different sort order")
+    return is_dir, value, last_id
+
+
+def _seek_rows(where: str, params: list, sort_by: str, order_sql: str,
+               id_order: str, after: tuple, n: int) -> list[dict]:
+    """Up to n listing rows after the cursor key, without OFFSET.
+
+    The listing is directories then files, and in each of those, rows whose
+    sort value is NULL come first (ASC) or last (DESC) as in ORDER BY. Each
+    of those segments is an index seek walked in order; later segments are
+    only queried while the page is not full.
+    """
+    is_dir, value, last_id = after
+    col = f"f.{sort_by}"
+    cmp = "<" if order_sql == "DESC" else ">"
+    id_cmp = "<" if id_order == "DESC" else ">"
+
+    segments = []  # (is_directory, condition, params) in listing order
+    for d in (1, 0):
+        if d > is_dir:
+            continue
+        parts = [f"{col} IS NULL", f"{col} IS NOT NULL"]
+        if sort_by == "name":  # NOT NULL: one segment
+            parts = parts[1:]
+        if order_sql == "DESC":
+            parts.reverse()
+        if d == is_dir:
+            # Resume inside the cursor's segment, then the ones after it
+            if value is None:
+                parts = parts[parts.index(f"{col} IS NULL") + 1:]
+                segments.append((d, f"{col} IS NULL AND f.id {id_cmp} ?", [last_id]))
+            else:
+                parts = parts[parts.index(f"{col} IS NOT NULL") + 1:]
+                segments.append((d, f"{col} {cmp}= ? AND ({col} {cmp} ? OR f.id {id_cmp} ?)",
+                                 [value, value, last_id]))
+        segments += [(d, part, []) for part in parts]
+
+    rows = []
+    for d, condition, extra in segments:
+        rows += query(f"""
+            SELECT {FILE_COLUMNS}, {TAGS_CSV} FROM files f
+            WHERE {where} AND f.is_directory = ? AND {condition}
+            ORDER BY {col} {order_sql}, f.id {id_order}
+            LIMIT ?
+        """, (*params, d, *extra, n - len(rows)))
+        if len(rows) >= n:
+            break
+    return rows
+
 
 @router.get("/files", response_model=FileListResponse)
-async def list_files(
+def list_files(
     parent_path: Optional[str] = Query(None, description="Parent directory path (/ for root)"),
     sort_by: str = Query("name", description="Sort field: name, size, modified_at, mime_type"),
     order: str = Query("asc", description="Sort order: asc or desc"),
@@ -21,18 +89,30 @@ async def list_files(
     limit: int = Query(50, ge=1, le=200),
     mime_filter: Optional[str] = Query(None, description="Filter by MIME prefix, e.g. 'video/'"),
     tag: Optional[str] = Query(None, description="Filter by tag"),
+    after: Optional[str] = Query(None, description="next_cursor of the previous page (replaces skip)"),
     _auth=Depends(require_auth),
 ):
     """List files in a directory with pagination and sorting."""
     # Default to root
     if parent_path is None:
         parent_path = "/"
+    return _list_files_core(parent_path, sort_by, order, skip, limit, mime_filter, tag, after)
 
+
+def _list_files_core(
+    parent_path: str, sort_by: str, order: str, skip: int, limit: int,
+    mime_filter: Optional[str] = None, tag: Optional[str] = None, after: Optional[str] = None,
+) -> FileListResponse:
+    """The listing behind list_files and browse_path, with plain arguments."""
     # Validate sort field
     valid_sorts = {"name", "size", "modified_at", "mime_type", "created_at"}
     if sort_by not in valid_sorts:
         sort_by = "name"
     order_sql = "DESC" if order.lower() == "desc" else "ASC"
+    if sort_by in _DESC_INDEXED:
+        id_order = "ASC" if order_sql == "DESC" else "DESC"
+    else:
+        id_order = order_sql
 
     # Build query
     conditions = ["f.parent_path = ?"]
@@ -48,47 +128,56 @@ async def list_files(
 
     where = " AND ".join(conditions)
 
-    # Directories first, then sort
-    sql = f"""
-        SELECT f.* FROM files f
-        WHERE {where}
-        ORDER BY f.is_directory DESC, f.{sort_by} {order_sql}
-        LIMIT ? OFFSET ?
-    """
-    params.extend([limit, skip])
-
-    rows = query(sql, tuple(params))
-
-    # Get total count
-    count_sql = f"SELECT COUNT(*) as cnt FROM files f WHERE {where}"
-    total = query(count_sql, tuple(params[:-2]))[0]["cnt"]
-
-    # Get tags for each file
-    items = []
-    for row in rows:
-        tags = _get_tags(row["id"])
-        items.append(FileItem.from_row(row, tags))
-
-    return FileListResponse(
+    def count() -> int:
+        return query(f"SELECT COUNT(*) as cnt FROM files f WHERE {where}", tuple(params))[0]["cnt"]
+
+    if after:
+        # Keyset page: seek straight past the previous page's last row
+        rows = _seek_rows(where, params, sort_by, order_sql, id_order,
+                          _decode_cursor(after, sort_by, order_sql), limit + 1)
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        total = count()
+    else:
+        # Directories first, then sort. For name/size/modified_at this walks an
+        # idx_files_parent_dir_* index and stops after the page, so the total is
+        # a separate count, skipped when the page itself shows where the end is.
+        sql = f"""
+            SELECT {FILE_COLUMNS}, {TAGS_CSV} FROM files f
+            WHERE {where}
+            ORDER BY f.is_directory DESC, f.{sort_by} {order_sql}, f.id {id_order}
+            LIMIT ? OFFSET ?
+        """
+        rows = query(sql, (*params, limit, skip))
+
+        if len(rows) < limit and (rows or not skip):
+            total = skip + len(rows)
+        else:
+            total = count()
+        has_more = (skip + limit) < total
+
+    items = FileItem.from_rows(rows)
+
+    return FileListResponse.model_construct(
         items=items,
         total=total,
-        has_more=(skip + limit) < total,
+        has_more=has_more,
+        next_cursor=_encode_cursor(sort_by, order_sql, rows[-1]) if has_more and rows else None,
     )
 
 
 @router.get("/files/{file_id}", response_model=FileItem)
-async def get_file(
+def get_file(
     file_id: int,
     _auth=Depends(require_auth),
 ):
     """Get detailed info about a single file."""
-    rows = query("SELECT * FROM files WHERE id = ?", (file_id,))
+    rows = query(f"SELECT {FILE_COLUMNS}, {TAGS_CSV} FROM files f WHERE f.id = ?", (file_id,))
     if not rows:
         from fastapi import HTTPException
         raise HTTPException(status_code=404, detail="File not found")
 
     row = rows[0]
-    tags = _get_tags(file_id)
 
     # Get metadata
     meta_rows = query("SELECT metadata FROM file_metadata WHERE file_id = ?", (file_id,))
@@ -99,67 +188,71 @@ async def get_file(
         except (json.JSONDecodeError, TypeError):
             pass
 
-    item = FileItem.from_row(row, tags)
+    item = FileItem.from_row(row)
     item.metadata = metadata
     return item
 
 
+# Directories reachable from the roots (directories whose parent is not an
+# indexed directory) without going below the given path depth, i.e. the
+# number of '/' in the path. Roots themselves are not depth-limited. UNION
+# rather than UNION ALL so a self-parented row can't recurse forever.
+Q_FOLDER_TREE = """
+    WITH RECURSIVE tree(id, name, path, parent_path) AS (
+        SELECT d.id, d.name, d.path, d.parent_path FROM files d
+        WHERE d.is_directory = 1 AND NOT EXISTS (
+            SELECT 1 FROM files p
+            WHERE p.path = d.parent_path AND p.is_directory = 1 AND p.path <> d.path
+        )
+        UNION
+        SELECT f.id, f.name, f.path, f.parent_path FROM tree t
+        JOIN files f ON f.parent_path = t.path
+        WHERE f.is_directory = 1 AND f.path_depth <= ? AND f.path <> t.path
+    )
+    SELECT t.id, t.name, t.path, t.parent_path, COALESCE(r.file_count, 0) as file_count
+    FROM tree t
+    LEFT JOIN folder_rollup r ON r.parent_path = t.path
+    ORDER BY t.path
+"""
+
+
 @router.get("/tree", response_model=list[FolderNode])
-async def get_folder_tree(
+def get_folder_tree(
     depth: int = Query(3, ge=1, le=10),
     _auth=Depends(require_auth),
 ):
     """Get hierarchical folder tree for sidebar navigation."""
-    # Get all directories
-    dirs = query(
-        "SELECT id, name, path, parent_path FROM files WHERE is_directory = 1 ORDER BY path"
-    )
+    rows = query(Q_FOLDER_TREE, (depth,))
 
-    # Build tree
+    # Parents sort before their children, so one pass links every node
     nodes_by_path = {}
     root_children = []
-
-    for d in dirs:
-        node = FolderNode(
+    for d in rows:
+        node = FolderNode.model_construct(
             id=d["id"],
             name=d["name"],
             path=d["path"],
             children=[],
+            file_count=d["file_count"],
         )
-        nodes_by_path[d["path"]] = node
-
-    # Get file counts per directory
-    counts = query(
-        "SELECT parent_path, COUNT(*) as cnt FROM files WHERE is_directory = 0 GROUP BY parent_path"
-    )
-    count_map = {c["parent_path"]: c["cnt"] for c in counts}
-
-    for d in dirs:
-        node = nodes_by_path[d["path"]]
-        node.file_count = count_map.get(d["path"], 0)
-
-        parent = d["parent_path"]
-        if parent and parent in nodes_by_path:
-            # Check depth
-            node_depth = d["path"].count("/")
-            if node_depth <= depth:
-                nodes_by_path[parent].children.append(node)
-        elif d["path"] == "/":
-            root_children.insert(0, node)
-        elif parent is None or parent not in nodes_by_path:
-            # Top-level directory
+        parent = nodes_by_path.get(d["parent_path"])
+        if parent is not None:
+            parent.children.append(node)
+        else:
             root_children.append(node)
+        nodes_by_path[d["path"]] = node
 
     return root_children
 
 
 @router.get("/browse/{path:path}")
-async def browse_path(
+def browse_path(
     path: str,
     sort_by: str = Query("name"),
     order: str = Query("asc"),
     skip: int = Query(0, ge=0),
     limit: int = Query(50, ge=1, le=200),
+    after: Optional[str] = Query(None),
     _auth=Depends(require_auth),
 ):
     """Browse files by path with breadcrumb navigation."""
@@ -173,23 +266,13 @@ async def browse_path(
         crumb_path = "/" + "/".join(parts[:i+1])
         breadcrumb.append({"name": part, "path": crumb_path})
 
-    # Get files using the list endpoint logic
-    result = await list_files(
-        parent_path=browse_path,
-        sort_by=sort_by,
-        order=order,
-        skip=skip,
-        limit=limit,
-    )
+    result = _list_files_core(browse_path, sort_by, order, skip, limit, after=after)
 
     return {
         "breadcrumb": breadcrumb,
         "current_path": browse_path,
-        **result.model_dump(),
+        "items": result.items,
+        "total": result.total,
+        "has_more": result.has_more,
+        "next_cursor": result.next_cursor,
     }
-
-
-def _get_tags(file_id: int) -> list[str]:
-    """Get tags for a file."""
-    rows = query("SELECT tag FROM file_tags WHERE file_id = ?", (file_id,))
-    return [r["tag"] for r in rows]
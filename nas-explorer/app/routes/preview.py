@@ -1,27 +1,40 @@
 """Preview/thumbnail serving and file streaming endpoints."""
 from __future__ import annotations
 
-import os
 import hashlib
-from fastapi import APIRouter, Depends, Query, HTTPException
-from fastapi.responses import FileResponse, StreamingResponse
+import os
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, Query, HTTPException
+from fastapi.responses import Response, StreamingResponse
 
 from ..database import query
-from ..previews import get_preview_smb
+from ..previews import get_preview_smb, read_preview_bytes
 from ..security import require_auth, get_smb_path
 from ..smb_fs import download_to_temp, cleanup_temp, open_file, is_dir
 
 router = APIRouter(prefix="/api", tags=["preview"])
 
+# Bytes requested per SMB read when streaming. Larger reads mean fewer
+# round-trips; the server may return less (its negotiated max read size).
+STREAM_CHUNK_SIZE = 4 * 1024 * 1024
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
 
 @router.get("/preview/{file_id}")
-async def serve_preview(
+def serve_preview(
     file_id: int,
     size: str = Query("medium", description="Preview size: small, medium, large"),
+    if_none_match: Optional[str] = Header(None),
     _auth=Depends(require_auth),
 ):
     """Serve a cached preview/thumbnail for a file."""
-    rows = query("SELECT path, mime_type, file_hash FROM files WHERE id = ?", (file_id,))
+    rows = query("SELECT path, mime_type, file_hash, size FROM files WHERE id = ?", (file_id,))
     if not rows:
         raise HTTPException(status_code=404, detail="File not found")
 
@@ -34,20 +47,29 @@ async def serve_preview(
         raise HTTPException(status_code=404, detail="File not accessible")
 
     # Generate or get cached preview
-    preview_path = get_preview_smb(smb_path, row["mime_type"], row["file_hash"], size)
+    preview_path = get_preview_smb(smb_path, row["mime_type"], row["file_hash"], size, row["size"])
+
+    if not preview_path:
+        raise HTTPException(status_code=404, detail="No preview available")
+
+    # The cache file name is <file hash or path key>_<size>, so it changes
+    # whenever the preview would; a match means the client's copy is current.
+    headers = {
+        "Cache-Control": "public, max-age=86400",
+        "ETag": f'"{os.path.basename(preview_path).rsplit(".", 1)[0]}"',
+    }
+    if if_none_match and _etag_matches(if_none_match, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
 
-    if preview_path and os.path.exists(preview_path):
-        return FileResponse(
-            preview_path,
-            media_type="image/webp",
-            headers={"Cache-Control": "public, max-age=86400"},
-        )
+    content = read_preview_bytes(preview_path)
+    if content is not None:
+        return Response(content, media_type="image/webp", headers=headers)
 
     raise HTTPException(status_code=404, detail="No preview available")
 
 
 @router.get("/stream/{file_id}")
-async def stream_file(
+def stream_file(
     file_id: int,
     _auth=Depends(require_auth),
 ):
@@ -73,9 +95,9 @@ async def stream_file(
     # Stream the file in chunks from SMB
     def iter_smb_file():
         try:
-            with open_file(smb_path) as f:
+            with open_file(smb_path, buffering=0) as f:
                 while True:
-                    chunk = f.read(1024 * 1024)  # 1MB chunks
+                    chunk = f.read(STREAM_CHUNK_SIZE)
                     if not chunk:
                         break
                     yield chunk
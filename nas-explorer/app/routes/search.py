@@ -1,11 +1,12 @@
 """Full-text search endpoint."""
 from __future__ import annotations
 
+import re
 import time
 import json
 from fastapi import APIRouter, Depends
 
-from ..database import query
+from ..database import query, FILE_COLUMNS, TAGS_CSV
 from ..models import SearchRequest, SearchResponse, FileItem
 from ..security import require_auth
 
@@ -13,7 +14,7 @@ router = APIRouter(prefix="/api", tags=["search"])
 
 
 @router.post("/search", response_model=SearchResponse)
-async def search(
+def search(
     req: SearchRequest,
     _auth=Depends(require_auth),
 ):
@@ -24,10 +25,13 @@ async def search(
     start = time.time()
 
     # Build FTS query — escape special characters
-    fts_query = req.query.replace('"', '""')
+    fts_query = req.query.strip().replace('"', '""')
 
     # Support simple AND/OR by splitting words
     words = fts_query.split()
+    if not words:
+        # Nothing to match (an empty phrase is an FTS5 syntax error)
+        return SearchResponse.model_construct(items=[], total=0, search_time_ms=0.0)
     if len(words) > 1:
         # Default to AND matching
         fts_terms = " AND ".join(f'"{w}"' for w in words)
@@ -35,86 +39,69 @@ async def search(
         # Single word — use prefix match
         fts_terms = f'"{fts_query}"*'
 
-    # Base FTS query
-    sql = """
-        SELECT f.*, fts.rank
-        FROM files_fts fts
-        JOIN files f ON f.id = fts.rowid
-        WHERE files_fts MATCH ?
-    """
+    # Filters, shared by the page query and the past-the-end count
+    where = "files_fts MATCH ?"
     params = [fts_terms]
 
-    # Apply filters
     if req.mime_type:
-        sql += " AND f.mime_type LIKE ?"
+        where += " AND f.mime_type LIKE ?"
         params.append(f"{req.mime_type}%")
 
     if req.min_size is not None:
-        sql += " AND f.size >= ?"
+        where += " AND f.size >= ?"
         params.append(req.min_size)
 
     if req.max_size is not None:
-        sql += " AND f.size <= ?"
+        where += " AND f.size <= ?"
         params.append(req.max_size)
 
     if req.tags:
-        for tag in req.tags:
-            sql += " AND f.id IN (SELECT file_id FROM file_tags WHERE tag = ?)"
-            params.append(tag)
+        # All tags must match: one idx_tags_tag range scan, grouped per file
+        tags = list(dict.fromkeys(req.tags))
+        where += (
+            " AND f.id IN (SELECT file_id FROM file_tags"
+            f" WHERE tag IN ({', '.join('?' * len(tags))})"
+            " GROUP BY file_id HAVING COUNT(DISTINCT tag) = ?)"
+        )
+        params.extend(tags)
+        params.append(len(tags))
 
     # Sorting
-    if req.sort_by == "relevance":
-        sql += " ORDER BY fts.rank"
-    elif req.sort_by == "size":
-        sql += " ORDER BY f.size DESC"
+    if req.sort_by == "size":
+        order_by = "f.size DESC"
     elif req.sort_by == "modified_at":
-        sql += " ORDER BY f.modified_at DESC"
+        order_by = "f.modified_at DESC"
     elif req.sort_by == "name":
-        sql += " ORDER BY f.name ASC"
+        order_by = "f.name ASC"
     else:
-        sql += " ORDER BY fts.rank"
+        order_by = "fts.rank"
 
-    # Count total (without pagination)
-    count_sql = f"""
-        SELECT COUNT(*) as cnt
+    # The window count gives the total (without pagination) in the same pass
+    sql = f"""
+        SELECT {FILE_COLUMNS}, {TAGS_CSV}, COUNT(*) OVER () AS _total
         FROM files_fts fts
         JOIN files f ON f.id = fts.rowid
-        WHERE files_fts MATCH ?
+        WHERE {where}
+        ORDER BY {order_by}
+        LIMIT ? OFFSET ?
     """
-    count_params = [fts_terms]
-    if req.mime_type:
-        count_sql += " AND f.mime_type LIKE ?"
-        count_params.append(f"{req.mime_type}%")
-    if req.min_size is not None:
-        count_sql += " AND f.size >= ?"
-        count_params.append(req.min_size)
-    if req.max_size is not None:
-        count_sql += " AND f.size <= ?"
-        count_params.append(req.max_size)
-    if req.tags:
-        for tag in req.tags:
-            count_sql += " AND f.id IN (SELECT file_id FROM file_tags WHERE tag = ?)"
-            count_params.append(tag)
-
-    total_rows = query(count_sql, tuple(count_params))
-    total = total_rows[0]["cnt"] if total_rows else 0
-
-    # Apply pagination
-    sql += " LIMIT ? OFFSET ?"
-    params.extend([req.limit, req.skip])
-
-    rows = query(sql, tuple(params))
+    rows = query(sql, (*params, req.limit, req.skip))
+
+    if rows:
+        total = rows[0]["_total"]
+    elif req.skip:
+        total = query(
+            f"SELECT COUNT(*) as cnt FROM files_fts fts JOIN files f ON f.id = fts.rowid WHERE {where}",
+            tuple(params),
+        )[0]["cnt"]
+    else:
+        total = 0
 
-    # Build response
-    items = []
-    for row in rows:
-        tags_rows = query("SELECT tag FROM file_tags WHERE file_id = ?", (row["id"],))
-        tags = [t["tag"] for t in tags_rows]
-        items.append(FileItem.from_row(row, tags))
+    items = FileItem.from_rows(rows)
 
     elapsed = (time.time() - start) * 1000
 
-    return SearchResponse(
+    return SearchResponse.model_construct(
         items=items,
         total=total,
         search_time_ms=round(elapsed, 2),
@@ -122,16 +109,37 @@ async def search(
 
 
 @router.get("/search/suggest")
-async def search_suggest(
+def search_suggest(
     q: str,
     limit: int = 10,
     _auth=Depends(require_auth),
 ):
-    """Quick search suggestions (file names matching prefix)."""
+    """Quick search suggestions: names starting with q, then names with a
+    word starting with q."""
+    q = q.strip()
+    if not q or limit <= 0:
+        return []
+
+    # Names starting with q: a range on the NOCASE index, already in name order
+    pattern = re.sub(r"([\\%_])", r"\\\1", q) + "%"
     rows = query(
-        "SELECT id, name, path, mime_type FROM files WHERE name LIKE ? AND is_directory = 0 LIMIT ?",
-        (f"%{q}%", limit),
+        "SELECT id, name, path, mime_type FROM files INDEXED BY idx_files_name_nocase"
+        " WHERE name LIKE ? ESCAPE '\\' AND is_directory = 0"
+        " ORDER BY name COLLATE NOCASE LIMIT ?",
+        (pattern, limit),
     )
+
+    # Fill up with word-prefix matches anywhere in the name from the FTS index
+    words = re.findall(r"\w+", q)
+    if len(rows) < limit and words:
+        seen = [r["id"] for r in rows]
+        rows += query(
+            "SELECT f.id, f.name, f.path, f.mime_type FROM files_fts fts"
+            " JOIN files f ON f.id = fts.rowid"
+            " WHERE files_fts MATCH ? AND f.is_directory = 0"
+            f" AND f.id NOT IN ({', '.join('?' * len(seen))}) LIMIT ?",
+            ("name : (" + " ".join(f'"{w}"*' for w in words) + ")", *seen, limit - len(rows)),
+        )
     return [
         {"id": r["id"], "name": r["name"], "path": r["path"], "mime_type": r["mime_type"]}
         for r in rows
@@ -45,11 +45,11 @@ async def setup_status():
     Get current NAS connection status.
     Frontend uses this to decide: show setup wizard or main app.
     """
-    return get_connection_status()
+    return await get_connection_status()
 
 
 @router.post("/discover")
-async def discover_nas_shares(req: NASTestRequest):
+def discover_nas_shares(req: NASTestRequest):
     """Discover available SMB shares on a host."""
     if not req.host:
         raise HTTPException(status_code=400, detail="Host is required")
@@ -63,7 +63,7 @@ async def discover_nas_shares(req: NASTestRequest):
 
 
 @router.post("/test")
-async def test_nas_connection(req: NASConnectRequest):
+def test_nas_connection(req: NASConnectRequest):
     """Test NAS connection without saving."""
     if not req.host or not req.share:
         raise HTTPException(status_code=400, detail="Host and share are required")
@@ -73,7 +73,7 @@ async def test_nas_connection(req: NASConnectRequest):
 
 
 @router.post("/add-source")
-async def add_nas_source(req: NASConnectRequest):
+def add_nas_source(req: NASConnectRequest):
     """
     Add a new NAS source (share/folder). Supports multiple sources.
     Tests connection first, then saves and optionally starts scan.
@@ -117,13 +117,13 @@ async def add_nas_source(req: NASConnectRequest):
 
 # Keep /connect as alias for backward compatibility
 @router.post("/connect")
-async def connect_to_nas(req: NASConnectRequest):
+def connect_to_nas(req: NASConnectRequest):
     """Connect to NAS (alias for add-source)."""
-    return await add_nas_source(req)
+    return add_nas_source(req)
 
 
 @router.post("/remove-source")
-async def remove_nas_source(req: NASRemoveRequest):
+def remove_nas_source(req: NASRemoveRequest):
     """
     Remove a NAS source.
     If a scan is running, stop it first, then remove the source and purge its
@@ -177,7 +177,7 @@ async def list_sources():
 
 
 @router.get("/discover-available")
-async def discover_available():
+def discover_available():
     """
     Discover all shares on the NAS using saved credentials.
     Returns all shares with a flag indicating which are already added.
@@ -205,7 +205,7 @@ async def discover_available():
 
 
 @router.post("/quick-add")
-async def quick_add_source(req: NASRemoveRequest):
+def quick_add_source(req: NASRemoveRequest):
     """
     Quickly add a share by name, using saved credentials from existing sources.
     The source_id field is used as the share name here.
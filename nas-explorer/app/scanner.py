@@ -16,18 +16,26 @@ import hashlib
 import threading
 import logging
 import json
+import time
 from datetime import datetime, timezone
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from itertools import islice
+
+try:
+    import blake3
+except ImportError:  # optional: hash_algorithm = "blake3" falls back to sha256
+    blake3 = None
 
 from .config import settings
-from .database import get_connection, query, execute
+from .database import get_connection, query, execute, bulk
 from .smb_fs import (
-    SMBSource, walk, stat, open_file, download_to_temp, cleanup_temp,
+    SMBSource, walk_stat, stat, open_file, download_to_temp, cleanup_temp,
     smb_to_relative, relative_to_smb, get_mime_type, register_source,
 )
 from .nas_manager import get_sources
 from .extractor import extract_text, extract_metadata
-from .categorizer import categorize_file
+from .categorizer import categorize_batch, categorize_file_fast, file_ext
+from .ttl_cache import invalidate as invalidate_cached_responses
 
 logger = logging.getLogger("nas_explorer.scanner")
 
@@ -73,6 +81,20 @@ def _is_cancelled() -> bool:
 
 # ─── Phase 1: Fast Index ─────────────────────────────────────────────────
 
+def _same_mtime(stored: str | None, mtime: str) -> bool:
+    """Whether a stored modified_at matches a freshly listed one.
+
+    Listings carry whole microseconds while stat() gave 100 ns precision that
+    was rounded, so values stored by older scans can be 1 µs off.
+    """
+    if stored == mtime:
+        return True
+    try:
+        delta = datetime.fromisoformat(stored) - datetime.fromisoformat(mtime)
+    except (TypeError, ValueError):
+        return False
+    return abs(delta.total_seconds()) <= 1e-6
+
 def _phase1_index(source: SMBSource, conn, full_scan: bool) -> set:
     """
     Phase 1: Walk the SMB share and insert file entries into DB.
@@ -86,17 +108,11 @@ def _phase1_index(source: SMBSource, conn, full_scan: bool) -> set:
         _scan_state["current_source"] = label
         _scan_state["phase"] = "indexing"
 
-    # Load existing for incremental skip
-    existing = {}
-    if not full_scan:
-        rows = conn.execute(
-            "SELECT path, modified_at FROM files WHERE path LIKE ?",
-            (f"/{label}/%",)
-        ).fetchall()
-        existing = {row[0]: row[1] for row in rows}
-
     seen_paths = set()
     batch = []
+    tag_rows = []  # (tag, path) for the files in batch
+    now_ts = time.time()
+    started_at = datetime.now(timezone.utc).isoformat()
 
     try:
         register_source(source)
@@ -107,7 +123,7 @@ def _phase1_index(source: SMBSource, conn, full_scan: bool) -> set:
             _scan_state["error_log"].append(f"Source {source.source_id}: {e}")
         return seen_paths
 
-    for dirpath, dirnames, filenames in walk(source):
+    for dirpath, dir_stat, file_stats in walk_stat(source):
         if _is_cancelled():
             logger.info(f"Phase 1 cancelled during source: {source.source_id}")
             break
@@ -119,8 +135,19 @@ def _phase1_index(source: SMBSource, conn, full_scan: bool) -> set:
 
         seen_paths.add(rel_dir)
 
-        # Directory entry
-        dir_stat = stat(dirpath)
+        # Indexed files of this directory, for the incremental skip. Loaded
+        # per directory (an idx_files_parent_dir_* range) rather than the
+        # whole source up front, which for a big share is millions of rows.
+        existing = {}
+        if not full_scan:
+            existing = dict(conn.execute(
+                "SELECT path, modified_at FROM files WHERE parent_path = ? AND is_directory = 0",
+                (rel_dir,)
+            ).fetchall())
+
+        # Directory entry (the root's info is not in any listing)
+        if dir_stat is None:
+            dir_stat = stat(dirpath)
         dir_mtime = None
         if dir_stat:
             dir_mtime = datetime.fromtimestamp(dir_stat.mtime, tz=timezone.utc).isoformat()
@@ -139,8 +166,9 @@ def _phase1_index(source: SMBSource, conn, full_scan: bool) -> set:
             None,  # full_text
         ))
 
-        for filename in filenames:
-            smb_filepath = dirpath.rstrip("\\") + "\\" + filename
+        for file_stat in file_stats:
+            filename = file_stat.name
+            smb_filepath = file_stat.path
             rel_path = smb_to_relative(smb_filepath, source)
             seen_paths.add(rel_path)
 
@@ -148,17 +176,13 @@ def _phase1_index(source: SMBSource, conn, full_scan: bool) -> set:
                 _scan_state["files_scanned"] += 1
 
             try:
-                file_stat = stat(smb_filepath)
-                if not file_stat:
-                    continue
-
                 mtime = datetime.fromtimestamp(file_stat.mtime, tz=timezone.utc).isoformat()
                 ctime = datetime.fromtimestamp(file_stat.ctime, tz=timezone.utc).isoformat()
                 size = file_stat.size
 
                 # Skip unchanged files in incremental mode
                 if not full_scan and rel_path in existing:
-                    if existing[rel_path] == mtime:
+                    if _same_mtime(existing[rel_path], mtime):
                         continue
 
                 # MIME by extension (fast, no download)
@@ -180,10 +204,14 @@ def _phase1_index(source: SMBSource, conn, full_scan: bool) -> set:
 
                 # Auto-categorize (fast, extension-based)
                 try:
-                    tags = categorize_file(filename, mime, size, mtime)
-                    # We'll insert tags after flushing the file batch
+                    tags = categorize_file_fast(
+                        file_ext(filename), mime, size, file_stat.mtime,
+                        filename.lower(), now_ts,
+                    )
+                    # Inserted with the batch, once the row has its id
+                    tag_rows.extend((tag, rel_path) for tag in tags)
                 except Exception:
-                    tags = []
+                    pass
 
                 with _scan_lock:
                     if rel_path in existing:
@@ -199,15 +227,16 @@ def _phase1_index(source: SMBSource, conn, full_scan: bool) -> set:
 
             # Flush batch
             if len(batch) >= settings.scan_batch_size:
-                _flush_batch_phase1(conn, batch)
+                _flush_batch_phase1(conn, batch, tag_rows)
                 batch.clear()
+                tag_rows.clear()
 
     # Final flush
     if batch:
-        _flush_batch_phase1(conn, batch)
+        _flush_batch_phase1(conn, batch, tag_rows)
 
-    # Tag all newly indexed files
-    _apply_tags_bulk(conn, label)
+    # Re-tag the files this scan left alone, which can have aged into "old"
+    _apply_tags_bulk(conn, label, started_at)
 
     # Remove stale files (full scan only)
     if full_scan and not _is_cancelled():
@@ -216,36 +245,39 @@ def _phase1_index(source: SMBSource, conn, full_scan: bool) -> set:
     return seen_paths
 
 
-def _flush_batch_phase1(conn, batch):
-    """Insert file entries (phase 1 — no hash, no full_text yet)."""
-    conn.executemany(
-        """INSERT OR REPLACE INTO files
-           (path, name, parent_path, is_directory, size, mime_type, file_hash,
-            created_at, modified_at, indexed_at, full_text)
-           VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
-        batch
-    )
-    conn.commit()
+def _flush_batch_phase1(conn, batch, tag_rows=()):
+    """Insert file entries (phase 1 — no hash, no full_text yet) and their
+    (tag, path) pairs, resolving each path to its new id inside SQLite."""
+    with bulk() as c:
+        c.executemany(
+            """INSERT OR REPLACE INTO files
+               (path, name, parent_path, is_directory, size, mime_type, file_hash,
+                created_at, modified_at, indexed_at, full_text)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+            batch
+        )
+        c.executemany(
+            "INSERT OR IGNORE INTO file_tags (file_id, tag) SELECT id, ? FROM files WHERE path = ?",
+            tag_rows
+        )
 
 
-def _apply_tags_bulk(conn, label):
-    """Apply categorization tags to all files for a source."""
-    rows = conn.execute(
-        "SELECT id, name, mime_type, size, modified_at FROM files WHERE path LIKE ? AND is_directory = 0",
-        (f"/{label}/%",)
-    ).fetchall()
-
-    for row in rows:
-        try:
-            tags = categorize_file(row[1], row[2], row[3], row[4])
-            for tag in tags:
-                conn.execute(
-                    "INSERT OR IGNORE INTO file_tags (file_id, tag) VALUES (?, ?)",
-                    (row[0], tag)
-                )
-        except Exception:
-            pass
-    conn.commit()
+def _apply_tags_bulk(conn, label, indexed_before=None):
+    """Apply categorization tags to all files for a source, or only to those
+    last indexed before the given ISO time."""
+    sql = "SELECT id, name, mime_type, size, modified_at FROM files WHERE path LIKE ? AND is_directory = 0"
+    params = [f"/{label}/%"]
+    if indexed_before:
+        sql += " AND (indexed_at IS NULL OR indexed_at < ?)"
+        params.append(indexed_before)
+    rows = conn.execute(sql, params).fetchall()
+
+    tag_lists = categorize_batch((row[1], row[2], row[3], row[4]) for row in rows)
+    with bulk() as c:
+        c.executemany(
+            "INSERT OR IGNORE INTO file_tags (file_id, tag) VALUES (?, ?)",
+            [(row[0], tag) for row, tags in zip(rows, tag_lists) for tag in tags]
+        )
 
 
 def _remove_stale(conn, label, seen_paths):
@@ -258,6 +290,7 @@ def _remove_stale(conn, label, seen_paths):
     for row in all_indexed:
         if row[0] not in seen_paths:
             conn.execute("DELETE FROM files WHERE path = ?", (row[0],))
+            conn.execute("DELETE FROM extract_cache WHERE path = ?", (row[0],))
             removed += 1
     root_entry = f"/{label}"
     if root_entry not in seen_paths:
@@ -284,6 +317,11 @@ def _enrich_file(file_row: dict) -> dict | None:
     size = file_row["size"]
     file_id = file_row["id"]
 
+    if settings.extract_cache_enabled:
+        cached = _cached_enrichment(file_id, path, size, file_row.get("modified_at"))
+        if cached:
+            return cached
+
     # We need to reconstruct the SMB path from the relative path
     sources = get_sources()
     smb_path = None
@@ -333,11 +371,77 @@ def _enrich_file(file_row: dict) -> dict | None:
     return result
 
 
+def _cached_enrichment(file_id: int, path: str, size: int, mtime: str | None) -> dict | None:
+    """Return a previous enrichment result if the file is unchanged since."""
+    if not mtime:
+        return None
+    rows = query(
+        "SELECT file_hash, full_text, metadata FROM extract_cache "
+        "WHERE path = ? AND size = ? AND mtime = ?",
+        (path, size, mtime)
+    )
+    if not rows:
+        return None
+    result = {"file_id": file_id, "path": path, "from_cache": True}
+    for key, value in rows[0].items():
+        if value is not None:
+            result[key] = value
+    return result
+
+
+# Samples at least this big are hashed on several threads by BLAKE3
+_BLAKE3_THREADED_SAMPLE = 1024 * 1024
+
+
+def _hash_algorithm() -> str:
+    """The sample hash algorithm in effect: the setting, if available."""
+    if settings.hash_algorithm == "blake3" and blake3 is not None:
+        return "blake3"
+    return "sha256"
+
+
+def _new_hasher(sample_size: int):
+    if _hash_algorithm() == "blake3":
+        if sample_size * 2 >= _BLAKE3_THREADED_SAMPLE:
+            return blake3.blake3(max_threads=blake3.blake3.AUTO)
+        return blake3.blake3()
+    return hashlib.sha256()
+
+
+def _reset_hashes_if_algorithm_changed(conn):
+    """Drop stored hashes made with a different algorithm than the current one.
+
+    Duplicates are found by equal hashes, so keys of two algorithms must not
+    mix. Clearing them (and the extract cache that would restore them) makes
+    phase 2 rehash every file once. Indexes from before index_meta existed
+    were hashed with sha256.
+    """
+    algorithm = _hash_algorithm()
+    if algorithm != settings.hash_algorithm:
+        logger.warning(f"hash_algorithm {settings.hash_algorithm!r} is not available; using {algorithm}")
+    row = conn.execute("SELECT value FROM index_meta WHERE key = 'hash_algorithm'").fetchone()
+    if row is not None:
+        previous = row[0]
+    elif conn.execute("SELECT 1 FROM files WHERE file_hash IS NOT NULL LIMIT 1").fetchone():
+        previous = "sha256"
+    else:
+        previous = algorithm
+    if previous != algorithm:
+        logger.info(f"Hash algorithm changed from {previous} to {algorithm}; all files will be rehashed")
+        conn.execute("UPDATE files SET file_hash = NULL WHERE file_hash IS NOT NULL")
+        conn.execute("DELETE FROM extract_cache")
+    conn.execute(
+        "INSERT OR REPLACE INTO index_meta (key, value) VALUES ('hash_algorithm', ?)",
+        (algorithm,)
+    )
+    conn.commit()
+
+
 def _compute_hash(smb_path: str, file_size: int) -> str | None:
     """Compute fast hash using first + last N KB over SMB."""
     try:
         sample_size = settings.hash_sample_size_kb * 1024
-        hasher = hashlib.sha256()
+        hasher = _new_hasher(sample_size)
         hasher.update(str(file_size).encode())
 
         with open_file(smb_path) as f:
@@ -352,12 +456,25 @@ def _compute_hash(smb_path: str, file_size: int) -> str | None:
         return None
 
 
+# Text-like MIME types read directly, and the document types / subtitle
+# extensions that need a local copy for extract_text
+_TEXT_MIMES = frozenset({
+    "application/json", "application/xml", "application/javascript",
+    "application/x-yaml", "application/x-python",
+})
+_BINARY_DOC_MIMES = frozenset({
+    "application/pdf",
+    "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+    "application/msword",
+    "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "application/vnd.ms-excel",
+})
+_SUBTITLE_EXTS = frozenset({"srt", "vtt", "ass", "ssa", "sub"})
+
+
 def _extract_text_smb(smb_path: str, mime: str) -> str | None:
     """Extract text from a file accessed over SMB."""
-    if mime and (mime.startswith("text/") or mime in (
-        "application/json", "application/xml", "application/javascript",
-        "application/x-yaml", "application/x-python",
-    )):
+    if mime and (mime.startswith("text/") or mime in _TEXT_MIMES):
         try:
             from .smb_fs import read_bytes
             data = read_bytes(smb_path, max_bytes=512 * 1024)
@@ -366,13 +483,7 @@ def _extract_text_smb(smb_path: str, mime: str) -> str | None:
             return None
 
     ext = smb_path.replace("\\", "/").split("/")[-1].rsplit(".", 1)[-1].lower() if "." in smb_path else ""
-    needs_download = mime in (
-        "application/pdf",
-        "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
-        "application/msword",
-        "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        "application/vnd.ms-excel",
-    ) or ext in ("srt", "vtt", "ass", "ssa", "sub")
+    needs_download = mime in _BINARY_DOC_MIMES or ext in _SUBTITLE_EXTS
 
     if needs_download:
         temp_path = None
@@ -411,11 +522,14 @@ def _phase2_enrich(conn):
 
     # Find files needing enrichment (no hash = not yet enriched)
     rows = conn.execute(
-        "SELECT id, path, mime_type, size FROM files "
+        "SELECT id, path, mime_type, size, modified_at FROM files "
         "WHERE is_directory = 0 AND file_hash IS NULL"
     ).fetchall()
 
-    to_enrich = [{"id": r[0], "path": r[1], "mime_type": r[2], "size": r[3]} for r in rows]
+    to_enrich = [
+        {"id": r[0], "path": r[1], "mime_type": r[2], "size": r[3], "modified_at": r[4]}
+        for r in rows
+    ]
 
     with _scan_lock:
         _scan_state["files_to_enrich"] = len(to_enrich)
@@ -425,47 +539,82 @@ def _phase2_enrich(conn):
 
     logger.info(f"Phase 2: Enriching {len(to_enrich)} files with {settings.enrichment_workers} workers")
 
+    # Keep a bounded number of files queued on the pool rather than one
+    # future per file up front, which for a big first scan is millions of
+    # futures (and their rows) alive at once.
+    max_in_flight = max(1, settings.enrichment_workers) * 4
+    remaining = iter(to_enrich)
+    pending = {}  # future -> file row
+
+    # Results are written in one transaction per scan_batch_size files, or
+    # per second when SMB reads are slow, so other writers aren't locked out
+    uncommitted = 0
+    txn_started = 0.0
+
     with ThreadPoolExecutor(max_workers=settings.enrichment_workers) as pool:
-        futures = {pool.submit(_enrich_file, f): f for f in to_enrich}
+        def top_up():
+            for f in islice(remaining, max_in_flight - len(pending)):
+                pending[pool.submit(_enrich_file, f)] = f
 
-        for future in as_completed(futures):
+        top_up()
+        while pending:
             if _is_cancelled():
                 pool.shutdown(wait=False, cancel_futures=True)
                 break
 
-            try:
-                result = future.result(timeout=120)
-                if result and result.get("file_id"):
-                    fid = result["file_id"]
-
-                    # Update hash and text
-                    if "file_hash" in result or "full_text" in result:
-                        conn.execute(
-                            "UPDATE files SET file_hash = COALESCE(?, file_hash), "
-                            "full_text = COALESCE(?, full_text) WHERE id = ?",
-                            (result.get("file_hash"), result.get("full_text"), fid)
-                        )
-
-                    # Update metadata
-                    if "metadata" in result:
-                        conn.execute(
-                            "INSERT OR REPLACE INTO file_metadata (file_id, metadata) VALUES (?, ?)",
-                            (fid, result["metadata"])
-                        )
-
+            # While a transaction is open, wake up in time to commit it
+            timeout = max(0.0, txn_started + 1.0 - time.monotonic()) if uncommitted else None
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                file_info = pending.pop(future)
+                try:
+                    result = future.result()
+                    if result and result.get("file_id"):
+                        fid = result["file_id"]
+                        if not uncommitted:
+                            txn_started = time.monotonic()
+                        uncommitted += 1
+
+                        # Update hash and text
+                        if "file_hash" in result or "full_text" in result:
+                            conn.execute(
+                                "UPDATE files SET file_hash = COALESCE(?, file_hash), "
+                                "full_text = COALESCE(?, full_text) WHERE id = ?",
+                                (result.get("file_hash"), result.get("full_text"), fid)
+                            )
+
+                        # Update metadata
+                        if "metadata" in result:
+                            conn.execute(
+                                "INSERT OR REPLACE INTO file_metadata (file_id, metadata) VALUES (?, ?)",
+                                (fid, result["metadata"])
+                            )
+
+                        # Remember the result (only when the file was readable)
+                        if (settings.extract_cache_enabled and "file_hash" in result
+                                and not result.get("from_cache")):
+                            conn.execute(
+                                "INSERT OR REPLACE INTO extract_cache "
+                                "(path, size, mtime, file_hash, full_text, metadata) "
+                                "VALUES (?, ?, ?, ?, ?, ?)",
+                                (result["path"], file_info["size"], file_info["modified_at"],
+                                 result["file_hash"], result.get("full_text"), result.get("metadata"))
+                            )
+
+                        with _scan_lock:
+                            _scan_state["files_enriched"] += 1
+
+                except Exception as e:
                     with _scan_lock:
-                        _scan_state["files_enriched"] += 1
+                        _scan_state["errors"] += 1
+                    logger.debug(f"Enrichment failed for {file_info.get('path')}: {e}")
 
-            except Exception as e:
-                with _scan_lock:
-                    _scan_state["errors"] += 1
-                file_info = futures[future]
-                logger.debug(f"Enrichment failed for {file_info.get('path')}: {e}")
+            if uncommitted and (uncommitted >= settings.scan_batch_size
+                                or time.monotonic() - txn_started >= 1.0):
+                conn.commit()
+                uncommitted = 0
 
-            # Commit periodically
-            with _scan_lock:
-                if _scan_state["files_enriched"] % 50 == 0:
-                    conn.commit()
+            top_up()
 
     conn.commit()
 
@@ -485,12 +634,15 @@ def _scan_all_sources(scan_id: int, full_scan: bool):
                 _scan_state["running"] = False
             return
 
+        _reset_hashes_if_algorithm_changed(conn)
+
         # Phase 1: Fast index all sources
         for source in sources:
             if _is_cancelled():
                 break
             logger.info(f"Phase 1 — Indexing source: {source.source_id}")
             _phase1_index(source, conn, full_scan)
+            invalidate_cached_responses()
 
         # Phase 2: Enrich files in parallel
         if not _is_cancelled():
@@ -526,6 +678,7 @@ def _scan_all_sources(scan_id: int, full_scan: bool):
         conn.commit()
 
     finally:
+        invalidate_cached_responses()
         with _scan_lock:
             _scan_state["running"] = False
             _scan_state["phase"] = ""
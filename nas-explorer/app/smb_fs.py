@@ -1,17 +1,20 @@
 """SMB filesystem abstraction — access NAS files over SMB without OS mounting.
 
 Uses smbprotocol/smbclient for pure-Python SMB access.
-Provides os-like functions: walk, stat, open_file, listdir, etc.
+Provides os-like functions: walk, walk_stat, stat, open_file, listdir, etc.
 Supports multiple shares from the same or different hosts.
 """
 from __future__ import annotations
 
 import os
+import mimetypes
+import posixpath
 import tempfile
 import shutil
 import logging
 import threading
 from dataclasses import dataclass, field
+from functools import lru_cache
 from pathlib import Path
 from typing import Iterator, Optional, BinaryIO
 
@@ -68,12 +71,24 @@ class SMBFileInfo:
 # ─── Session Management ──────────────────────────────────────────────────
 
 _registered_sessions: set[str] = set()
-_session_lock = threading.Lock()
+_session_lock = threading.Lock()  # guards _host_locks
+_host_locks: dict[str, threading.Lock] = {}
 
 
-def register_source(source: SMBSource):
-    """Register SMB credentials for a source host."""
+def _host_lock(host: str) -> threading.Lock:
     with _session_lock:
+        lock = _host_locks.get(host)
+        if lock is None:
+            lock = _host_locks[host] = threading.Lock()
+        return lock
+
+
+def register_source(source: SMBSource):
+    """Register SMB credentials for a source host.
+
+    Locks per host, so handshakes with different hosts can run concurrently.
+    """
+    with _host_lock(source.host):
         if source.host not in _registered_sessions:
             try:
                 smbclient.register_session(
@@ -212,6 +227,59 @@ def walk(source: SMBSource) -> Iterator[tuple[str, list[str], list[str]]]:
         return
 
 
+_ATTR_DIRECTORY = 0x10  # FILE_ATTRIBUTE_DIRECTORY
+_ATTR_REPARSE_POINT = 0x400  # symlinks and junctions
+
+
+def _entry_info(entry) -> SMBFileInfo:
+    """SMBFileInfo from a scandir entry's directory-listing record (no SMB call)."""
+    info = entry.smb_info
+    return SMBFileInfo(
+        name=entry.name,
+        path=entry.path,
+        relative_path="",  # Caller sets this
+        is_directory=bool(info.file_attributes & _ATTR_DIRECTORY),
+        size=info.end_of_file,
+        mtime=info.last_write_time.timestamp(),
+        ctime=info.creation_time.timestamp(),
+        source_id="",
+    )
+
+
+def walk_stat(source: SMBSource) -> Iterator[tuple[str, Optional[SMBFileInfo], list[SMBFileInfo]]]:
+    """
+    Walk an SMB share top-down like walk(), with file info attached.
+    Yields (smb_dirpath, dir_info, files). Sizes and times come from the
+    directory listing itself (one QUERY_DIRECTORY per directory) instead of
+    a stat() round-trip per file. dir_info is None for the source root.
+    Links are stat()ed individually so files report their target; linked
+    directories are not descended into, as with walk().
+    """
+    def walk_dir(dirpath: str, dir_info: Optional[SMBFileInfo]):
+        try:
+            entries = smbclient.scandir(dirpath)
+            subdirs, files = [], []
+            for entry in entries:
+                attributes = entry.smb_info.file_attributes
+                if attributes & _ATTR_DIRECTORY:
+                    if not attributes & _ATTR_REPARSE_POINT:
+                        subdirs.append(_entry_info(entry))
+                elif attributes & _ATTR_REPARSE_POINT:
+                    info = stat(entry.path)
+                    if info:
+                        files.append(info)
+                else:
+                    files.append(_entry_info(entry))
+        except Exception as e:
+            logger.warning(f"SMB listing failed for {dirpath}: {e}")
+            return
+        yield dirpath, dir_info, files
+        for sub in subdirs:
+            yield from walk_dir(sub.path, sub)
+
+    yield from walk_dir(source.smb_root, None)
+
+
 def stat(smb_path: str) -> Optional[SMBFileInfo]:
     """Get file info for an SMB path."""
     try:
@@ -244,9 +312,13 @@ def listdir(smb_path: str) -> list[str]:
         return []
 
 
-def open_file(smb_path: str, mode: str = "rb") -> BinaryIO:
-    """Open a file over SMB. Returns a file-like object."""
-    return smbclient.open_file(smb_path, mode=mode)
+def open_file(smb_path: str, mode: str = "rb", buffering: int = -1) -> BinaryIO:
+    """Open a file over SMB. Returns a file-like object.
+
+    buffering=0 gives the raw handle: each read() is a single SMB READ of up
+    to the negotiated max read size, with no extra copy through a buffer.
+    """
+    return smbclient.open_file(smb_path, mode=mode, buffering=buffering)
 
 
 def read_bytes(smb_path: str, max_bytes: int = 0) -> bytes:
@@ -257,6 +329,19 @@ def read_bytes(smb_path: str, max_bytes: int = 0) -> bytes:
         return f.read()
 
 
+def download_to_memory(smb_path: str, max_size: int) -> Optional[bytes]:
+    """
+    Read a whole SMB file into memory.
+    Returns None if the file is larger than max_size; the caller should
+    fall back to download_to_temp() in that case.
+    """
+    with smbclient.open_file(smb_path, mode="rb") as f:
+        data = f.read(max_size + 1)
+    if len(data) > max_size:
+        return None
+    return data
+
+
 def exists(smb_path: str) -> bool:
     """Check if an SMB path exists."""
     try:
@@ -383,12 +468,30 @@ def relative_to_smb(relative_path: str, sources: list[SMBSource]) -> Optional[st
     return None
 
 
+@lru_cache(maxsize=4096)
+def _mime_for_ext(ext: str) -> str | None:
+    """mimetypes.guess_type for any name ending in ext.
+
+    A share holds a few hundred distinct extensions, so the scan loop gets
+    a cache hit instead of a walk through the mimetypes tables per file.
+    """
+    return mimetypes.guess_type("x" + ext)[0]
+
+
+def _mime_ext(name: str) -> str:
+    """The trailing part of name that guess_type decides on: the extension,
+    plus the one before it for compression suffixes (.tar.gz, .tgz)."""
+    base, ext = posixpath.splitext(name)
+    if any(e in mimetypes.suffix_map or e in mimetypes.encodings_map for e in (ext, ext.lower())):
+        ext = posixpath.splitext(base)[1] + ext
+    return ext
+
+
 def get_mime_type(smb_path: str, temp_path: str = None) -> str:
     """Detect MIME type for an SMB file."""
     # Try by extension first (fast, no download needed)
-    import mimetypes
-    name = smb_path.replace("\\", "/").split("/")[-1]
-    mime, _ = mimetypes.guess_type(name)
+    ext = _mime_ext(smb_path.replace("\\", "/").rpartition("/")[2])
+    mime = _mime_for_ext(ext) if ext else None
     if mime:
         return mime
 
@@ -0,0 +1,104 @@
+"""Short-lived in-memory cache for read-only API responses.
+
+Dashboard and insight endpoints aggregate the whole files table but the
+data only changes when a scan or source removal writes to it. Responses are
+cached as rendered JSON bytes for a few seconds, and writers call
+invalidate() so changes show up immediately. An optional fingerprint also
+catches writes that bypass invalidate() (e.g. another process).
+"""
+from __future__ import annotations
+
+import asyncio
+import functools
+import time
+from typing import Any, Callable
+
+import orjson
+from fastapi.responses import Response
+from pydantic import BaseModel
+
+from .config import settings
+
+# key -> (expires_at monotonic, fingerprint, rendered JSON)
+_entries: dict[str, tuple[float, Any, bytes]] = {}
+_locks: dict[str, asyncio.Lock] = {}
+_generation = 0  # bumped by invalidate() so in-flight results are not stored
+
+
+def _render(result: Any) -> bytes:
+    """Encode once: pydantic-core for models, orjson for plain rows/dicts."""
+    if isinstance(result, BaseModel):
+        return result.model_dump_json().encode()
+    return orjson.dumps(result)
+
+
+def _lifetime(ttl: float | None) -> float:
+    return settings.insights_cache_ttl if ttl is None else ttl
+
+
+def _fresh(entry, fp) -> bool:
+    return entry is not None and entry[0] > time.monotonic() and entry[1] == fp
+
+
+def lookup(key: str, fp: Any = None) -> bytes | None:
+    """The cached body under key if it is current for fingerprint fp."""
+    entry = _entries.get(key)
+    return entry[2] if _fresh(entry, fp) else None
+
+
+def generation() -> int:
+    """Pass to store() for a result computed from here on."""
+    return _generation
+
+
+def store(key: str, fp: Any, result: Any, started: int, ttl: float | None = None) -> bytes:
+    """Render result and cache it under key, unless invalidate() ran since
+    generation() returned started. Returns the rendered body."""
+    body = _render(result)
+    if _lifetime(ttl) > 0 and started == _generation:
+        _entries[key] = (time.monotonic() + _lifetime(ttl), fp, body)
+    return body
+
+
+def cached(ttl: float | None = None, fingerprint: Callable[[], Any] | None = None) -> Callable:
+    """Cache an async endpoint's JSON response for ttl seconds.
+
+    ttl defaults to settings.insights_cache_ttl; 0 disables caching. The
+    cache key is the endpoint itself (exposed as wrapper.cache_key), so only
+    use this on endpoints whose response does not depend on their arguments.
+    If given, fingerprint is a cheap blocking call (run on a worker thread)
+    whose result must match the cached entry's for it to be served.
+    """
+    def decorator(func: Callable) -> Callable:
+        key = f"{func.__module__}.{func.__qualname__}"
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            if _lifetime(ttl) <= 0:
+                # Still render here: skips FastAPI's jsonable_encoder pass
+                return Response(_render(await func(*args, **kwargs)), media_type="application/json")
+
+            fp = await asyncio.to_thread(fingerprint) if fingerprint else None
+            body = lookup(key, fp)
+            if body is not None:
+                return Response(body, media_type="application/json")
+
+            lock = _locks.setdefault(key, asyncio.Lock())
+            async with lock:
+                # Another request may have filled the entry while we waited
+                body = lookup(key, fp)
+                if body is None:
+                    started = _generation
+                    body = store(key, fp, await func(*args, **kwargs), started, ttl)
+            return Response(body, media_type="application/json")
+
+        wrapper.cache_key = key
+        return wrapper
+    return decorator
+
+
+def invalidate():
+    """Drop every cached response. Called after writes to the files table."""
+    global _generation
+    _generation += 1
+    _entries.clear()
@@ -22,6 +22,7 @@ def isolated_db(tmp_path):
     # Reset any module-level caches
     from app import database
     database._init_done.clear()
+    database.close_read_pools()
     if hasattr(database._local, "conn"):
         database._local.conn = None
 
@@ -32,6 +33,13 @@ def isolated_db(tmp_path):
     # Reset nas_manager config file
     from app import nas_manager
     nas_manager.CONFIG_FILE = None
+    nas_manager._config_cache = None
+    nas_manager._probe_ok_at.clear()
+
+    # Cached API responses would leak between tests
+    from app import ttl_cache
+    ttl_cache.invalidate()
+    ttl_cache._locks.clear()
 
     from app.database import init_db
     init_db()
@@ -53,12 +61,18 @@ def client(isolated_db):
     from fastapi.testclient import TestClient
     from app.routes.dashboard import router as dash_router
     from app.routes.admin import router as admin_router
+    from app.routes.files import router as files_router
+    from app.routes.search import router as search_router
+    from app.routes.preview import router as preview_router
     from app.security import require_auth
 
     app = FastAPI()
     app.dependency_overrides[require_auth] = lambda: "test"
     app.include_router(dash_router)
     app.include_router(admin_router)
+    app.include_router(files_router)
+    app.include_router(search_router)
+    app.include_router(preview_router)
 
     return TestClient(app)
 
@@ -138,16 +152,18 @@ def populated_db(db_conn):
     # Metadata for video (with duration)
     conn.execute(
         "INSERT INTO file_metadata (file_id, metadata) VALUES (?, ?)",
-        (1, json.dumps({"duration": 8880, "resolution": "1920x1080"}))  # 2.47 hours
+        (1, json.dumps({"duration_secs": 8880.0, "bitrate": 8000000, "format_name": "Matroska / WebM",
+                        "video_codec": "h264", "width": 1920, "height": 1080}))  # 2.47 hours
     )
     conn.execute(
         "INSERT INTO file_metadata (file_id, metadata) VALUES (?, ?)",
-        (2, json.dumps({"duration": 8160, "resolution": "1920x1080"}))  # 2.27 hours
+        (2, json.dumps({"duration": 8160, "resolution": "1920x1080"}))  # 2.27 hours, older key
     )
     # Metadata for audio
     conn.execute(
         "INSERT INTO file_metadata (file_id, metadata) VALUES (?, ?)",
-        (3, json.dumps({"duration": 240, "bitrate": 320}))  # 4 minutes
+        (3, json.dumps({"duration_secs": 240.0, "bitrate": 320000, "sample_rate": 44100,
+                        "channels": 2}))  # 4 minutes
     )
 
     conn.commit()
@@ -2,7 +2,9 @@
 
 import pytest
 from datetime import datetime, timezone, timedelta
-from app.categorizer import categorize_file
+from app.categorizer import (
+    categorize_file, categorize_batch, categorize_file_fast, OLD_THRESHOLD_DAYS,
+)
 
 
 class TestExtensionCategories:
@@ -50,6 +52,15 @@ class TestExtensionCategories:
         # Should not crash, may return empty or just size/name based tags
         assert isinstance(tags, list)
 
+    @pytest.mark.parametrize("filename", [".py", "script.", "archive.d/README"])
+    def test_no_extension_edge_cases(self, filename):
+        """Leading/trailing dots and dotted directories yield no extension tags."""
+        tags = categorize_file(filename, None, 1000, None)
+        assert "code" not in tags and "python" not in tags
+
+    def test_uppercase_extension(self):
+        assert "video" in categorize_file("MOVIE.MP4", None, 1000, None)
+
 
 class TestMIMEFallback:
     """Test MIME-based categorization when extension isn't mapped."""
@@ -120,6 +131,14 @@ class TestAgeTags:
         tags = categorize_file("nodate.txt", None, 100, None)
         assert "old" not in tags
 
+    def test_reference_now_ts(self):
+        """Age is measured against the supplied now_ts, in whole days."""
+        mtime = datetime(2020, 1, 1, tzinfo=timezone.utc)
+        boundary = mtime + timedelta(days=OLD_THRESHOLD_DAYS + 1)
+        modified = mtime.isoformat()
+        assert "old" in categorize_file("a.txt", None, 100, modified, boundary.timestamp())
+        assert "old" not in categorize_file("a.txt", None, 100, modified, boundary.timestamp() - 1)
+
 
 class TestNameHeuristics:
     """Test filename-based heuristic tagging."""
@@ -147,6 +166,12 @@ class TestNameHeuristics:
         tags = categorize_file("Screenshot_2024.png", None, 100, None)
         assert "screenshot" in tags
 
+    def test_overlapping_keywords(self):
+        """Keywords sharing characters should all be detected."""
+        tags = categorize_file("screenshotemp.png", None, 100, None)
+        assert "screenshot" in tags
+        assert "temporary" in tags
+
 
 class TestCombinedTags:
     """Test that multiple rules can fire together."""
@@ -169,3 +194,35 @@ class TestCombinedTags:
     def test_tags_are_sorted(self):
         tags = categorize_file("song.mp3", "audio/mpeg", 100, None)
         assert tags == sorted(tags)
+
+
+class TestCategorizeBatch:
+    """Test the batch entry point used by the scanner."""
+
+    def test_matches_single_file(self):
+        now = datetime.now(timezone.utc)
+        rows = [
+            ("movie.mp4", "video/mp4", 2 * 1024**3, (now - timedelta(days=2000)).isoformat()),
+            (".cache_bak", None, 0, None),
+            ("notes.txt", "text/plain", 10, "not-a-date"),
+        ]
+        now_ts = now.timestamp()
+        assert categorize_batch(rows, now_ts) == [categorize_file(*row, now_ts) for row in rows]
+
+    def test_empty(self):
+        assert categorize_batch([]) == []
+
+
+class TestCategorizeFileFast:
+    """Test the pre-parsed variant used by the scanner's phase 1."""
+
+    def test_matches_categorize_file(self):
+        modified = datetime(2015, 6, 1, tzinfo=timezone.utc)
+        now_ts = datetime(2024, 1, 1, tzinfo=timezone.utc).timestamp()
+        expected = categorize_file("Old_Backup.ZIP", "application/zip", 0, modified.isoformat(), now_ts)
+        fast = categorize_file_fast(".zip", "application/zip", 0, modified.timestamp(), "old_backup.zip", now_ts)
+        assert fast == expected
+
+    def test_zulu_suffix(self):
+        tags = categorize_file("a.txt", None, 100, "2001-01-01T00:00:00Z")
+        assert "old" in tags
@@ -2,7 +2,9 @@
 
 import os
 import pytest
-from app.crypto import encrypt, decrypt, is_encrypted, _key_path, _ENCRYPTED_PREFIX
+from app.crypto import (
+    encrypt, decrypt, encrypt_bytes, decrypt_bytes, is_encrypted, _key_path, _ENCRYPTED_PREFIX,
+)
 from app import crypto
 
 
@@ -62,6 +64,20 @@ class TestEncryptDecrypt:
         original = "p@$$w0rd!#%^&*(){}[]|\\:\";<>?/~`"
         assert decrypt(encrypt(original)) == original
 
+    def test_bytes_round_trip(self):
+        token = encrypt_bytes(b"\x00raw\xff")
+        assert not token.startswith(_ENCRYPTED_PREFIX.encode())
+        assert decrypt_bytes(token) == b"\x00raw\xff"
+
+    def test_str_and_bytes_tokens_interoperate(self):
+        enc = encrypt("shared")
+        assert decrypt_bytes(enc[len(_ENCRYPTED_PREFIX):].encode("ascii")) == b"shared"
+        assert decrypt(_ENCRYPTED_PREFIX + encrypt_bytes(b"shared").decode("ascii")) == "shared"
+
+    def test_decrypt_bytes_invalid(self):
+        with pytest.raises(ValueError, match="Decryption failed"):
+            decrypt_bytes(b"not-a-token")
+
 
 class TestKeyManagement:
     def test_key_file_created(self):
@@ -96,3 +112,16 @@ class TestKeyManagement:
 
         with pytest.raises(ValueError, match="Decryption failed"):
             decrypt(enc)
+
+    def test_key_reload_bypasses_decrypt_cache(self):
+        """A cached plaintext must not survive a key change."""
+        enc = encrypt("secret")
+        assert decrypt(enc) == "secret"  # populate the cache
+
+        from cryptography.fernet import Fernet
+        with open(_key_path(), "wb") as f:
+            f.write(Fernet.generate_key())
+        crypto._fernet = None
+
+        with pytest.raises(ValueError, match="Decryption failed"):
+            decrypt(enc)
@@ -57,6 +57,8 @@ class TestDashboardEndpoint:
 
         # Median file size should be positive
         assert data["median_file_size"] > 0
+        sizes = sorted(r[0] for r in populated_db.execute("SELECT size FROM files WHERE is_directory = 0"))
+        assert data["median_file_size"] == sizes[len(sizes) // 2]
 
         # Oldest files
         assert len(data["oldest_files"]) > 0
@@ -90,6 +92,18 @@ class TestDashboardEndpoint:
             assert d["wasted_bytes"] > 0
             assert "|" in d["names"] or d["count"] == 2
 
+    def test_duplicate_names_capped(self, client, db_conn):
+        from app.routes.dashboard import DUPLICATE_SAMPLE
+        db_conn.executemany(
+            "INSERT INTO files (path, name, size, file_hash) VALUES (?, ?, 10, 'same')",
+            [(f"/copies/c{i}.bin", f"c{i}.bin") for i in range(DUPLICATE_SAMPLE + 5)],
+        )
+        db_conn.commit()
+        (group,) = client.get("/api/dashboard").json()["duplicates"]
+        assert group["count"] == DUPLICATE_SAMPLE + 5
+        assert len(group["names"].split(" | ")) == DUPLICATE_SAMPLE
+        assert len(group["paths"].split(" | ")) == DUPLICATE_SAMPLE
+
     def test_size_by_extension(self, client, populated_db):
         resp = client.get("/api/dashboard")
         data = resp.json()
@@ -100,6 +114,18 @@ class TestDashboardEndpoint:
             assert ext[i]["total_size"] >= ext[i + 1]["total_size"]
 
 
+    def test_stream_merges_to_dashboard(self, client, populated_db):
+        resp = client.get("/api/dashboard/stream")
+        assert resp.headers["content-type"].startswith("application/x-ndjson")
+        lines = [json.loads(line) for line in resp.text.splitlines()]
+        assert lines[0]["panel"] == "skeleton"
+        assert sorted(p["panel"] for p in lines[1:]) == ["duplicates", "files", "sources", "summary"]
+        merged = {}
+        for line in lines:
+            merged.update(line["data"])
+        assert merged == client.get("/api/dashboard").json()
+
+
 class TestForgottenFolders:
     """Test /api/insights/forgotten-folders."""
 
@@ -159,6 +185,16 @@ class TestNamingConflicts:
         assert beach["unique_versions"] >= 1
         assert beach["folders"] is not None
 
+    def test_unique_versions_ignores_unhashed(self, client, db_conn):
+        db_conn.executemany(
+            "INSERT INTO files (path, name, parent_path, size, file_hash) VALUES (?, 'x.txt', ?, 1, ?)",
+            [("/a/x.txt", "/a", "h1"), ("/b/x.txt", "/b", "h2"),
+             ("/c/x.txt", "/c", "h2"), ("/d/x.txt", "/d", None)],
+        )
+        db_conn.commit()
+        (conflict,) = client.get("/api/insights/naming-conflicts").json()
+        assert (conflict["copies"], conflict["locations"], conflict["unique_versions"]) == (4, 4, 2)
+
 
 class TestMediaSummary:
     """Test /api/insights/media-summary."""
@@ -194,9 +230,9 @@ class TestMediaSummary:
         resp = client.get("/api/insights/media-summary")
         data = resp.json()
         # We inserted metadata with durations for videos (8880+8160=17040 seconds = 4.73 hours)
-        assert data["video"]["duration_hours"] > 0
+        assert data["video"]["duration_hours"] == 4.7
         # Audio has 240 seconds = 0.067 hours
-        assert data["audio"]["duration_hours"] > 0
+        assert data["audio"]["duration_hours"] == 0.1
 
     def test_format_breakdown(self, client, populated_db):
         resp = client.get("/api/insights/media-summary")
@@ -240,6 +276,16 @@ class TestGrowthEstimate:
             assert "bytes_added" in m
             assert len(m["month"]) == 7  # YYYY-MM format
 
+    def test_averages_match_monthly(self, client, populated_db):
+        data = client.get("/api/insights/growth-estimate").json()
+        months = data["monthly"]
+        assert [m["month"] for m in months] == sorted(m["month"] for m in months)
+        if len(months) >= 2:
+            expected = sum(m["bytes_added"] for m in months) / len(months)
+            assert data["avg_monthly_bytes"] == int(expected)
+        else:
+            assert data["avg_monthly_bytes"] == 0
+
 
 class TestStorageTreemap:
     """Test /api/insights/storage-treemap."""
@@ -258,3 +304,54 @@ class TestStorageTreemap:
             assert "path" in r
             assert "total_size" in r
             assert "file_count" in r
+
+
+class TestResponseCache:
+    def _add_file(self, db_conn, path):
+        db_conn.execute(
+            "INSERT INTO files (path, name, is_directory, size) VALUES (?, ?, 0, 10)",
+            (path, path.rsplit("/", 1)[-1]),
+        )
+        db_conn.commit()
+
+    def test_served_from_cache_until_invalidated(self, client, db_conn):
+        self._add_file(db_conn, "/x/a.txt")
+        assert client.get("/api/dashboard").json()["unique_hashes"] == 0
+        # Leaves the fingerprint (max rowid + totals) unchanged
+        db_conn.execute("UPDATE files SET file_hash = 'h'")
+        db_conn.commit()
+        assert client.get("/api/dashboard").json()["unique_hashes"] == 0  # cached
+
+        resp = client.post("/api/admin/cache/invalidate")
+        assert resp.status_code == 200
+        assert client.get("/api/dashboard").json()["unique_hashes"] == 1
+
+    def test_stream_served_from_cache(self, client, db_conn):
+        self._add_file(db_conn, "/x/a.txt")
+        first = [json.loads(line) for line in client.get("/api/dashboard/stream").text.splitlines()]
+        assert len(first) == 1 + 4
+        # Leaves the fingerprint unchanged, so only a cache miss would see it
+        db_conn.execute("UPDATE files SET file_hash = 'h'")
+        db_conn.commit()
+
+        resp = client.get("/api/dashboard/stream")
+        assert resp.headers["content-type"].startswith("application/x-ndjson")
+        lines = [json.loads(line) for line in resp.text.splitlines()]
+        assert [line["panel"] for line in lines] == ["dashboard"]
+        assert lines[0]["data"]["unique_hashes"] == 0
+        assert lines[0]["data"] == client.get("/api/dashboard").json()
+
+    def test_fingerprint_change_bypasses_cache(self, client, db_conn):
+        assert client.get("/api/dashboard").json()["total_files"] == 0
+        self._add_file(db_conn, "/x/a.txt")  # no invalidate() call
+        assert client.get("/api/dashboard").json()["total_files"] == 1
+
+    def test_ttl_zero_disables(self, client, db_conn, monkeypatch):
+        from app.config import settings
+        monkeypatch.setattr(settings, "insights_cache_ttl", 0)
+        assert client.get("/api/dashboard").json()["total_files"] == 0
+        self._add_file(db_conn, "/x/b.txt")
+        assert client.get("/api/dashboard").json()["total_files"] == 1
+        resp = client.get("/api/insights/growth-estimate")
+        assert resp.headers["content-type"] == "application/json"
+        assert resp.json()["total_current_bytes"] == 10
@@ -1,7 +1,10 @@
 """Tests for the database module."""
 
 import pytest
-from app.database import get_connection, init_db, query, execute, executemany, get_db
+from app.database import (
+    get_connection, init_db, query, execute, executemany, get_db, bulk, query_rows,
+    read_connection, aquery, query_many,
+)
 
 
 class TestInit:
@@ -26,6 +29,21 @@ class TestInit:
         assert "idx_files_hash" in idx_names
         assert "idx_files_name" in idx_names
         assert "idx_tags_tag" in idx_names
+        assert "idx_files_nondir_modified" in idx_names
+
+    def test_top_n_queries_avoid_sort(self, db_conn):
+        from app.routes.dashboard import Q_LARGEST, Q_RECENT, Q_OLDEST
+        for q in (Q_LARGEST, Q_RECENT, Q_OLDEST):
+            plan = " ".join(r[3] for r in db_conn.execute("EXPLAIN QUERY PLAN " + q))
+            assert "TEMP B-TREE" not in plan
+
+    def test_listing_sorts_use_parent_indexes(self, db_conn):
+        for col, order, id_order in (("name", "ASC", "ASC"), ("size", "DESC", "ASC"),
+                                     ("modified_at", "DESC", "ASC")):
+            plan = " ".join(r[3] for r in db_conn.execute(
+                "EXPLAIN QUERY PLAN SELECT * FROM files f WHERE f.parent_path = '/' "
+                f"ORDER BY f.is_directory DESC, f.{col} {order}, f.id {id_order} LIMIT 50"))
+            assert "TEMP B-TREE" not in plan
 
     def test_wal_mode(self, db_conn):
         result = db_conn.execute("PRAGMA journal_mode").fetchone()
@@ -35,6 +53,59 @@ class TestInit:
         result = db_conn.execute("PRAGMA foreign_keys").fetchone()
         assert result[0] == 1
 
+    def test_generated_path_columns(self, db_conn):
+        db_conn.execute("INSERT INTO files (path, name, modified_at) "
+                        "VALUES ('/Movies/a/b.mkv', 'b.mkv', '2024-03-09T10:00:00')")
+        row = db_conn.execute("SELECT source_root, path_depth, modified_month FROM files").fetchone()
+        assert tuple(row) == ("Movies", 3, "2024-03")
+
+    def test_generated_mime_columns(self, db_conn):
+        db_conn.executemany(
+            "INSERT INTO files (path, name, mime_type) VALUES (?, ?, ?)",
+            [("/a.mp4", "a.mp4", "video/mp4"), ("/b.docx", "b.docx",
+              "application/vnd.openxmlformats-officedocument.wordprocessingml.document"),
+             ("/c.bin", "c.bin", None)],
+        )
+        rows = db_conn.execute("SELECT mime_category, media_kind FROM files ORDER BY path").fetchall()
+        assert [tuple(r) for r in rows] == [("Video", "video"), ("Document", None), ("Other", None)]
+
+    def test_generated_columns_added_to_existing_db(self, db_conn):
+        from app import database
+        db_conn.executescript("""
+            DROP INDEX idx_files_source;
+            DROP INDEX idx_files_depth;
+            ALTER TABLE files DROP COLUMN source_root;
+            ALTER TABLE files DROP COLUMN path_depth;
+        """)
+        database._apply_schema(db_conn)
+        cols = {r[1] for r in db_conn.execute("PRAGMA table_xinfo(files)")}
+        assert {"source_root", "path_depth"} <= cols
+
+    def test_dup_wasted_column_added_to_existing_db(self, db_conn):
+        from app import database
+        db_conn.executescript("""
+            DROP INDEX idx_dup_wasted;
+            ALTER TABLE agg_dup DROP COLUMN wasted_bytes;
+            INSERT INTO files (path, name, size, file_hash) VALUES
+                ('/a', 'a', 100, 'h1'), ('/b', 'b', 100, 'h1'), ('/c', 'c', 5, 'h2');
+        """)
+        database._apply_schema(db_conn)
+        rows = db_conn.execute(
+            "SELECT file_hash, wasted_bytes FROM agg_dup INDEXED BY idx_dup_wasted WHERE n > 1"
+        ).fetchall()
+        assert [tuple(r) for r in rows] == [("h1", 100)]
+
+    def test_writer_pragmas(self, db_conn):
+        from app.database import get_connection
+        assert get_connection() is db_conn
+        assert db_conn.execute("PRAGMA synchronous").fetchone()[0] == 1  # NORMAL
+        assert db_conn.execute("PRAGMA temp_store").fetchone()[0] == 2  # MEMORY
+
+    def test_reader_pragmas(self, db_conn):
+        with read_connection() as conn:
+            assert conn.execute("PRAGMA query_only").fetchone()[0] == 1
+            assert conn.execute("PRAGMA temp_store").fetchone()[0] == 2
+
 
 class TestCRUD:
     def test_insert_and_query(self, db_conn):
@@ -69,6 +140,51 @@ class TestCRUD:
         assert isinstance(rows[0], dict)
         assert "path" in rows[0]
 
+    def test_query_rows_returns_rows(self, db_conn):
+        execute(
+            "INSERT INTO files (path, name, is_directory) VALUES (?, ?, ?)",
+            ("/row", "row", 0)
+        )
+        rows = query_rows("SELECT path, name FROM files WHERE path = ?", ("/row",))
+        assert rows[0]["name"] == "row"
+        assert dict(rows[0]) == {"path": "/row", "name": "row"}
+
+    def test_query_is_read_only(self, db_conn):
+        import sqlite3
+        with pytest.raises(sqlite3.OperationalError):
+            query("INSERT INTO files (path, name) VALUES ('/ro', 'ro')")
+
+    def test_read_connections_are_pooled(self, db_conn):
+        with read_connection() as first:
+            pass
+        with read_connection() as second:
+            assert second is first
+            assert second is not db_conn
+
+    def test_aquery_gathers(self, db_conn):
+        import asyncio
+        execute("INSERT INTO files (path, name) VALUES (?, ?)", ("/aq", "aq"))
+
+        async def run():
+            return await asyncio.gather(
+                aquery("SELECT name FROM files WHERE path = ?", ("/aq",)),
+                aquery("SELECT COUNT(*) as cnt FROM files"),
+            )
+        named, counted = asyncio.run(run())
+        assert named == [{"name": "aq"}]
+        assert counted == [{"cnt": 1}]
+
+    def test_query_many_single_snapshot(self, db_conn):
+        execute("INSERT INTO files (path, name) VALUES (?, ?)", ("/qm", "qm"))
+        names, counts = query_many([
+            ("SELECT name FROM files WHERE path = ?", ("/qm",)),
+            ("SELECT COUNT(*) as cnt FROM files", ()),
+        ])
+        assert names == [{"name": "qm"}] and counts == [{"cnt": 1}]
+        # The borrowed connection goes back to the pool outside a transaction
+        with read_connection() as conn:
+            assert not conn.in_transaction
+
     def test_execute_returns_lastrowid(self, db_conn):
         rid = execute(
             "INSERT INTO files (path, name, is_directory) VALUES (?, ?, ?)",
@@ -98,6 +214,31 @@ class TestCRUD:
         rows = query("SELECT * FROM files WHERE path = ?", ("/rollback_test",))
         assert len(rows) == 0
 
+    def test_execute_without_commit(self, db_conn):
+        execute(
+            "INSERT INTO files (path, name, is_directory) VALUES (?, ?, ?)",
+            ("/uncommitted", "uncommitted", 0),
+            commit=False,
+        )
+        assert db_conn.in_transaction
+        db_conn.rollback()
+        assert query("SELECT * FROM files WHERE path = ?", ("/uncommitted",)) == []
+
+    def test_bulk_commits_once(self, db_conn):
+        with bulk() as conn:
+            conn.executemany(
+                "INSERT INTO files (path, name, is_directory) VALUES (?, ?, ?)",
+                [(f"/bulk/{i}", str(i), 0) for i in range(5)]
+            )
+            assert conn.in_transaction
+        assert not db_conn.in_transaction
+        assert query("SELECT COUNT(*) AS cnt FROM files")[0]["cnt"] == 5
+
+    def test_bulk_synchronous_off_restored(self, db_conn):
+        with bulk(synchronous_off=True) as conn:
+            assert conn.execute("PRAGMA synchronous").fetchone()[0] == 0
+        assert db_conn.execute("PRAGMA synchronous").fetchone()[0] == 1  # NORMAL
+
 
 class TestFTS:
     def test_fts_insert_trigger(self, db_conn):
@@ -126,6 +267,70 @@ class TestFTS:
         rows = query("SELECT * FROM files_fts WHERE files_fts MATCH ?", ("unique_searchterm_xyz",))
         assert len(rows) == 0
 
+    def test_fts_update_trigger(self, db_conn):
+        """Changing full_text should re-index; unrelated updates leave FTS intact."""
+        rid = execute(
+            "INSERT INTO files (path, name, is_directory, full_text) VALUES (?, ?, ?, ?)",
+            ("/upd.txt", "upd.txt", 0, "alpha")
+        )
+        execute("UPDATE files SET full_text = ? WHERE id = ?", ("bravo", rid))
+        execute("UPDATE files SET size = 42, file_hash = 'abc' WHERE id = ?", (rid,))
+        assert query("SELECT rowid FROM files_fts WHERE files_fts MATCH 'alpha'") == []
+        rows = query("SELECT rowid FROM files_fts WHERE files_fts MATCH 'bravo'")
+        assert [r["rowid"] for r in rows] == [rid]
+
+
+class TestAggregates:
+    TABLES = ("stats_cache", "agg_by_category", "agg_by_ext", "agg_by_month", "agg_dup",
+              "folder_rollup")
+
+    def _snapshot(self, conn):
+        return {t: sorted(tuple(r) for r in conn.execute(f"SELECT * FROM {t}"))
+                for t in self.TABLES}
+
+    def test_triggers_match_rebuild(self, db_conn):
+        """Trigger-maintained aggregates equal a full recompute after mixed writes."""
+        from app.database import rebuild_aggregates
+        sql = ("INSERT OR REPLACE INTO files (path, name, is_directory, size, mime_type, "
+               "file_hash, modified_at) VALUES (?, ?, ?, ?, ?, ?, ?)")
+        db_conn.executemany(sql, [
+            ("/a.mp4", "a.mp4", 0, 100, "video/mp4", "h1", "2024-01-02"),
+            ("/b.mp4", "b.mp4", 0, 100, "video/mp4", "h1", "2024-02-02"),
+            ("/c.txt", "c.txt", 0, 0, "text/plain", None, None),
+            ("/dir", "dir", 1, 0, None, None, None),
+        ])
+        db_conn.execute(sql, ("/a.mp4", "a.mp4", 0, 150, "video/mp4", "h2", "2024-03-02"))
+        db_conn.execute("UPDATE files SET file_hash = 'h2', size = 150 WHERE path = '/b.mp4'")
+        db_conn.execute("DELETE FROM files WHERE path = '/c.txt'")
+        db_conn.commit()
+        incremental = self._snapshot(db_conn)
+        rebuild_aggregates(db_conn)
+        assert incremental == self._snapshot(db_conn)
+        stats = dict(db_conn.execute("SELECT key, value FROM stats_cache").fetchall())
+        assert stats == {"total_size": 300, "total_files": 2,
+                         "total_directories": 1, "empty_files": 0}
+
+    def test_folder_rollup_tracks_moves_and_deletes(self, db_conn):
+        from app.database import rebuild_aggregates
+        db_conn.executemany(
+            "INSERT INTO files (path, name, parent_path, size, modified_at) VALUES (?, ?, ?, ?, ?)",
+            [("/d/a", "a", "/d", 10, "2020-01-01"), ("/d/b", "b", "/d", 20, "2023-06-01"),
+             ("/d/c", "c", "/d", 5, None), ("/e/x", "x", "/e", None, "2021-01-01")],
+        )
+        db_conn.execute("DELETE FROM files WHERE path = '/d/b'")
+        db_conn.execute("UPDATE files SET parent_path = '/d', size = 7 WHERE path = '/e/x'")
+        db_conn.commit()
+        rows = db_conn.execute("SELECT * FROM folder_rollup").fetchall()
+        assert [tuple(r) for r in rows] == [("/d", 3, 22, 2, 17, "2021-01-01")]
+        incremental = self._snapshot(db_conn)
+        rebuild_aggregates(db_conn)
+        assert incremental == self._snapshot(db_conn)
+
+    def test_replace_drops_stale_fts_entry(self, db_conn):
+        execute("INSERT INTO files (path, name, full_text) VALUES ('/r.txt', 'r.txt', 'oldword')")
+        execute("INSERT OR REPLACE INTO files (path, name, full_text) VALUES ('/r.txt', 'r.txt', 'newword')")
+        assert query("SELECT rowid FROM files_fts WHERE files_fts MATCH 'oldword'") == []
+
 
 class TestTags:
     def test_insert_tag(self, db_conn):
@@ -167,6 +372,31 @@ class TestMetadata:
         parsed = json.loads(rows[0]["metadata"])
         assert parsed["duration"] == 120
 
+    def test_duration_generated_column(self, db_conn):
+        db_conn.executemany("INSERT INTO files (id, path, name) VALUES (?, ?, ?)",
+                            [(1, "/a", "a"), (2, "/b", "b"), (3, "/c", "c"), (4, "/d", "d")])
+        db_conn.executemany("INSERT INTO file_metadata (file_id, metadata) VALUES (?, ?)",
+                            [(1, '{"duration_secs": 90.5}'), (2, '{"duration": "12"}'),
+                             (3, '{"bitrate": 1}'), (4, "not json")])
+        rows = db_conn.execute("SELECT duration_sec FROM file_metadata ORDER BY file_id").fetchall()
+        assert [r[0] for r in rows] == [90.5, 12.0, None, None]
+
+    def test_stale_duration_column_replaced(self, db_conn):
+        from app import database
+        db_conn.executescript("""
+            DROP INDEX idx_metadata_duration;
+            ALTER TABLE file_metadata DROP COLUMN duration_sec;
+            ALTER TABLE file_metadata ADD COLUMN duration_sec REAL GENERATED ALWAYS AS (
+                CASE WHEN json_valid(metadata)
+                THEN CAST(json_extract(metadata, '$.duration') AS REAL) END) VIRTUAL;
+            INSERT INTO files (id, path, name) VALUES (1, '/a', 'a');
+            INSERT INTO file_metadata (file_id, metadata) VALUES (1, '{"duration_secs": 30.0}');
+        """)
+        database._apply_schema(db_conn)
+        assert db_conn.execute("SELECT duration_sec FROM file_metadata").fetchone()[0] == 30.0
+        assert db_conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'idx_metadata_duration'").fetchone()
+
     def test_cascade_delete(self, db_conn):
         """Deleting a file should cascade to metadata and tags."""
         fid = execute(
@@ -0,0 +1,51 @@
+"""Tests for file listing endpoints."""
+
+import pytest
+from app.database import executemany
+
+
+@pytest.fixture
+def listing(db_conn):
+    sizes = [None, 0, 5, 5, 10]
+    executemany(
+        "INSERT INTO files (path, name, parent_path, is_directory, size, modified_at) "
+        "VALUES (?, ?, ?, ?, ?, ?)",
+        [(f"/d/f{i}", f"f{i % 6}", "/d", int(i % 4 == 0), sizes[i % 5],
+          None if i % 3 == 0 else f"2024-0{i % 9 + 1}") for i in range(40)],
+    )
+
+
+class TestListFiles:
+    @pytest.mark.parametrize("sort_by", ["name", "size", "modified_at"])
+    @pytest.mark.parametrize("order", ["asc", "desc"])
+    def test_cursor_pages_match_full_listing(self, client, listing, sort_by, order):
+        params = {"parent_path": "/d", "sort_by": sort_by, "order": order}
+        full = client.get("/api/files", params={**params, "limit": 200}).json()
+        assert full["next_cursor"] is None
+
+        ids, after = [], None
+        while True:
+            page = client.get(
+                "/api/files", params={**params, "limit": 7, **({"after": after} if after else {})}
+            ).json()
+            assert page["total"] == 40
+            ids += [item["id"] for item in page["items"]]
+            if not page["has_more"]:
+                break
+            after = page["next_cursor"]
+        assert ids == [item["id"] for item in full["items"]]
+
+    def test_cursor_for_other_sort_rejected(self, client, listing):
+        page = client.get("/api/files", params={"parent_path": "/d", "limit": 5}).json()
+        resp = client.get("/api/files", params={
+            "parent_path": "/d", "limit": 5, "sort_by": "size", "after": page["next_cursor"]})
+        assert resp.status_code == 400
+        resp = client.get("/api/files", params={"parent_path": "/d", "after": "garbage"})
+        assert resp.status_code == 400
+
+    def test_browse_matches_list(self, client, listing):
+        listed = client.get("/api/files", params={"parent_path": "/d", "limit": 5}).json()
+        browsed = client.get("/api/browse/d", params={"limit": 5}).json()
+        assert browsed["current_path"] == "/d"
+        assert [c["path"] for c in browsed["breadcrumb"]] == ["/", "/d"]
+        assert {k: browsed[k] for k in listed} == listed
@@ -62,6 +62,43 @@ class TestFileItem:
         f = FileItem.from_row(row)
         assert f.preview_url is None
 
+    def test_from_row_validated_matches(self):
+        row = {
+            "id": 14, "path": "/photos/a.png", "name": "a.png",
+            "mime_type": "image/png", "size": 10, "is_directory": 0,
+        }
+        assert FileItem.from_row_validated(row, ["image"]) == FileItem.from_row(row, ["image"])
+
+    def test_from_row_validated_rejects_bad_row(self):
+        from pydantic import ValidationError
+        with pytest.raises(ValidationError):
+            FileItem.from_row_validated({"id": "not-an-int", "path": "/x", "name": "x"})
+
+    def test_from_rows(self):
+        rows = [
+            {"id": 1, "path": "/a.jpg", "name": "a.jpg", "mime_type": "image/jpeg"},
+            {"id": 2, "path": "/b.txt", "name": "b.txt", "mime_type": "text/plain"},
+        ]
+        items = FileItem.from_rows(rows, {1: ["image"]})
+        assert [i.id for i in items] == [1, 2]
+        assert items[0].tags == ["image"] and items[1].tags == []
+        assert items[0].preview_url == "/api/preview/1?size=medium"
+        assert items[1].preview_url is None
+
+    def test_tags_from_tags_csv(self):
+        rows = [
+            {"id": 1, "path": "/a", "name": "a", "tags_csv": "media,video"},
+            {"id": 2, "path": "/b", "name": "b", "tags_csv": None},
+        ]
+        items = FileItem.from_rows(rows)
+        assert items[0].tags == ["media", "video"] and items[1].tags == []
+        assert FileItem.from_row(rows[0], ["x"]).tags == ["x"]
+
+    def test_file_columns_cover_row_fields(self):
+        from app.database import FILE_COLUMNS
+        selected = {c.strip().removeprefix("f.") for c in FILE_COLUMNS.split(",")}
+        assert selected == set(FileItem.model_fields) - {"tags", "metadata", "preview_url"}
+
     def test_is_directory_flag(self):
         f = FileItem(id=1, path="/dir", name="dir", is_directory=True)
         assert f.is_directory is True
@@ -2,11 +2,12 @@
 
 import os
 import json
+import asyncio
 import pytest
 from unittest.mock import patch, MagicMock
 from app.nas_manager import (
     save_config, load_config, add_source, remove_source,
-    get_sources, _config_path,
+    get_sources, _config_path, register_all_sources,
 )
 from app.crypto import is_encrypted, _ENCRYPTED_PREFIX
 
@@ -114,6 +115,67 @@ class TestConfigPersistence:
         assert raw["sources"][0]["username"] == _ENCRYPTED_PREFIX + "already_encrypted_token"
         assert is_encrypted(raw["sources"][0]["password"])
 
+    def test_load_cached_until_file_changes(self, monkeypatch):
+        save_config({"sources": [
+            {"host": "nas", "share": "s", "username": "u", "password": "p", "subfolder": "/", "label": "s"},
+        ]})
+        first = load_config()
+
+        from app import nas_manager
+        monkeypatch.setattr(nas_manager, "decrypt", lambda v: pytest.fail("decrypt on cache hit"))
+        second = load_config()
+        assert second == first
+        second["sources"][0]["password"] = "mutated"
+        assert load_config()["sources"][0]["password"] == "p"  # callers get copies
+        monkeypatch.undo()
+
+        save_config({"sources": []})
+        assert load_config() == {"sources": []}
+
+    def test_sources_built_once_per_config_version(self, monkeypatch):
+        save_config({"sources": [
+            {"host": "nas", "share": "s", "username": "u", "password": "p", "subfolder": "/", "label": "s"},
+        ]})
+        first = get_sources()
+
+        from app import nas_manager
+        monkeypatch.setattr(nas_manager, "SMBSource", lambda **kw: pytest.fail("rebuilt on cache hit"))
+        monkeypatch.setattr(nas_manager, "decrypt", lambda v: pytest.fail("reloaded on cache hit"))
+        second = get_sources()
+        assert second == first and second is not first
+        monkeypatch.undo()
+
+        save_config({"sources": []})
+        assert get_sources() == []
+
+    def test_sources_not_stored_under_newer_config(self, monkeypatch):
+        from app import nas_manager
+        src = {"host": "nas", "share": "old", "username": "u", "password": "p", "subfolder": "/", "label": "old"}
+        save_config({"sources": [src]})
+
+        # Another thread saves and reloads the config while this one builds the old list
+        real_source = nas_manager.SMBSource
+
+        def racing_source(**kw):
+            monkeypatch.setattr(nas_manager, "SMBSource", real_source)
+            save_config({"sources": [dict(src, share="new", label="new")]})
+            load_config()
+            return real_source(**kw)
+        monkeypatch.setattr(nas_manager, "SMBSource", racing_source)
+
+        assert [s.share for s in get_sources()] == ["old"]
+        assert [s.share for s in get_sources()] == ["new"]
+
+    def test_save_clears_decrypt_cache(self):
+        from app import crypto
+        save_config({"sources": [
+            {"host": "nas", "share": "s", "username": "u", "password": "p", "subfolder": "/", "label": "s"},
+        ]})
+        load_config()
+        assert crypto._decrypt_token.cache_info().currsize > 0
+        save_config({"sources": []})
+        assert crypto._decrypt_token.cache_info().currsize == 0
+
 
 class TestSourceManagement:
     @patch("app.nas_manager.register_source")
@@ -181,6 +243,23 @@ class TestSourceManagement:
         assert len(query("SELECT * FROM file_tags WHERE file_id = ?", (fid,))) == 0
         assert len(query("SELECT * FROM file_metadata WHERE file_id = ?", (fid,))) == 0
 
+    @patch("app.nas_manager.register_source")
+    def test_remove_source_keeps_sibling_labels(self, mock_register, db_conn):
+        """Labels sharing a prefix (media-old, media.bak, media2) must survive."""
+        from app.database import execute, query
+
+        add_source("nas", "media", "user", "pass", label="media")
+        for path in ("/media", "/media/a.mp4", "/media-old/b.mp4", "/media.bak/c.mp4", "/media2/d.mp4"):
+            execute(
+                "INSERT INTO files (path, name, is_directory, size) VALUES (?, ?, ?, ?)",
+                (path, path.rsplit("/", 1)[-1], 0, 1)
+            )
+
+        result = remove_source("nas/media")
+        assert result["purged_files"] == 2
+        remaining = {r["path"] for r in query("SELECT path FROM files")}
+        assert remaining == {"/media-old/b.mp4", "/media.bak/c.mp4", "/media2/d.mp4"}
+
     def test_get_sources_empty(self):
         sources = get_sources()
         assert sources == []
@@ -196,19 +275,54 @@ class TestSourceManagement:
         assert sources[0].share == "data"
 
 
+class TestRegisterAllSources:
+    @patch("app.nas_manager.register_source")
+    def test_counts_successes(self, mock_register):
+        save_config({"sources": [
+            {"host": h, "share": "s", "username": "u", "password": "p", "subfolder": "/", "label": h}
+            for h in ("nas1", "nas2", "nas3")
+        ]})
+
+        def register(source):
+            if source.host == "nas2":
+                raise ConnectionError("unreachable")
+        mock_register.side_effect = register
+
+        assert register_all_sources() == 2
+        assert mock_register.call_count == 3
+
+    def test_no_sources(self):
+        assert register_all_sources() == 0
+
+
 class TestConnectionStatus:
     @patch("app.nas_manager.test_connection", return_value={"success": False, "message": "unreachable"})
     @patch("app.nas_manager.register_source")
     def test_status_disconnected(self, mock_register, mock_test):
         from app.nas_manager import get_connection_status
         add_source("nas", "media", "u", "p", label="media")
-        status = get_connection_status()
+        status = asyncio.run(get_connection_status())
         assert status["configured"] is True
         assert status["connected"] is False
 
     def test_status_not_configured(self):
         from app.nas_manager import get_connection_status
-        status = get_connection_status()
+        status = asyncio.run(get_connection_status())
         assert status["configured"] is False
         assert status["connected"] is False
         assert status["sources"] == []
+
+    @patch("app.nas_manager.test_connection", return_value={"success": True, "message": "ok"})
+    @patch("app.nas_manager.register_source")
+    def test_status_connected_probe_cached(self, mock_register, mock_test):
+        from app.nas_manager import get_connection_status
+        add_source("nas", "media", "u", "p", label="media")
+        add_source("nas", "music", "u", "p", label="music")
+        status = asyncio.run(get_connection_status())
+        assert status["connected"] is True
+        assert [s["connected"] for s in status["sources"]] == [True, True]
+        assert status["sources"][0]["source_id"] == "nas/media"
+        assert mock_test.call_count == 2
+
+        asyncio.run(get_connection_status())
+        assert mock_test.call_count == 2  # served from the probe cache
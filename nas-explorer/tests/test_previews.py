@@ -0,0 +1,201 @@
+"""Tests for preview generation and the preview cache."""
+
+import io
+import os
+from types import SimpleNamespace
+import pytest
+from PIL import Image
+
+from app.config import settings
+from app import previews, smb_fs
+
+
+@pytest.fixture(autouse=True)
+def preview_cache(tmp_path):
+    settings.cache_path = str(tmp_path / "previews")
+    previews.clear_exists_cache()
+    previews.clear_memory_cache()
+    yield tmp_path / "previews"
+    previews.clear_exists_cache()
+    previews.clear_memory_cache()
+
+
+def _jpeg_bytes(size=(1000, 800)) -> bytes:
+    buf = io.BytesIO()
+    Image.new("RGB", size, "red").save(buf, "JPEG")
+    return buf.getvalue()
+
+
+class TestImagePreview:
+    def test_generates_thumbnail_from_path(self, tmp_path):
+        src = tmp_path / "photo.jpg"
+        src.write_bytes(_jpeg_bytes())
+        out = previews.get_preview(str(src), "image/jpeg", "h1", "small")
+        assert out and os.path.exists(out)
+        with Image.open(out) as img:
+            assert max(img.size) <= 200
+
+    def test_smb_image_decoded_from_memory(self, monkeypatch):
+        data = _jpeg_bytes()
+        monkeypatch.setattr(smb_fs, "download_to_memory", lambda p, max_size: data)
+
+        def no_temp(*a, **kw):
+            raise AssertionError("temp download should not be used")
+        monkeypatch.setattr(smb_fs, "download_to_temp", no_temp)
+
+        out = previews.get_preview_smb("\\\\nas\\share\\a.jpg", "image/jpeg", "h2", "small", len(data))
+        assert out and os.path.exists(out)
+
+    def test_smb_oversized_image_read_once(self, monkeypatch, tmp_path):
+        src = tmp_path / "big.jpg"
+        src.write_bytes(_jpeg_bytes())
+        reads = []
+
+        def fake_open_file(path, mode="rb", **kw):
+            reads.append(path)
+            return open(src, mode)
+        monkeypatch.setattr(smb_fs.smbclient, "open_file", fake_open_file)
+        monkeypatch.setattr(smb_fs, "stat", lambda p: SimpleNamespace(size=previews.IN_MEMORY_MAX_BYTES + 1))
+
+        out = previews.get_preview_smb("\\\\nas\\share\\big.jpg", "image/jpeg", "h3", "small")
+        assert out and os.path.exists(out)
+        assert len(reads) == 1
+
+    def test_large_jpeg_uses_reduced_decode(self, tmp_path):
+        src = tmp_path / "big.jpg"
+        src.write_bytes(_jpeg_bytes((4000, 3000)))
+        out = previews.get_preview(str(src), "image/jpeg", "h4", "small")
+        with Image.open(out) as img:
+            assert img.size == (200, 150)
+
+    def test_png_with_alpha_kept(self, tmp_path):
+        src = tmp_path / "icon.png"
+        Image.new("RGBA", (500, 500), (0, 0, 0, 0)).save(src)
+        out = previews.get_preview(str(src), "image/png", "h5", "small")
+        with Image.open(out) as img:
+            assert img.mode == "RGBA"
+
+class TestExistsCache:
+    def test_hit_skips_stat(self, tmp_path, monkeypatch):
+        src = tmp_path / "photo.jpg"
+        src.write_bytes(_jpeg_bytes())
+        out = previews.get_preview(str(src), "image/jpeg", "h3", "small")
+        assert previews.get_preview(str(src), "image/jpeg", "h3", "small") == out
+
+        monkeypatch.setattr(previews.os.path, "exists", lambda p: False)
+        assert previews.get_preview(str(src), "image/jpeg", "h3", "small") == out
+
+    def test_misses_not_remembered(self):
+        cache_path = previews.get_cache_path("missing", "small")
+        assert previews._cached_exists(cache_path) is False
+        assert cache_path not in previews._known_previews
+
+
+class TestCacheDir:
+    def test_follows_configured_path(self, tmp_path):
+        settings.cache_path = str(tmp_path / "a")
+        assert previews.get_cache_path("x", "small") == f"{tmp_path}/a/x_small.webp"
+        settings.cache_path = str(tmp_path / "b")
+        assert previews.get_cache_path("x", "small").startswith(f"{tmp_path}/b/")
+        assert (tmp_path / "b").is_dir()
+
+
+class TestVideoPreview:
+    def test_single_ffmpeg_call(self, monkeypatch):
+        calls = []
+
+        def fake_run(cmd, **kw):
+            calls.append(cmd)
+            with open(cmd[-1], "wb") as f:
+                f.write(b"RIFF")
+            return type("R", (), {"returncode": 0})()
+        monkeypatch.setattr(previews.subprocess, "run", fake_run)
+
+        cache_path = previews.get_cache_path("v1", "small")
+        assert previews._generate_video_preview("/x.mp4", cache_path, previews.SIZES["small"]) == cache_path
+        assert len(calls) == 1
+        assert calls[0][0] == "ffmpeg"
+
+    def test_short_clip_retries_from_start(self, monkeypatch):
+        seeks = []
+
+        def fake_run(cmd, **kw):
+            seek = cmd[cmd.index("-ss") + 1]
+            seeks.append(seek)
+            # Past the end ffmpeg exits 0 with an empty output file
+            with open(cmd[-1], "wb") as f:
+                f.write(b"RIFF" if seek == "0" else b"")
+            return type("R", (), {"returncode": 0})()
+        monkeypatch.setattr(previews.subprocess, "run", fake_run)
+
+        cache_path = previews.get_cache_path("v2", "small")
+        assert previews._generate_video_preview("/x.mp4", cache_path, previews.SIZES["small"]) == cache_path
+        assert seeks == [str(previews.VIDEO_SEEK_SECS), "0"]
+        assert os.path.getsize(cache_path) > 0
+
+    def test_empty_output_not_kept(self, monkeypatch):
+        def fake_run(cmd, **kw):
+            open(cmd[-1], "wb").close()
+            return type("R", (), {"returncode": 0})()
+        monkeypatch.setattr(previews.subprocess, "run", fake_run)
+
+        cache_path = previews.get_cache_path("v3", "small")
+        assert previews._generate_video_preview("/x.mp4", cache_path, previews.SIZES["small"]) is None
+        assert not os.path.exists(cache_path)
+
+
+class TestPreviewMemoryCache:
+    def test_read_caches_bytes(self, tmp_path):
+        path = tmp_path / "p.webp"
+        path.write_bytes(b"abc")
+        assert previews.read_preview_bytes(str(path)) == b"abc"
+        path.unlink()
+        assert previews.read_preview_bytes(str(path)) == b"abc"
+
+    def test_missing_file_returns_none(self, tmp_path):
+        assert previews.read_preview_bytes(str(tmp_path / "nope.webp")) is None
+
+    def test_evicts_least_recent_by_bytes(self, monkeypatch):
+        monkeypatch.setattr(previews, "PREVIEW_MEM_MAX_BYTES", 10)
+        previews._mem_put("a", b"1234")
+        previews._mem_put("b", b"1234")
+        previews._mem_get("a")
+        previews._mem_put("c", b"1234")
+        assert previews._mem_get("b") is None
+        assert previews._mem_get("a") == b"1234"
+        assert previews._mem_get("c") == b"1234"
+        assert previews._preview_mem_bytes == 8
+
+
+class TestDispatch:
+    def test_generator_lookup(self):
+        assert previews._generator_for("image/heic") is previews._generate_image_preview
+        assert previews._generator_for("application/pdf") is previews._generate_pdf_preview
+        assert previews._generator_for("audio/flac") is previews._generate_audio_preview
+        assert previews._generator_for("application/zip") is None
+        assert previews.get_preview("/x.zip", "application/zip", "z", "small") is None
+
+
+class TestPreviewEndpoint:
+    @pytest.fixture
+    def preview_client(self, client, db_conn, monkeypatch):
+        from app.database import execute
+        from app.routes import preview
+
+        execute("INSERT INTO files (id, path, name, mime_type, file_hash) "
+                "VALUES (1, '/m/a.jpg', 'a.jpg', 'image/jpeg', 'h1')")
+        monkeypatch.setattr(preview, "get_smb_path", lambda p: "\\\\nas\\m\\a.jpg")
+        monkeypatch.setattr(smb_fs, "download_to_memory", lambda p, max_size: _jpeg_bytes())
+        return client
+
+    def test_etag_revalidation(self, preview_client, monkeypatch):
+        first = preview_client.get("/api/preview/1?size=small")
+        assert first.status_code == 200 and first.content
+        assert first.headers["etag"] == '"h1_small"'
+
+        from app.routes import preview
+        monkeypatch.setattr(preview, "read_preview_bytes", lambda p: pytest.fail("body read on 304"))
+        again = preview_client.get("/api/preview/1?size=small",
+                                   headers={"If-None-Match": 'W/"x", "h1_small"'})
+        assert again.status_code == 304 and not again.content
+        assert again.headers["etag"] == '"h1_small"'
@@ -143,3 +143,173 @@ class TestScanStateFields:
     def test_error_log_is_list(self):
         state = get_scan_state()
         assert isinstance(state["error_log"], list)
+
+
+class TestExtractCache:
+    def setup_method(self):
+        _cancel_event.clear()
+
+    def test_hit_skips_smb(self, db_conn, monkeypatch):
+        from app import scanner
+        from app.database import execute
+        execute(
+            "INSERT INTO extract_cache (path, size, mtime, file_hash, full_text, metadata) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            ("/share/a.txt", 10, "2024-01-01T00:00:00+00:00", "abc123", "hello", None)
+        )
+        monkeypatch.setattr(scanner, "get_sources", lambda: pytest.fail("SMB lookup on cache hit"))
+        result = scanner._enrich_file({
+            "id": 7, "path": "/share/a.txt", "mime_type": "text/plain",
+            "size": 10, "modified_at": "2024-01-01T00:00:00+00:00",
+        })
+        assert result == {
+            "file_id": 7, "path": "/share/a.txt", "from_cache": True,
+            "file_hash": "abc123", "full_text": "hello",
+        }
+
+    def test_changed_file_misses(self, db_conn):
+        from app import scanner
+        from app.database import execute
+        execute(
+            "INSERT INTO extract_cache (path, size, mtime, file_hash) VALUES (?, ?, ?, ?)",
+            ("/share/a.txt", 10, "2024-01-01T00:00:00+00:00", "abc123")
+        )
+        assert scanner._cached_enrichment(7, "/share/a.txt", 11, "2024-01-01T00:00:00+00:00") is None
+        assert scanner._cached_enrichment(7, "/share/a.txt", 10, "2024-02-01T00:00:00+00:00") is None
+
+
+class TestPhase2:
+    def setup_method(self):
+        _cancel_event.clear()
+
+    def test_bounded_in_flight(self, db_conn, monkeypatch):
+        from app import scanner
+        from app.database import executemany
+        executemany("INSERT INTO files (path, name, size) VALUES (?, ?, ?)",
+                    [(f"/s/f{i}", f"f{i}", i) for i in range(60)])
+        monkeypatch.setattr(scanner.settings, "enrichment_workers", 2)
+        monkeypatch.setattr(scanner.settings, "extract_cache_enabled", False)
+        monkeypatch.setattr(scanner, "_enrich_file", lambda row: {
+            "file_id": row["id"], "path": row["path"], "file_hash": f"h{row['id']}"})
+
+        queued = []
+        real_wait = scanner.wait
+        monkeypatch.setattr(scanner, "wait", lambda fs, **kw: queued.append(len(fs)) or real_wait(fs, **kw))
+
+        scanner._phase2_enrich(db_conn)
+        assert db_conn.execute("SELECT COUNT(*) FROM files WHERE file_hash IS NULL").fetchone()[0] == 0
+        assert max(queued) == 2 * 4
+
+    def test_commits_per_batch(self, db_conn, monkeypatch):
+        from app import scanner
+        from app.database import executemany
+        executemany("INSERT INTO files (path, name, size) VALUES (?, ?, ?)",
+                    [(f"/s/f{i}", f"f{i}", i) for i in range(25)])
+        monkeypatch.setattr(scanner.settings, "scan_batch_size", 10)
+        monkeypatch.setattr(scanner.settings, "extract_cache_enabled", False)
+        monkeypatch.setattr(scanner, "_enrich_file", lambda row: {
+            "file_id": row["id"], "path": row["path"], "file_hash": f"h{row['id']}"})
+
+        class CountingConn:
+            commits = 0
+
+            def __getattr__(self, name):
+                return getattr(db_conn, name)
+
+            def commit(self):
+                CountingConn.commits += 1
+                db_conn.commit()
+
+        scanner._phase2_enrich(CountingConn())
+        assert db_conn.execute("SELECT COUNT(*) FROM files WHERE file_hash IS NULL").fetchone()[0] == 0
+        assert CountingConn.commits <= 4
+
+
+
+class TestPhase1Incremental:
+    def setup_method(self):
+        _cancel_event.clear()
+
+    def test_skips_unchanged_files(self, db_conn, monkeypatch):
+        from types import SimpleNamespace
+        from app import scanner
+        from app.database import execute
+        from app.smb_fs import SMBSource
+
+        def entry(name, mtime):
+            return SimpleNamespace(name=name, path=f"\\\\nas\\share\\d\\{name}",
+                                   mtime=mtime, ctime=mtime, size=1)
+
+        execute("INSERT INTO files (path, name, parent_path, size, modified_at) VALUES (?, ?, ?, ?, ?)",
+                ("/S/d/same.txt", "same.txt", "/S/d", 1, "1970-01-01T00:16:40+00:00"))
+        monkeypatch.setattr(scanner, "register_source", lambda source: None)
+        monkeypatch.setattr(scanner, "stat", lambda path: SimpleNamespace(mtime=0))
+        monkeypatch.setattr(scanner, "walk_stat", lambda source: iter([
+            ("\\\\nas\\share", None, []),
+            ("\\\\nas\\share\\d", SimpleNamespace(mtime=0),
+             [entry("same.txt", 1000.0), entry("new.txt", 1000.0)]),
+        ]))
+        with _scan_lock:
+            _scan_state.update(files_added=0, files_updated=0)
+
+        scanner._phase1_index(SMBSource("nas", "share", "u", "p", label="S"), db_conn, full_scan=False)
+        state = get_scan_state()
+        assert (state["files_added"], state["files_updated"]) == (1, 0)
+
+class TestHashAlgorithm:
+    def _seed(self, db_conn):
+        from app.database import execute
+        execute("INSERT INTO files (path, name, size, file_hash) VALUES ('/s/a', 'a', 1, 'abc')")
+        execute("INSERT INTO extract_cache (path, size, mtime, file_hash) VALUES ('/s/a', 1, 'x', 'abc')")
+
+    def _hashes(self, db_conn):
+        return (db_conn.execute("SELECT file_hash FROM files").fetchone()[0],
+                db_conn.execute("SELECT COUNT(*) FROM extract_cache").fetchone()[0])
+
+    def test_legacy_index_is_sha256(self, db_conn):
+        from app import scanner
+        self._seed(db_conn)
+        scanner._reset_hashes_if_algorithm_changed(db_conn)
+        assert self._hashes(db_conn) == ("abc", 1)
+        assert db_conn.execute("SELECT value FROM index_meta").fetchone()[0] == "sha256"
+
+    def test_switch_clears_hashes(self, db_conn, monkeypatch):
+        from app import scanner
+        self._seed(db_conn)
+        scanner._reset_hashes_if_algorithm_changed(db_conn)
+        monkeypatch.setattr(scanner, "_hash_algorithm", lambda: "blake3")
+        scanner._reset_hashes_if_algorithm_changed(db_conn)
+        assert self._hashes(db_conn) == (None, 0)
+        assert db_conn.execute("SELECT value FROM index_meta").fetchone()[0] == "blake3"
+
+    def test_blake3_unavailable_falls_back(self, monkeypatch):
+        from app import scanner
+        monkeypatch.setattr(scanner.settings, "hash_algorithm", "blake3")
+        monkeypatch.setattr(scanner, "blake3", None)
+        assert scanner._hash_algorithm() == "sha256"
+
+
+class TestPhase1Tags:
+    def _row(self, path, indexed_at):
+        return (path, path.rsplit("/", 1)[1], "/s", 0, 0, "text/plain", None,
+                None, None, indexed_at, None)
+
+    def _tags(self, db_conn, path):
+        return sorted(r[0] for r in db_conn.execute(
+            "SELECT tag FROM file_tags t JOIN files f ON f.id = t.file_id WHERE f.path = ?", (path,)))
+
+    def test_flush_tags_rows_by_path(self, db_conn):
+        from app import scanner
+        scanner._flush_batch_phase1(db_conn, [self._row("/s/a.txt", "t1"), self._row("/s/b.txt", "t1")],
+                                    [("x", "/s/a.txt"), ("y", "/s/a.txt"), ("x", "/s/b.txt")])
+        assert self._tags(db_conn, "/s/a.txt") == ["x", "y"]
+        assert self._tags(db_conn, "/s/b.txt") == ["x"]
+
+    def test_retag_skips_rows_indexed_this_scan(self, db_conn):
+        from app import scanner
+        scanner._flush_batch_phase1(db_conn, [self._row("/s/a.txt", "2024-01-01"),
+                                              self._row("/s/b.txt", "2024-06-01")])
+        scanner._apply_tags_bulk(db_conn, "s", "2024-03-01")
+        assert self._tags(db_conn, "/s/a.txt") == ["document", "empty", "text"]
+        assert self._tags(db_conn, "/s/b.txt") == []
+
@@ -0,0 +1,51 @@
+"""Tests for search endpoints."""
+
+import pytest
+from app.database import executemany
+
+
+class TestSearch:
+    def test_prefix_match(self, client, db_conn):
+        executemany("INSERT INTO files (path, name) VALUES (?, ?)",
+                    [("/a/holiday.jpg", "holiday.jpg"), ("/a/work.txt", "work.txt")])
+        data = client.post("/api/search", json={"query": "holi"}).json()
+        assert data["total"] == 1 and data["items"][0]["name"] == "holiday.jpg"
+
+    @pytest.mark.parametrize("q", ["", "   "])
+    def test_blank_query_returns_nothing(self, client, db_conn, q):
+        resp = client.post("/api/search", json={"query": q})
+        assert resp.status_code == 200
+        assert resp.json() == {"items": [], "total": 0, "search_time_ms": 0.0}
+
+
+class TestSuggest:
+    def _names(self, client, q, limit=10):
+        resp = client.get("/api/search/suggest", params={"q": q, "limit": limit})
+        assert resp.status_code == 200
+        return [r["name"] for r in resp.json()]
+
+    def test_prefix_in_nocase_order(self, client, db_conn):
+        executemany("INSERT INTO files (path, name) VALUES (?, ?)",
+                    [(f"/a/{n}", n) for n in ("holiday_b.jpg", "Holiday_A.jpg", "HOLIDAY_c.jpg", "work.txt")])
+        assert self._names(client, "holiday") == ["Holiday_A.jpg", "holiday_b.jpg", "HOLIDAY_c.jpg"]
+
+    def test_like_wildcards_are_literal(self, client, db_conn):
+        # Unescaped, "%b" and "_x" would also match ab.txt / yxb.txt as prefixes
+        # (neither has a word starting with the query, so FTS adds nothing)
+        executemany("INSERT INTO files (path, name) VALUES (?, ?)",
+                    [(f"/a/{n}", n) for n in ("%b.txt", "ab.txt", "_xa.txt", "yxb.txt")])
+        assert self._names(client, "%b") == ["%b.txt"]
+        assert self._names(client, "_x") == ["_xa.txt"]
+
+    def test_fts_fills_with_later_words_without_duplicates(self, client, db_conn):
+        executemany("INSERT INTO files (path, name) VALUES (?, ?)",
+                    [("/a/beach.jpg", "beach.jpg"), ("/a/summer beach.jpg", "summer beach.jpg"),
+                     ("/a/summer.jpg", "summer.jpg")])
+        names = self._names(client, "beach")
+        assert names[0] == "beach.jpg"
+        assert sorted(names) == ["beach.jpg", "summer beach.jpg"]
+
+    @pytest.mark.parametrize("q", ["", "   ", '"'])
+    def test_blank_or_wordless_query(self, client, db_conn, q):
+        executemany("INSERT INTO files (path, name) VALUES (?, ?)", [("/a/x.txt", "x.txt")])
+        assert self._names(client, q) == []
@@ -0,0 +1,67 @@
+"""Tests for the SMB filesystem helpers (smbclient faked)."""
+
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import pytest
+from app import smb_fs
+from app.smb_fs import SMBSource, walk_stat
+
+
+def _entry(parent, name, attributes, size=0, mtime=0.0):
+    when = datetime.fromtimestamp(mtime, tz=timezone.utc)
+    return SimpleNamespace(
+        name=name, path=f"{parent}\\{name}",
+        smb_info=SimpleNamespace(file_attributes=attributes, end_of_file=size,
+                                 last_write_time=when, creation_time=when),
+    )
+
+
+class TestWalkStat:
+    def test_stats_come_from_listing(self, monkeypatch):
+        root = "\\\\nas\\share"
+        tree = {
+            root: [_entry(root, "a.txt", 0x20, 5, 1700000000.25),
+                   _entry(root, "sub", 0x10, mtime=1600000000.0),
+                   _entry(root, "loop", 0x10 | 0x400),
+                   _entry(root, "link.txt", 0x400)],
+            root + "\\sub": [_entry(root + "\\sub", "b.bin", 0x20, 7)],
+        }
+        monkeypatch.setattr(smb_fs.smbclient, "scandir", lambda p: iter(tree[p]))
+        stat_calls = []
+        monkeypatch.setattr(smb_fs, "stat", lambda p: stat_calls.append(p) or SimpleNamespace(
+            name="link.txt", path=p, size=99))
+
+        walked = list(walk_stat(SMBSource("nas", "share", "u", "p")))
+        assert [(d, info and info.name, [f.name for f in files]) for d, info, files in walked] == [
+            (root, None, ["a.txt", "link.txt"]),
+            (root + "\\sub", "sub", ["b.bin"]),
+        ]
+        a = walked[0][2][0]
+        assert (a.path, a.size, a.mtime, a.is_directory) == (root + "\\a.txt", 5, 1700000000.25, False)
+        assert walked[1][1].mtime == 1600000000.0
+        assert stat_calls == [root + "\\link.txt"]  # only the link needed a stat
+
+
+class TestSameMtime:
+    def test_tolerates_rounding_of_older_stat_values(self):
+        from app.scanner import _same_mtime
+        assert _same_mtime("2024-01-01T00:00:00.123457+00:00", "2024-01-01T00:00:00.123456+00:00")
+        assert not _same_mtime("2024-01-01T00:00:00.123459+00:00", "2024-01-01T00:00:00.123456+00:00")
+        assert not _same_mtime(None, "2024-01-01T00:00:00+00:00")
+
+
+class TestGetMimeType:
+    @pytest.mark.parametrize("path", [
+        "\\\\nas\\share\\Photos\\IMG_1.JPG",
+        "\\\\nas\\share\\backup.tar.gz",
+        "\\\\nas\\share\\old.tgz",
+        "\\\\nas\\share\\notes.txt.Z",
+        "\\\\nas\\share\\dir.v2\\Makefile",
+        "\\\\nas\\share\\.jpg",
+        "\\\\nas\\share\\file.",
+    ])
+    def test_matches_guess_type(self, path):
+        import mimetypes
+        name = path.rpartition("\\")[2]
+        assert smb_fs.get_mime_type(path) == (mimetypes.guess_type(name)[0] or "application/octet-stream")